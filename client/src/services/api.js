@@ -107,12 +107,22 @@ class ApiService {
     return this.request('/users/me/');
   }
 
+  // Dashboard: every summary a role's dashboard shows, in one request
+  async getDashboard(role) {
+    return this.request(`/dashboard/${role}/`);
+  }
+
   // Patients
   async getPatients(params = {}) {
     const queryString = new URLSearchParams(params).toString();
     return this.request(`/patients/${queryString ? `?${queryString}` : ''}`);
   }
 
+  async autocompletePatients(query, limit = 10) {
+    const queryString = new URLSearchParams({ q: query, limit }).toString();
+    return this.request(`/patients/autocomplete/?${queryString}`);
+  }
+
   async createPatient(patientData) {
     return this.request('/patients/', {
       method: 'POST',
@@ -198,6 +208,20 @@ class ApiService {
     return this.request('/wards/occupancy_stats/');
   }
 
+  async getBedMap(since = null) {
+    return this.request(`/wards/bed_map/${since === null ? '' : `?since=${since}`}`);
+  }
+
+  async getBedOccupancyAt(params = {}) {
+    const queryString = new URLSearchParams(params).toString();
+    return this.request(`/beds/occupancy_at/${queryString ? `?${queryString}` : ''}`);
+  }
+
+  async getBedLengthOfStay(params = {}) {
+    const queryString = new URLSearchParams(params).toString();
+    return this.request(`/beds/length_of_stay/${queryString ? `?${queryString}` : ''}`);
+  }
+
   // Appointments
   async getAppointments(params = {}) {
     const queryString = new URLSearchParams(params).toString();
@@ -226,6 +250,59 @@ class ApiService {
     return this.request('/appointments/upcoming/');
   }
 
+  async searchSlots(params = {}) {
+    const queryString = new URLSearchParams(params).toString();
+    return this.request(`/appointments/slot_search/${queryString ? `?${queryString}` : ''}`);
+  }
+
+  async bookAppointmentSeries(seriesData) {
+    return this.request('/appointments/book_series/', {
+      method: 'POST',
+      body: JSON.stringify(seriesData),
+    });
+  }
+
+  async getWorkingHours(params = {}) {
+    const queryString = new URLSearchParams(params).toString();
+    return this.request(`/working-hours/${queryString ? `?${queryString}` : ''}`);
+  }
+
+  async createWorkingHours(hoursData) {
+    return this.request('/working-hours/', {
+      method: 'POST',
+      body: JSON.stringify(hoursData),
+    });
+  }
+
+  async deleteWorkingHours(id) {
+    return this.request(`/working-hours/${id}/`, {
+      method: 'DELETE',
+    });
+  }
+
+  async getResolvedWorkingHours(params = {}) {
+    const queryString = new URLSearchParams(params).toString();
+    return this.request(`/working-hours/resolved/${queryString ? `?${queryString}` : ''}`);
+  }
+
+  async getScheduleExceptions(params = {}) {
+    const queryString = new URLSearchParams(params).toString();
+    return this.request(`/schedule-exceptions/${queryString ? `?${queryString}` : ''}`);
+  }
+
+  async createScheduleException(exceptionData) {
+    return this.request('/schedule-exceptions/', {
+      method: 'POST',
+      body: JSON.stringify(exceptionData),
+    });
+  }
+
+  async deleteScheduleException(id) {
+    return this.request(`/schedule-exceptions/${id}/`, {
+      method: 'DELETE',
+    });
+  }
+
   async completeAppointment(id) {
     return this.request(`/appointments/${id}/complete/`, {
       method: 'PATCH',
@@ -0,0 +1,145 @@
+"""
+Token authentication with a cache in front of the token lookup.
+
+DRF's ``TokenAuthentication`` joins ``authtoken_token`` and ``users`` on
+every request. ``CachedTokenAuthentication`` keeps the resulting
+``(user, token)`` pair in the ``TOKEN_AUTH_CACHE['CACHE']`` cache for
+``TIMEOUT`` seconds; only unknown or expired entries reach the database.
+
+Entries are dropped as soon as the token or its user changes: logout and
+password resets delete the token, and deactivation saves the user, which
+fire the ``post_delete``/``post_save`` receivers below. Writes that skip
+signals (``QuerySet.update``) are covered by ``TIMEOUT``.
+
+Those receivers only reach the cache of the process that handled the
+change, so a per-process cache (``LocMemCache``) would let every other
+worker accept a revoked token until its entry expired. Such caches are
+bypassed unless ``ALLOW_LOCAL_CACHE`` declares a single-process deployment.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+TOKEN_AUTH_CACHE_DEFAULTS = {
+    'ENABLED': True,
+    'CACHE': 'default',
+    'TIMEOUT': 300,
+    'KEY_PREFIX': 'auth-token',
+    # Only safe when one process serves every request (tests, runserver).
+    'ALLOW_LOCAL_CACHE': False,
+    # Count hits and misses for /api/system/auth-cache/ (one cache write per request).
+    'STATS': False,
+}
+
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+
+def token_cache_settings():
+    return {**TOKEN_AUTH_CACHE_DEFAULTS, **getattr(settings, 'TOKEN_AUTH_CACHE', {})}
+
+
+def _cache():
+    return caches[token_cache_settings()['CACHE']]
+
+
+def cache_is_shared(config=None):
+    config = config or token_cache_settings()
+    return settings.CACHES[config['CACHE']]['BACKEND'] not in PROCESS_LOCAL_BACKENDS
+
+
+def cache_active(config=None):
+    config = config or token_cache_settings()
+    return config['ENABLED'] and (config['ALLOW_LOCAL_CACHE'] or cache_is_shared(config))
+
+
+def _key(*parts):
+    return ':'.join([token_cache_settings()['KEY_PREFIX'], *map(str, parts)])
+
+
+def _token_key(key):
+    # Keep raw tokens out of cache keys (and file names, for FileBasedCache).
+    return _key('token', hashlib.sha256(key.encode()).hexdigest())
+
+
+def _count(outcome):
+    cache = _cache()
+    key = _key('stats', outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def invalidate_token(key):
+    _cache().delete(_token_key(key))
+
+
+def invalidate_user_tokens(user):
+    keys = Token.objects.filter(user_id=user.pk).values_list('key', flat=True)
+    _cache().delete_many([_token_key(key) for key in keys])
+
+
+def token_cache_stats():
+    config = token_cache_settings()
+    counts = _cache().get_many([_key('stats', 'hit'), _key('stats', 'miss')])
+    hits, misses = counts.get(_key('stats', 'hit'), 0), counts.get(_key('stats', 'miss'), 0)
+    return {
+        'enabled': config['ENABLED'],
+        'active': cache_active(config),
+        'shared': cache_is_shared(config),
+        'stats': config['STATS'],
+        'cache': config['CACHE'],
+        'timeout': config['TIMEOUT'],
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+    }
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """``TokenAuthentication`` that caches token to user lookups."""
+
+    def authenticate_credentials(self, key):
+        config = token_cache_settings()
+        if not cache_active(config):
+            return super().authenticate_credentials(key)
+
+        cache = _cache()
+        cache_key = _token_key(key)
+        entry = cache.get(cache_key)
+        if entry is not None and entry[0].is_active:
+            if config['STATS']:
+                _count('hit')
+            return entry
+
+        if config['STATS']:
+            _count('miss')
+        # Raises AuthenticationFailed for unknown tokens and inactive users,
+        # so only valid credentials are ever cached.
+        user, token = super().authenticate_credentials(key)
+        cache.set(cache_key, (user, token), config['TIMEOUT'])
+        return user, token
+
+
+def _user_changed(sender, instance, **kwargs):
+    invalidate_user_tokens(instance)
+
+
+def _token_deleted(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+def connect_signals():
+    user_model = get_user_model()
+    post_save.connect(_user_changed, sender=user_model, dispatch_uid='accounts.authentication.user_saved')
+    post_delete.connect(_user_changed, sender=user_model, dispatch_uid='accounts.authentication.user_deleted')
+    post_delete.connect(_token_deleted, sender=Token, dispatch_uid='accounts.authentication.token_deleted')
@@ -22,4 +22,7 @@ class User(AbstractUser):
         return f"{self.get_full_name()} - {self.role}"
     
     class Meta:
-        db_table = 'users'
\ No newline at end of file
+        db_table = 'users'
+        indexes = [
+            models.Index(fields=['role', 'status'], name='user_role_status_idx'),
+        ]
\ No newline at end of file
@@ -0,0 +1,105 @@
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from . import authentication
+from .models import User
+
+SINGLE_PROCESS = {'CACHE': 'tokens', 'TIMEOUT': 300, 'ALLOW_LOCAL_CACHE': True, 'STATS': True}
+
+
+def token_client(token):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+@override_settings(TOKEN_AUTH_CACHE=SINGLE_PROCESS)
+class CachedTokenAuthenticationTests(TestCase):
+
+    def setUp(self):
+        caches['tokens'].clear()
+        self.admin = User.objects.create_user('admin', password='x', role='admin')
+        self.nurse = User.objects.create_user('nurse', email='nurse@example.com', password='old-password', role='nurse')
+        self.token = Token.objects.create(user=self.nurse)
+        self.client = token_client(self.token)
+        self.admin_client = APIClient()
+        self.admin_client.force_authenticate(self.admin)
+
+    def me(self):
+        return self.client.get('/api/users/me/').status_code
+
+    def cached(self):
+        return caches['tokens'].get(authentication._token_key(self.token.key))
+
+    def test_second_request_is_served_from_the_cache(self):
+        self.assertEqual(self.me(), 200)
+        self.assertIsNotNone(self.cached())
+        with self.assertNumQueries(0):
+            authentication.CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        stats = authentication.token_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_logout_rejects_the_token(self):
+        self.assertEqual(self.me(), 200)
+        self.assertEqual(self.client.post('/api/users/logout/').status_code, 200)
+        self.assertIsNone(self.cached())
+        self.assertEqual(self.me(), 401)
+
+    def test_deactivation_rejects_the_token(self):
+        self.assertEqual(self.me(), 200)
+        response = self.admin_client.patch(f'/api/users/{self.nurse.pk}/deactivate/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.me(), 401)
+
+    def test_admin_password_reset_rejects_the_token(self):
+        self.assertEqual(self.me(), 200)
+        response = self.admin_client.post(f'/api/users/{self.nurse.pk}/reset_password/', {'password': 'new-password'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.me(), 401)
+
+    def test_emailed_password_reset_rejects_the_token(self):
+        self.assertEqual(self.me(), 200)
+        response = APIClient().post('/api/users/reset_password_confirm/', {
+            'uidb64': urlsafe_base64_encode(force_bytes(self.nurse.pk)),
+            'token': default_token_generator.make_token(self.nurse),
+            'new_password': 'new-password',
+            'confirm_password': 'new-password',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.me(), 401)
+
+    def test_cached_inactive_user_is_rejected(self):
+        # A deactivation that skipped signals, seen through a stale entry.
+        self.assertEqual(self.me(), 200)
+        User.objects.filter(pk=self.nurse.pk).update(is_active=False)
+        user, token = self.cached()
+        user.is_active = False
+        caches['tokens'].set(authentication._token_key(self.token.key), (user, token))
+        self.assertEqual(self.me(), 401)
+
+    @override_settings(TOKEN_AUTH_CACHE={**SINGLE_PROCESS, 'STATS': False})
+    def test_stats_are_optional(self):
+        self.assertEqual(self.me(), 200)
+        self.assertEqual(self.me(), 200)
+        stats = authentication.token_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (0, 0))
+
+
+class PerProcessCacheTests(TestCase):
+
+    def setUp(self):
+        caches['tokens'].clear()
+
+    @override_settings(TOKEN_AUTH_CACHE={'CACHE': 'tokens', 'ALLOW_LOCAL_CACHE': False})
+    def test_a_per_process_cache_is_bypassed(self):
+        token = Token.objects.create(user=User.objects.create_user('nurse', password='x', role='nurse'))
+        self.assertFalse(authentication.cache_is_shared())
+        self.assertEqual(token_client(token).get('/api/users/me/').status_code, 200)
+        self.assertIsNone(caches['tokens'].get(authentication._token_key(token.key)))
+        User.objects.filter(pk=token.user.pk).update(is_active=False)
+        self.assertEqual(token_client(token).get('/api/users/me/').status_code, 401)
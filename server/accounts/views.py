@@ -9,6 +9,9 @@ from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 from django.utils.encoding import force_str, force_bytes
 from django.db.models import Q
 from django.conf import settings
+from core.cache import cached_action
+from core.exports import ExportMixin
+from core.replica import use_replica
 from .serializers import (
     UserSerializer, 
     LoginSerializer, 
@@ -18,7 +21,7 @@ from .serializers import (
 
 User = get_user_model()
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     
@@ -81,24 +84,23 @@ class UserViewSet(viewsets.ModelViewSet):
     def doctors(self, request):
         """Get all active doctors"""
         doctors = User.objects.filter(role='doctor', status='active')
-        serializer = self.get_serializer(doctors, many=True)
-        return Response(serializer.data)
+        return self.list_response(doctors)
     
     @action(detail=False, methods=['get'])
     def nurses(self, request):
         """Get all active nurses"""
         nurses = User.objects.filter(role='nurse', status='active')
-        serializer = self.get_serializer(nurses, many=True)
-        return Response(serializer.data)
+        return self.list_response(nurses)
     
     @action(detail=False, methods=['get'])
     def staff(self, request):
         """Get all staff members"""
         staff = User.objects.exclude(role='admin')
-        serializer = self.get_serializer(staff, many=True)
-        return Response(serializer.data)
+        return self.list_response(staff)
     
     @action(detail=False, methods=['get'])
+    @cached_action(depends_on=['accounts.User'])
+    @use_replica
     def analytics(self, request):
         """Get user analytics for admin"""
         if request.user.role != 'admin':
@@ -157,6 +159,8 @@ class UserViewSet(viewsets.ModelViewSet):
         new_password = request.data.get('password', 'hospital123')
         user.set_password(new_password)
         user.save()
+        # Sessions signed in with the old password end with it.
+        Token.objects.filter(user=user).delete()
         
         return Response({'message': 'Password reset successfully'})
 
@@ -245,6 +249,7 @@ class UserViewSet(viewsets.ModelViewSet):
                 if default_token_generator.check_token(user, serializer.validated_data['token']):
                     user.set_password(serializer.validated_data['new_password'])
                     user.save()
+                    Token.objects.filter(user=user).delete()
                     return Response({'message': 'Password has been reset successfully'})
                 else:
                     return Response({'error': 'Invalid or expired token'}, status=status.HTTP_400_BAD_REQUEST)
@@ -266,6 +271,7 @@ class UserViewSet(viewsets.ModelViewSet):
                 if default_token_generator.check_token(user, serializer.validated_data['token']):
                     user.set_password(serializer.validated_data['new_password'])
                     user.save()
+                    Token.objects.filter(user=user).delete()
                     return Response({'message': 'Password has been reset successfully'})
                 else:
                     return Response({'error': 'Invalid or expired token'}, status=status.HTTP_400_BAD_REQUEST)
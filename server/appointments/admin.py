@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Appointment
+from .models import Appointment, ScheduleException, WorkingHours
 
 @admin.register(Appointment)
 class AppointmentAdmin(admin.ModelAdmin):
@@ -15,4 +15,14 @@ class AppointmentAdmin(admin.ModelAdmin):
         ('Status & Notes', {
             'fields': ('status', 'notes')
         }),
-    )
\ No newline at end of file
+    )
+@admin.register(WorkingHours)
+class WorkingHoursAdmin(admin.ModelAdmin):
+    list_display = ('doctor', 'weekday', 'start_time', 'end_time', 'valid_from', 'valid_until')
+    list_filter = ('weekday', 'doctor')
+
+@admin.register(ScheduleException)
+class ScheduleExceptionAdmin(admin.ModelAdmin):
+    list_display = ('doctor', 'kind', 'start_date', 'end_date', 'start_time', 'end_time', 'reason')
+    list_filter = ('kind', 'doctor')
+    date_hierarchy = 'start_date'
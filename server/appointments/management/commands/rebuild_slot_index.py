@@ -0,0 +1,37 @@
+"""
+Recompute the doctor slot occupancy bitmaps from scheduled appointments.
+
+    python manage.py rebuild_slot_index
+    python manage.py rebuild_slot_index --from 2026-01-01
+
+Needed after writes that skip model signals (``bulk_create``, raw SQL,
+restoring a database copy) or after changing ``APPOINTMENT_SLOTS['SLOT_MINUTES']``.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.dateparse import parse_date
+
+from appointments.slots import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-doctor, per-day slot occupancy bitmaps'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='Only rebuild days from this ISO date on')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        start = None
+        if options['start']:
+            start = parse_date(options['start'])
+            if start is None:
+                raise CommandError('--from must be an ISO date (YYYY-MM-DD)')
+
+        started = time.monotonic()
+        with transaction.atomic(using=options['database']):
+            count = rebuild(options['database'], start=start)
+        self.stdout.write(f'{count:,} doctor-days indexed in {time.monotonic() - started:.1f}s')
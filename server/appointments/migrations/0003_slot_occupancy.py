@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def build_slot_index(apps, schema_editor):
+    # Same layout as appointments.slots: one bit per 5 minutes of the day,
+    # scheduled appointments covering APPOINTMENT_SLOTS['SLOT_MINUTES'].
+    Appointment = apps.get_model('appointments', 'Appointment')
+    SlotOccupancy = apps.get_model('appointments', 'SlotOccupancy')
+    using = schema_editor.connection.alias
+    slot_minutes = getattr(settings, 'APPOINTMENT_SLOTS', {}).get('SLOT_MINUTES', 30)
+    masks = {}
+    rows = Appointment.objects.using(using).filter(status='scheduled').order_by()
+    for doctor_id, day, value in rows.values_list('doctor_id', 'date', 'time').iterator(chunk_size=10000):
+        start = value.hour * 60 + value.minute
+        first, last = start // 5, min(-(-(start + slot_minutes) // 5), 288)
+        mask = ((1 << (last - first)) - 1) << first if last > first else 0
+        masks[(doctor_id, day)] = masks.get((doctor_id, day), 0) | mask
+    SlotOccupancy.objects.using(using).bulk_create(
+        [SlotOccupancy(doctor_id=doctor_id, date=day, bitmap=mask.to_bytes(36, 'little'))
+         for (doctor_id, day), mask in masks.items()],
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0002_appointment_appt_date_time_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('bitmap', models.BinaryField()),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'appointment_slot_occupancy',
+                'unique_together': {('doctor', 'date')},
+            },
+        ),
+        migrations.RunPython(build_slot_index, migrations.RunPython.noop),
+    ]
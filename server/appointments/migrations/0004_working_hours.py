@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def rebuild_slot_index(apps, schema_editor):
+    # Appointment types now take APPOINTMENT_SLOTS['TYPE_MINUTES']; same
+    # bitmap layout as appointments.slots.
+    Appointment = apps.get_model('appointments', 'Appointment')
+    SlotOccupancy = apps.get_model('appointments', 'SlotOccupancy')
+    using = schema_editor.connection.alias
+    config = getattr(settings, 'APPOINTMENT_SLOTS', {})
+    slot_minutes, type_minutes = config.get('SLOT_MINUTES', 30), config.get('TYPE_MINUTES', {})
+    masks = {}
+    rows = Appointment.objects.using(using).filter(status='scheduled').order_by()
+    for doctor_id, day, value, kind in rows.values_list('doctor_id', 'date', 'time', 'type').iterator(chunk_size=10000):
+        start = value.hour * 60 + value.minute
+        first = start // 5
+        last = min(-(-(start + type_minutes.get(kind, slot_minutes)) // 5), 288)
+        mask = ((1 << (last - first)) - 1) << first if last > first else 0
+        masks[(doctor_id, day)] = masks.get((doctor_id, day), 0) | mask
+    SlotOccupancy.objects.using(using).all().delete()
+    SlotOccupancy.objects.using(using).bulk_create(
+        [SlotOccupancy(doctor_id=doctor_id, date=day, bitmap=mask.to_bytes(36, 'little'))
+         for (doctor_id, day), mask in masks.items()],
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0003_slot_occupancy'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkingHours',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('valid_from', models.DateField(blank=True, null=True)),
+                ('valid_until', models.DateField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='working_hours', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'working hours',
+                'db_table': 'doctor_working_hours',
+                'ordering': ['doctor', 'weekday', 'start_time'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ScheduleException',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('unavailable', 'Unavailable'), ('available', 'Extra Hours')], default='unavailable', max_length=20)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('start_time', models.TimeField(blank=True, null=True)),
+                ('end_time', models.TimeField(blank=True, null=True)),
+                ('reason', models.CharField(blank=True, max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedule_exceptions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'doctor_schedule_exceptions',
+                'ordering': ['start_date', 'start_time'],
+                'indexes': [models.Index(fields=['doctor', 'end_date', 'start_date'], name='sched_exc_doctor_dates_idx')],
+            },
+        ),
+        migrations.RunPython(rebuild_slot_index, migrations.RunPython.noop),
+    ]
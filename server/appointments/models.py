@@ -1,8 +1,12 @@
-from django.db import models
+from django.db import IntegrityError, models, router, transaction
+from django.db.models import Q
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
+class SlotConflict(IntegrityError):
+    """A scheduled appointment would take a doctor's time that is already booked."""
+
 class Appointment(models.Model):
     STATUS_CHOICES = [
         ('scheduled', 'Scheduled'),
@@ -31,9 +35,128 @@ class Appointment(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
-        unique_together = ['doctor', 'date', 'time']
         db_table = 'appointments'
         ordering = ['date', 'time']
+        indexes = [
+            models.Index(fields=['date', 'time'], name='appt_date_time_idx'),
+            models.Index(fields=['date', 'status'], name='appt_date_status_idx'),
+            models.Index(fields=['status', 'date'], name='appt_status_date_idx'),
+            models.Index(fields=['patient', 'date'], name='appt_patient_date_idx'),
+            models.Index(fields=['date'], condition=Q(status='scheduled'), name='appt_scheduled_date_idx'),
+        ]
+        constraints = [
+            # Only scheduled appointments hold a slot, so a cancelled one can be rebooked.
+            models.UniqueConstraint(
+                fields=['doctor', 'date', 'time'],
+                condition=Q(status='scheduled'),
+                name='appt_scheduled_slot_uniq',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.patient.name} - {self.doctor.get_full_name()} - {self.date} {self.time}"
+    
+    def save(self, *args, **kwargs):
+        # appointments.slots rejects overlapping bookings in post_save, so the
+        # insert and the check commit or roll back together.
+        using = kwargs.get('using') or router.db_for_write(Appointment, instance=self)
+        try:
+            with transaction.atomic(using=using):
+                super().save(*args, **kwargs)
+        except SlotConflict:
+            raise
+        except IntegrityError as error:
+            # Drivers word constraint errors differently; ask the database
+            # whether the slot is taken instead of parsing the message.
+            if self.holds_taken_slot(using):
+                raise SlotConflict('Time slot is not available') from error
+            raise
+    
+    def holds_taken_slot(self, using):
+        if self.status != 'scheduled':
+            return False
+        return Appointment.objects.using(using).filter(
+            doctor_id=self.doctor_id, date=self.date, time=self.time, status='scheduled'
+        ).exclude(pk=self.pk).exists()
+
+class SlotOccupancy(models.Model):
+    """The parts of a doctor's day taken by scheduled appointments.
+
+    ``bitmap`` holds one bit per ``appointments.slots.RESOLUTION_MINUTES``
+    from midnight, set while a scheduled appointment covers it. Days without
+    a row are free. Kept in step by appointments.slots.
+    """
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    date = models.DateField()
+    bitmap = models.BinaryField()
+    
+    class Meta:
+        unique_together = ['doctor', 'date']
+        db_table = 'appointment_slot_occupancy'
+    
+    def __str__(self):
+        return f"Doctor {self.doctor_id} on {self.date}"
+
+class WorkingHours(models.Model):
+    """A recurring block of a doctor's week, e.g. Mondays 09:00-13:00.
+
+    Several blocks on one weekday make a split shift (a lunch break is the
+    gap between two). ``valid_from``/``valid_until`` bound a template to a
+    period, so a new rota can be entered ahead of time. Doctors without any
+    blocks work ``APPOINTMENT_SLOTS['DAY_START']`` to ``['DAY_END']`` daily.
+    """
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+    
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='working_hours')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    valid_from = models.DateField(null=True, blank=True)
+    valid_until = models.DateField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'doctor_working_hours'
+        ordering = ['doctor', 'weekday', 'start_time']
+        verbose_name_plural = 'working hours'
+    
+    def __str__(self):
+        return f"{self.doctor.get_full_name()} - {self.get_weekday_display()} {self.start_time}-{self.end_time}"
+
+class ScheduleException(models.Model):
+    """Leave, blocked time or extra hours overriding a doctor's template.
+
+    Without times, an ``unavailable`` exception covers whole days.
+    """
+    KIND_CHOICES = [
+        ('unavailable', 'Unavailable'),
+        ('available', 'Extra Hours'),
+    ]
+    
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='schedule_exceptions')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='unavailable')
+    start_date = models.DateField()
+    end_date = models.DateField()
+    start_time = models.TimeField(null=True, blank=True)
+    end_time = models.TimeField(null=True, blank=True)
+    reason = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'doctor_schedule_exceptions'
+        ordering = ['start_date', 'start_time']
+        indexes = [
+            models.Index(fields=['doctor', 'end_date', 'start_date'], name='sched_exc_doctor_dates_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.patient.name} - {self.doctor.get_full_name()} - {self.date} {self.time}"
\ No newline at end of file
+        return f"{self.doctor.get_full_name()} - {self.get_kind_display()} {self.start_date} to {self.end_date}"
@@ -0,0 +1,173 @@
+"""
+Doctors' working hours: recurring templates, exceptions, and what they
+resolve to on a given day.
+
+A doctor's week is a set of ``WorkingHours`` blocks, each valid for a period
+(open-ended by default). ``ScheduleException`` rows then remove time (leave,
+blocked hours; whole days when they have no times) or add it (extra hours)
+for a range of dates. ``Schedule.hours(day)`` resolves both into the day's
+working intervals, as sorted, non-overlapping ``(start, end)`` minutes from
+midnight.
+
+Templates and exceptions accumulate over the years, so each doctor's are
+kept in an ``IntervalTree`` keyed by the dates they apply to: resolving a
+day visits only the rows covering it, not the doctor's whole history.
+``load`` reads the templates and only the exceptions overlapping the
+requested dates, for any number of doctors, in two queries.
+"""
+
+from django.db import router
+
+from .models import ScheduleException, WorkingHours
+
+
+class IntervalTree:
+    """Static centered interval tree over half-open ``(start, end, value)``."""
+
+    def __init__(self, intervals):
+        intervals = sorted((item for item in intervals if item[0] < item[1]), key=lambda item: item[0])
+        self.left = self.right = None
+        self.by_start = self.by_end = ()
+        if not intervals:
+            return
+        # The middle start always lands in this node, so each level shrinks.
+        self.center = intervals[len(intervals) // 2][0]
+        here = [item for item in intervals if item[0] <= self.center < item[1]]
+        left = [item for item in intervals if item[1] <= self.center]
+        right = [item for item in intervals if item[0] > self.center]
+        self.by_start = here
+        self.by_end = sorted(here, key=lambda item: item[1], reverse=True)
+        self.left = IntervalTree(left) if left else None
+        self.right = IntervalTree(right) if right else None
+
+    def overlapping(self, start, end):
+        """Values of the intervals overlapping ``[start, end)``."""
+        found = []
+        node = [self]
+        while node:
+            tree = node.pop()
+            if not tree.by_start:
+                continue
+            if end <= tree.center:
+                found.extend(value for s, _, value in _until(tree.by_start, lambda item: item[0] < end))
+                if tree.left:
+                    node.append(tree.left)
+            elif start > tree.center:
+                found.extend(value for _, e, value in _until(tree.by_end, lambda item: item[1] > start))
+                if tree.right:
+                    node.append(tree.right)
+            else:
+                found.extend(value for _, _, value in tree.by_start)
+                node.extend(child for child in (tree.left, tree.right) if child)
+        return found
+
+    def at(self, point):
+        return self.overlapping(point, point + 1)
+
+
+def _until(items, condition):
+    for item in items:
+        if not condition(item):
+            break
+        yield item
+
+
+# Interval arithmetic on sorted lists of (start, end) minutes
+
+def merge(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if start >= end:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract(intervals, removed):
+    result = []
+    for start, end in intervals:
+        for cut_start, cut_end in removed:
+            if cut_end <= start or cut_start >= end:
+                continue
+            if cut_start > start:
+                result.append((start, cut_start))
+            start = max(start, cut_end)
+            if start >= end:
+                break
+        if start < end:
+            result.append((start, end))
+    return result
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+# Dates are keyed by ordinal; open-ended templates reach these bounds.
+FIRST_DAY, LAST_DAY = 0, 10 ** 7
+WHOLE_DAY = (0, 24 * 60)
+
+
+class Schedule:
+    """One doctor's templates and exceptions, resolved day by day."""
+
+    def __init__(self, templates=(), exceptions=(), default_hours=None):
+        self.default_hours = [default_hours] if default_hours else []
+        self.has_templates = bool(templates)
+        self.templates = IntervalTree(
+            (
+                row['valid_from'].toordinal() if row['valid_from'] else FIRST_DAY,
+                row['valid_until'].toordinal() + 1 if row['valid_until'] else LAST_DAY,
+                (row['weekday'], _minutes(row['start_time']), _minutes(row['end_time'])),
+            )
+            for row in templates
+        )
+        self.exceptions = IntervalTree(
+            (
+                row['start_date'].toordinal(),
+                row['end_date'].toordinal() + 1,
+                (
+                    row['kind'],
+                    _minutes(row['start_time']) if row['start_time'] else WHOLE_DAY[0],
+                    _minutes(row['end_time']) if row['end_time'] else WHOLE_DAY[1],
+                ),
+            )
+            for row in exceptions
+        )
+
+    def hours(self, day):
+        """The working intervals of ``day``, in minutes from midnight."""
+        ordinal = day.toordinal()
+        if self.has_templates:
+            weekday = day.weekday()
+            hours = [(start, end) for block_day, start, end in self.templates.at(ordinal) if block_day == weekday]
+        else:
+            hours = list(self.default_hours)
+        exceptions = self.exceptions.at(ordinal)
+        hours = merge(hours + [(start, end) for kind, start, end in exceptions if kind == 'available'])
+        removed = merge([(start, end) for kind, start, end in exceptions if kind == 'unavailable'])
+        return subtract(hours, removed) if removed else hours
+
+
+def load(doctor_ids, start, end, default_hours=None, using=None):
+    """``{doctor id: Schedule}`` for resolving days from ``start`` to ``end``."""
+    using = using or router.db_for_read(WorkingHours)
+    templates, exceptions = {}, {}
+    for row in (
+        WorkingHours.objects.using(using).filter(doctor_id__in=doctor_ids).order_by()
+        .values('doctor_id', 'weekday', 'start_time', 'end_time', 'valid_from', 'valid_until')
+    ):
+        templates.setdefault(row['doctor_id'], []).append(row)
+    for row in (
+        ScheduleException.objects.using(using)
+        .filter(doctor_id__in=doctor_ids, end_date__gte=start, start_date__lte=end).order_by()
+        .values('doctor_id', 'kind', 'start_date', 'end_date', 'start_time', 'end_time')
+    ):
+        exceptions.setdefault(row['doctor_id'], []).append(row)
+    return {
+        doctor_id: Schedule(templates.get(doctor_id, ()), exceptions.get(doctor_id, ()), default_hours)
+        for doctor_id in doctor_ids
+    }
@@ -1,5 +1,9 @@
+from django.contrib.auth import get_user_model
 from rest_framework import serializers
-from .models import Appointment
+from core.projections import Projection
+from patients.models import Patient
+from . import series, slots
+from .models import Appointment, ScheduleException, WorkingHours
 
 class AppointmentSerializer(serializers.ModelSerializer):
     patient_name = serializers.CharField(source='patient.name', read_only=True)
@@ -10,24 +14,106 @@ class AppointmentSerializer(serializers.ModelSerializer):
         model = Appointment
         fields = '__all__'
         read_only_fields = ['created_at', 'updated_at']
+        # No query for a taken slot before saving: appt_scheduled_slot_uniq and
+        # appointments.slots refuse double bookings in the write (409).
+        validators = []
     
     def validate(self, data):
-        # Check if doctor is available at the given time
-        if 'doctor' in data and 'date' in data and 'time' in data:
-            existing = Appointment.objects.filter(
-                doctor=data['doctor'],
-                date=data['date'],
-                time=data['time'],
-                status='scheduled'
-            )
-            
-            # Exclude current instance if updating
-            if self.instance:
-                existing = existing.exclude(id=self.instance.id)
-            
-            if existing.exists():
-                raise serializers.ValidationError(
-                    "Doctor is not available at this time"
-                )
+        # Check the doctor works then; conflicts are refused by the write itself
+        instance = self.instance
+        fields = ('doctor', 'date', 'time', 'type', 'status')
+        values = {
+            field: data[field] if field in data else getattr(instance, field, None)
+            for field in fields
+        }
+        changed = instance is None or any(
+            field in data and data[field] != getattr(instance, field) for field in fields
+        )
+        if changed and values['status'] in (None, 'scheduled') and all(
+            values[field] is not None for field in ('doctor', 'date', 'time')
+        ):
+            if not slots.is_working(values['doctor'].pk, values['date'], values['time'], values['type']):
+                raise serializers.ValidationError("Doctor is not working at this time")
         
-        return data
\ No newline at end of file
+        return data
+
+class OccurrenceSerializer(serializers.Serializer):
+    date = serializers.DateField()
+    time = serializers.TimeField()
+
+class AppointmentSeriesSerializer(serializers.Serializer):
+    """A series to book: a recurrence rule from start_date at time, or explicit occurrences"""
+    patient = serializers.PrimaryKeyRelatedField(queryset=Patient.objects.all())
+    doctor = serializers.PrimaryKeyRelatedField(queryset=get_user_model().objects.filter(role='doctor'))
+    type = serializers.ChoiceField(choices=Appointment.TYPE_CHOICES)
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+    rule = serializers.CharField(required=False)
+    start_date = serializers.DateField(required=False)
+    time = serializers.TimeField(required=False)
+    occurrences = OccurrenceSerializer(many=True, required=False)
+    partial = serializers.BooleanField(default=True)
+    
+    def validate(self, data):
+        limit = slots.slot_settings()['MAX_OCCURRENCES']
+        if ('rule' in data) == ('occurrences' in data):
+            raise serializers.ValidationError("Give either a rule or occurrences")
+        
+        if 'rule' in data:
+            if 'start_date' not in data or 'time' not in data:
+                raise serializers.ValidationError("A rule needs start_date and time")
+            try:
+                dates = series.expand(data['rule'], data['start_date'], limit)
+            except ValueError as error:
+                raise serializers.ValidationError({'rule': str(error)})
+            data['occurrences'] = [{'date': day, 'time': data['time']} for day in dates]
+        
+        if not data['occurrences']:
+            raise serializers.ValidationError("The series has no occurrences")
+        if len(data['occurrences']) > limit:
+            raise serializers.ValidationError(f"A series can have at most {limit} occurrences")
+        return data
+
+class WorkingHoursSerializer(serializers.ModelSerializer):
+    doctor_name = serializers.CharField(source='doctor.get_full_name', read_only=True)
+    weekday_display = serializers.CharField(source='get_weekday_display', read_only=True)
+    
+    class Meta:
+        model = WorkingHours
+        fields = '__all__'
+        read_only_fields = ['created_at', 'updated_at']
+    
+    def validate(self, data):
+        start_time = data.get('start_time', getattr(self.instance, 'start_time', None))
+        end_time = data.get('end_time', getattr(self.instance, 'end_time', None))
+        valid_from = data.get('valid_from', getattr(self.instance, 'valid_from', None))
+        valid_until = data.get('valid_until', getattr(self.instance, 'valid_until', None))
+        if start_time and end_time and start_time >= end_time:
+            raise serializers.ValidationError("End time must be after start time")
+        if valid_from and valid_until and valid_from > valid_until:
+            raise serializers.ValidationError("valid_until must not be before valid_from")
+        return data
+
+class ScheduleExceptionSerializer(serializers.ModelSerializer):
+    doctor_name = serializers.CharField(source='doctor.get_full_name', read_only=True)
+    
+    class Meta:
+        model = ScheduleException
+        fields = '__all__'
+        read_only_fields = ['created_at']
+    
+    def validate(self, data):
+        values = {
+            field: data.get(field, getattr(self.instance, field, None))
+            for field in ('kind', 'start_date', 'end_date', 'start_time', 'end_time')
+        }
+        if values['start_date'] and values['end_date'] and values['start_date'] > values['end_date']:
+            raise serializers.ValidationError("End date must not be before start date")
+        if (values['start_time'] is None) != (values['end_time'] is None):
+            raise serializers.ValidationError("Give both start and end time, or neither for whole days")
+        if values['start_time'] is not None and values['start_time'] >= values['end_time']:
+            raise serializers.ValidationError("End time must be after start time")
+        if values['kind'] == 'available' and values['start_time'] is None:
+            raise serializers.ValidationError("Extra hours need a start and end time")
+        return data
+
+appointment_projection = Projection(AppointmentSerializer)
@@ -0,0 +1,189 @@
+"""
+Recurring and bulk appointment booking.
+
+A series (weekly physiotherapy, dialysis three times a week) is given either
+as an iCalendar-style recurrence rule, e.g.
+``FREQ=WEEKLY;BYDAY=MO,WE,FR;COUNT=12``, expanded by ``expand``, or as an
+explicit list of occurrences. ``book`` then checks every occurrence in one
+pass against the doctor's working hours (``appointments.schedule``) and the
+occupancy bitmaps (``appointments.slots``), loaded once for the series'
+whole date range, and inserts the free occurrences with one ``bulk_create``.
+Occurrences that are outside the doctor's hours, overlap a booked
+appointment or overlap an earlier occurrence of the same series are
+reported one by one instead.
+
+The occupancy rows of the series' days are locked while it is checked and
+updated (on SQLite, which has no row locks, the whole database is locked
+for writing before they are read), and the bitmaps are written back with one ``bulk_update`` and one
+``bulk_create``, so the whole series costs a handful of queries however many
+occurrences it has. A booking that slipped in concurrently still trips
+``appt_scheduled_slot_uniq`` (or the occupancy row's own uniqueness), which
+rolls the series back as a ``SlotConflict``.
+"""
+
+from datetime import date as date_type, timedelta
+
+from django.db import IntegrityError, router, transaction
+
+from core.cache import invalidate_models
+from core.sqlite import lock_for_write
+
+from . import slots
+from .models import Appointment, SlotConflict, SlotOccupancy
+
+RULE_PARTS = {'FREQ', 'INTERVAL', 'COUNT', 'UNTIL', 'BYDAY'}
+FREQUENCIES = {'DAILY', 'WEEKLY'}
+WEEKDAYS = {'MO': 0, 'TU': 1, 'WE': 2, 'TH': 3, 'FR': 4, 'SA': 5, 'SU': 6}
+
+
+def parse_rule(rule):
+    """The parts of a recurrence rule, or ``ValueError`` naming what is wrong.
+
+    Supports ``FREQ`` (``DAILY``/``WEEKLY``), ``INTERVAL``, ``BYDAY`` (plain
+    weekdays) and one of ``COUNT`` and ``UNTIL`` (``YYYYMMDD``).
+    """
+    parts = {}
+    for part in rule.strip().upper().removeprefix('RRULE:').split(';'):
+        if not part.strip():
+            continue
+        name, separator, value = part.partition('=')
+        if not separator:
+            raise ValueError(f'Malformed rule part {part!r}')
+        parts[name.strip()] = value.strip()
+
+    unknown = set(parts) - RULE_PARTS
+    if unknown:
+        raise ValueError(f"Unsupported rule parts: {', '.join(sorted(unknown))}")
+    if parts.get('FREQ') not in FREQUENCIES:
+        raise ValueError('FREQ must be DAILY or WEEKLY')
+    if ('COUNT' in parts) == ('UNTIL' in parts):
+        raise ValueError('Give exactly one of COUNT and UNTIL')
+
+    parsed = {
+        'freq': parts['FREQ'],
+        'interval': int(parts.get('INTERVAL', 1)),
+        'count': int(parts['COUNT']) if 'COUNT' in parts else None,
+        'until': None,
+        'byday': None,
+    }
+    if 'UNTIL' in parts:
+        value = parts['UNTIL'][:8]
+        parsed['until'] = date_type(int(value[:4]), int(value[4:6]), int(value[6:8]))
+    if 'BYDAY' in parts:
+        try:
+            parsed['byday'] = sorted({WEEKDAYS[day.strip()] for day in parts['BYDAY'].split(',')})
+        except KeyError as error:
+            raise ValueError(f'Unknown weekday {error.args[0]!r} in BYDAY') from None
+    if parsed['interval'] < 1 or (parsed['count'] is not None and parsed['count'] < 1):
+        raise ValueError('INTERVAL and COUNT must be at least 1')
+    return parsed
+
+
+def expand(rule, start, limit):
+    """Dates of ``rule`` from ``start``; ``ValueError`` past ``limit`` occurrences."""
+    parsed = parse_rule(rule)
+    count, until, interval = parsed['count'], parsed['until'], parsed['interval']
+    weekdays = parsed['byday']
+
+    if parsed['freq'] == 'DAILY':
+        def candidates():
+            day = start
+            while True:
+                yield day
+                day += timedelta(days=interval)
+    else:
+        weekdays = weekdays or [start.weekday()]
+
+        def candidates():
+            week = start - timedelta(days=start.weekday())
+            while True:
+                for weekday in weekdays:
+                    day = week + timedelta(days=weekday)
+                    if day >= start:
+                        yield day
+                week += timedelta(weeks=interval)
+
+    dates = []
+    # A BYDAY that a DAILY interval never lands on must not loop forever.
+    for examined, day in enumerate(candidates()):
+        if (until is not None and day > until) or (count is not None and len(dates) == count):
+            break
+        if examined > 7 * (limit + 1):
+            break
+        if weekdays and day.weekday() not in weekdays:
+            continue
+        if len(dates) == limit:
+            raise ValueError(f'The rule has more than {limit} occurrences')
+        dates.append(day)
+    return dates
+
+
+def book(patient, doctor, occurrences, appointment_type, notes='', created_by=None, partial=True, using=None):
+    """Insert the free ``(date, time)`` occurrences of a series.
+
+    Returns ``(created appointments, conflicts)``, conflicts being
+    ``{'date', 'time', 'error'}`` dicts in date and time order. Unless
+    ``partial``, any conflict means nothing is inserted.
+    """
+    using = using or router.db_for_write(Appointment)
+    occurrences = sorted(set(occurrences))
+    if not occurrences:
+        return [], []
+    config = slots.slot_settings()
+    minutes = slots.type_minutes(appointment_type, config)
+    first, last = occurrences[0][0], occurrences[-1][0]
+    doctor_schedule = slots.schedules([doctor.pk], first, last, config)[doctor.pk]
+
+    with transaction.atomic(using=using):
+        lock_for_write(SlotOccupancy, using)
+        rows = {
+            row.date: row
+            for row in SlotOccupancy.objects.using(using).select_for_update()
+            .filter(doctor_id=doctor.pk, date__in={day for day, _ in occurrences})
+        }
+        taken = {day: slots.from_bitmap(row.bitmap) for day, row in rows.items()}
+        booked = {}
+        accepted, conflicts = [], []
+        for day, value in occurrences:
+            start = slots.minute_of_day(value)
+            mask = slots.span_mask(start, minutes)
+            if not any(begin <= start and start + minutes <= end for begin, end in doctor_schedule.hours(day)):
+                error = 'Doctor is not working at this time'
+            elif taken.get(day, 0) & mask:
+                error = 'Time slot is not available'
+            elif booked.get(day, 0) & mask:
+                error = 'Overlaps another occurrence of the series'
+            else:
+                booked[day] = booked.get(day, 0) | mask
+                accepted.append((day, value))
+                continue
+            conflicts.append({'date': day, 'time': slots.format_minute(start), 'error': error})
+
+        if not accepted or (conflicts and not partial):
+            return [], conflicts
+
+        appointments = [
+            Appointment(
+                patient=patient, doctor=doctor, date=day, time=value, type=appointment_type,
+                notes=notes, created_by=created_by
+            )
+            for day, value in accepted
+        ]
+        try:
+            with transaction.atomic(using=using):
+                created = Appointment.objects.using(using).bulk_create(appointments)
+                for row in rows.values():
+                    if row.date in booked:
+                        row.bitmap = slots.to_bitmap(taken[row.date] | booked[row.date])
+                SlotOccupancy.objects.using(using).bulk_update(
+                    [row for row in rows.values() if row.date in booked], ['bitmap']
+                )
+                SlotOccupancy.objects.using(using).bulk_create([
+                    SlotOccupancy(doctor_id=doctor.pk, date=day, bitmap=slots.to_bitmap(mask))
+                    for day, mask in booked.items() if day not in rows
+                ])
+        except IntegrityError as error:
+            raise SlotConflict('Time slot is not available') from error
+
+    invalidate_models(Appointment)
+    return created, conflicts
@@ -0,0 +1,363 @@
+"""
+Doctor slot availability from per-doctor, per-day occupancy bitmaps.
+
+``SlotOccupancy`` keeps one row per doctor and day that has scheduled
+appointments. Its ``bitmap`` has a bit for every ``RESOLUTION_MINUTES`` of
+the day, set where a scheduled appointment (as long as its type's
+``TYPE_MINUTES``, from its ``time``) covers it. The candidate slots of a day
+come from the doctor's working hours (``appointments.schedule``), stepping
+``SLOT_MINUTES`` (or the appointment's length, if shorter) from the start of
+each working interval; a candidate is free when ``bitmap & slot_mask == 0``.
+
+* ``available_slots`` reads one row instead of the day's appointments;
+* ``search`` answers "earliest free slot for any cardiologist in the next 14
+  days" or "every free slot for these doctors this week" from a single
+  query over ``(doctor, date)``, however many doctors and days it covers;
+* ``is_working`` checks a new or moved appointment against the doctor's hours.
+
+The bitmaps are recomputed from the appointments table for each day an
+appointment enters or leaves (create, cancel, reschedule, delete), with the
+row locked, so they cannot drift from concurrent writers; a write skipping
+signals (``bulk_create``, raw SQL) is repaired by the next write to the same
+day, ``refresh_days`` or ``python manage.py rebuild_slot_index``.
+
+Double booking is refused by the database, not by a query before the
+write: the ``appt_scheduled_slot_uniq`` constraint rejects a second
+scheduled appointment at the same start, and the recomputation, in the
+appointment's own transaction, raises ``SlotConflict`` when the saved
+appointment overlaps another one. Either way nothing is written.
+"""
+
+from datetime import date as date_type, time as time_type, timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import router, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from . import schedule
+from .models import Appointment, SlotConflict, SlotOccupancy
+
+SLOT_SEARCH_DEFAULTS = {
+    # Working day of doctors without WorkingHours, and the slot step in minutes.
+    'DAY_START': '09:00',
+    'DAY_END': '17:00',
+    'SLOT_MINUTES': 30,
+    # Length of each appointment type, where it differs from SLOT_MINUTES.
+    # Changing it requires rebuild_slot_index.
+    'TYPE_MINUTES': {},
+    # Largest search: days covered and doctors considered.
+    'MAX_DAYS': 31,
+    'MAX_DOCTORS': 100,
+    # Most appointments booked by one series (appointments.series).
+    'MAX_OCCURRENCES': 100,
+}
+
+# Minutes per bitmap bit. Changing it requires rebuild_slot_index.
+RESOLUTION_MINUTES = 5
+DAY_BITS = 24 * 60 // RESOLUTION_MINUTES
+BITMAP_BYTES = (DAY_BITS + 7) // 8
+
+
+def slot_settings():
+    return {**SLOT_SEARCH_DEFAULTS, **getattr(settings, 'APPOINTMENT_SLOTS', {})}
+
+
+def type_minutes(appointment_type=None, config=None):
+    """How long an appointment of ``appointment_type`` takes."""
+    config = config or slot_settings()
+    return config['TYPE_MINUTES'].get(appointment_type, config['SLOT_MINUTES'])
+
+
+def minute_of_day(value):
+    """Minutes since midnight of a ``time`` or an ``HH:MM[:SS]`` string."""
+    if isinstance(value, str):
+        value = time_type.fromisoformat(value)
+    return value.hour * 60 + value.minute
+
+
+def format_minute(minute):
+    return f'{minute // 60:02d}:{minute % 60:02d}'
+
+
+def span_mask(start, minutes):
+    """Bits covering ``minutes`` from minute ``start`` of the day."""
+    first = start // RESOLUTION_MINUTES
+    last = min(-(-(start + minutes) // RESOLUTION_MINUTES), DAY_BITS)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def to_bitmap(mask):
+    return mask.to_bytes(BITMAP_BYTES, 'little')
+
+
+def from_bitmap(data):
+    return int.from_bytes(bytes(data), 'little') if data else 0
+
+
+@lru_cache(maxsize=1024)
+def candidates(hours, minutes, step):
+    """``(minute, mask)`` of every slot of ``minutes`` within the ``hours`` intervals."""
+    return tuple(
+        (minute, span_mask(minute, minutes))
+        for start, end in hours
+        for minute in range(start, end - minutes + 1, step)
+    )
+
+
+def free(hours, occupied, minutes, step, after=None):
+    """Minutes of the free slots within ``hours``, starting after ``after``."""
+    return [
+        minute for minute, mask in candidates(tuple(hours), minutes, step)
+        if not occupied & mask and (after is None or minute > after)
+    ]
+
+
+def schedules(doctor_ids, start, end, config=None):
+    """``appointments.schedule.load`` with the configured default day."""
+    config = config or slot_settings()
+    default_hours = (minute_of_day(config['DAY_START']), minute_of_day(config['DAY_END']))
+    return schedule.load(doctor_ids, start, end, default_hours)
+
+
+# Keeping the bitmaps in step
+
+def _as_date(value):
+    if isinstance(value, str):
+        return date_type.fromisoformat(value)
+    return value
+
+
+def day_mask(rows):
+    """Bits taken by ``(time, type)`` rows of appointments."""
+    config = slot_settings()
+    mask = 0
+    for value, appointment_type in rows:
+        mask |= span_mask(minute_of_day(value), type_minutes(appointment_type, config))
+    return mask
+
+
+def refresh(doctor_id, day, using=None, appointment_id=None):
+    """Recompute one doctor's day from its scheduled appointments.
+
+    Raises ``SlotConflict`` if the appointment ``appointment_id`` overlaps
+    another scheduled appointment of the day.
+    """
+    using = using or router.db_for_write(SlotOccupancy)
+    day = _as_date(day)
+    with transaction.atomic(using=using):
+        row, _ = SlotOccupancy.objects.using(using).select_for_update().get_or_create(
+            doctor_id=doctor_id, date=day, defaults={'bitmap': to_bitmap(0)}
+        )
+        rows = (
+            Appointment.objects.using(using)
+            .filter(doctor_id=doctor_id, date=day, status='scheduled')
+            .values_list('pk', 'time', 'type')
+        )
+        appointments = {pk: (value, appointment_type) for pk, value, appointment_type in rows}
+        own = appointments.pop(appointment_id, None)
+        mask = day_mask(appointments.values())
+        if own is not None:
+            own_mask = day_mask([own])
+            if mask & own_mask:
+                raise SlotConflict('Time slot is not available')
+            mask |= own_mask
+        if mask:
+            row.bitmap = to_bitmap(mask)
+            row.save(update_fields=['bitmap'])
+        else:
+            row.delete()
+
+
+def refresh_days(keys, using=None):
+    """``refresh`` every ``(doctor id, date)`` in ``keys``, e.g. after a bulk insert."""
+    for doctor_id, day in set(keys):
+        refresh(doctor_id, day, using)
+
+
+def rebuild(using=None, start=None):
+    """Recompute every bitmap (from ``start`` on, if given); returns the rows written."""
+    using = using or router.db_for_write(SlotOccupancy)
+    appointments = Appointment.objects.using(using).filter(status='scheduled')
+    bitmaps = SlotOccupancy.objects.using(using)
+    if start is not None:
+        appointments = appointments.filter(date__gte=start)
+        bitmaps = bitmaps.filter(date__gte=start)
+
+    masks = {}
+    config = slot_settings()
+    rows = appointments.order_by().values_list('doctor_id', 'date', 'time', 'type')
+    for doctor_id, day, value, appointment_type in rows.iterator(chunk_size=10000):
+        key = (doctor_id, day)
+        masks[key] = masks.get(key, 0) | span_mask(minute_of_day(value), type_minutes(appointment_type, config))
+
+    bitmaps.delete()
+    SlotOccupancy.objects.using(using).bulk_create(
+        [SlotOccupancy(doctor_id=doctor_id, date=day, bitmap=to_bitmap(mask))
+         for (doctor_id, day), mask in masks.items()],
+        batch_size=5000,
+    )
+    return len(masks)
+
+
+# Reading
+
+def occupancy(doctor_ids, start, end, using=None):
+    """``{(doctor id, date): occupied mask}`` for days that have appointments."""
+    using = using or router.db_for_read(SlotOccupancy)
+    rows = SlotOccupancy.objects.using(using).filter(
+        doctor_id__in=doctor_ids, date__gte=start, date__lte=end
+    ).values_list('doctor_id', 'date', 'bitmap')
+    return {(doctor_id, day): from_bitmap(bitmap) for doctor_id, day, bitmap in rows}
+
+
+def free_slots(doctor_id, day, appointment_type=None):
+    """``HH:MM`` of every free slot of one doctor's day."""
+    config = slot_settings()
+    minutes = type_minutes(appointment_type, config)
+    hours = schedules([doctor_id], day, day, config)[doctor_id].hours(day)
+    occupied = occupancy([doctor_id], day, day).get((doctor_id, day), 0)
+    step = min(minutes, config['SLOT_MINUTES'])
+    return [format_minute(minute) for minute in free(hours, occupied, minutes, step)]
+
+
+def is_working(doctor_id, day, value, appointment_type=None):
+    """Whether an appointment at ``value`` on ``day`` falls within the doctor's hours."""
+    day = _as_date(day)
+    start = minute_of_day(value)
+    end = start + type_minutes(appointment_type)
+    hours = schedules([doctor_id], day, day)[doctor_id].hours(day)
+    return any(first <= start and end <= last for first, last in hours)
+
+
+def search_doctors(doctor_ids=None, specialization=None, department=None):
+    """Active doctors to search, as ``values()`` rows."""
+    doctors = get_user_model().objects.filter(role='doctor', status='active')
+    if doctor_ids:
+        doctors = doctors.filter(pk__in=doctor_ids)
+    if specialization:
+        doctors = doctors.filter(specialization__icontains=specialization)
+    if department:
+        doctors = doctors.filter(department__icontains=department)
+    return list(
+        doctors.order_by('pk').values('id', 'first_name', 'last_name', 'specialization', 'department')
+        [:slot_settings()['MAX_DOCTORS']]
+    )
+
+
+def search(doctors, start, end, earliest=None, now=None, appointment_type=None):
+    """Free slots of ``doctors`` (``search_doctors`` rows) from ``start`` to ``end``.
+
+    Slots are as long as ``appointment_type`` takes, and those at or before
+    ``now`` (a local datetime) are skipped. With ``earliest``, returns only
+    that many of the soonest slots across all doctors; otherwise every free
+    slot, per doctor and day.
+    """
+    config = slot_settings()
+    minutes = type_minutes(appointment_type, config)
+    step = min(minutes, config['SLOT_MINUTES'])
+    doctor_ids = [doctor['id'] for doctor in doctors]
+    hours = schedules(doctor_ids, start, end, config)
+    taken = occupancy(doctor_ids, start, end)
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+    def free_minutes(doctor, day):
+        after = None
+        if now is not None:
+            if day < now.date():
+                return []
+            if day == now.date():
+                after = now.hour * 60 + now.minute
+        working = hours[doctor['id']].hours(day)
+        return free(working, taken.get((doctor['id'], day), 0), minutes, step, after)
+
+    def name(doctor):
+        return f"{doctor['first_name']} {doctor['last_name']}".strip()
+
+    if earliest is not None:
+        found = []
+        for day in days:
+            for doctor in doctors:
+                found.extend((day, minute, doctor) for minute in free_minutes(doctor, day)[:earliest])
+            if len(found) >= earliest:
+                break
+        found.sort(key=lambda slot: (slot[0], slot[1], slot[2]['id']))
+        return [
+            {'doctor_id': doctor['id'], 'doctor_name': name(doctor), 'specialization': doctor['specialization'],
+             'date': day, 'time': format_minute(minute)}
+            for day, minute, doctor in found[:earliest]
+        ]
+
+    results = []
+    for doctor in doctors:
+        free_days = []
+        for day in days:
+            starts = free_minutes(doctor, day)
+            if starts:
+                free_days.append({'date': day, 'slots': [format_minute(minute) for minute in starts]})
+        results.append({
+            'doctor_id': doctor['id'],
+            'doctor_name': name(doctor),
+            'specialization': doctor['specialization'],
+            'department': doctor['department'],
+            'days': free_days,
+        })
+    return results
+
+
+# Signals. The day an appointment leaves and the day it enters are both
+# recomputed; each recomputation is cheap (one day of one doctor), and the
+# one it enters rejects an overlap with ``SlotConflict``.
+
+TRACKED_FIELDS = {'doctor', 'doctor_id', 'date', 'time', 'type', 'status'}
+
+
+def _state(doctor_id, day, value, appointment_type, status):
+    # Views may assign request strings to date and time before saving.
+    if isinstance(value, str):
+        value = time_type.fromisoformat(value)
+    return (doctor_id, _as_date(day), value, appointment_type, status)
+
+
+def _before_save(sender, instance, using, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not TRACKED_FIELDS & set(update_fields):
+        return
+    previous = None
+    if instance.pk is not None:
+        previous = (
+            Appointment.objects.using(using).filter(pk=instance.pk)
+            .values_list('doctor_id', 'date', 'time', 'type', 'status').first()
+        )
+    instance._slot_previous = previous and _state(*previous)
+
+
+def _saved(sender, instance, using, raw=False, **kwargs):
+    if raw or '_slot_previous' not in instance.__dict__:
+        return
+    previous = instance.__dict__.pop('_slot_previous')
+    current = _state(instance.doctor_id, instance.date, instance.time, instance.type, instance.status)
+    if previous == current:
+        return
+    left = previous is not None and previous[4] == 'scheduled' and (
+        current[4] != 'scheduled' or previous[:2] != current[:2]
+    )
+    if left:
+        refresh(previous[0], previous[1], using)
+    if current[4] == 'scheduled':
+        refresh(current[0], current[1], using, appointment_id=instance.pk)
+
+
+def _deleted(sender, instance, using, **kwargs):
+    if instance.status == 'scheduled':
+        refresh(instance.doctor_id, instance.date, using)
+
+
+def connect_signals():
+    pre_save.connect(_before_save, sender=Appointment, dispatch_uid='appointments.slots.before_save')
+    post_save.connect(_saved, sender=Appointment, dispatch_uid='appointments.slots.saved')
+    post_delete.connect(_deleted, sender=Appointment, dispatch_uid='appointments.slots.deleted')
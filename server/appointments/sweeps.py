@@ -0,0 +1,21 @@
+"""
+Batch sweeps (core.batch) for appointments.
+"""
+
+from django.utils import timezone
+
+from core.cache import invalidate_models
+
+from .models import Appointment, SlotOccupancy
+
+
+def mark_no_shows(batch):
+    """Appointments still scheduled from before today become no-shows."""
+    today = timezone.localdate(batch.now)
+    past = Appointment.objects.filter(status='scheduled', date__lt=today)
+    updated = batch.update_in_chunks(past, status='no_show', updated_at=batch.now)
+    if updated:
+        # No day before today has a scheduled appointment left to occupy it.
+        SlotOccupancy.objects.using(batch.using).filter(date__lt=today).delete()
+        invalidate_models(Appointment)
+    return {'no_show': updated, 'before': today.isoformat()}
@@ -0,0 +1,446 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from core.batch import acquire_lease, run_job
+from patients.models import Patient
+from . import slots
+from .models import Appointment, ScheduleException, SlotConflict, SlotOccupancy, WorkingHours
+from .schedule import IntervalTree
+
+
+class BookingTests(TransactionTestCase):
+    """Bookings are refused by the database write, not by a query before it."""
+
+    THREADS = 8
+
+    def setUp(self):
+        self.doctor = User.objects.create_user('doctor', password='x', role='doctor')
+        self.receptionist = User.objects.create_user('receptionist', password='x', role='receptionist')
+        self.patient = Patient.objects.create(
+            name='Test Patient', age=40, gender='female', phone='555-0100',
+            email='patient@example.com', address='1 Test Street'
+        )
+        self.date = timezone.localdate() + timedelta(days=7)
+
+    def book(self, time='10:00', type='consultation'):
+        client = APIClient()
+        client.force_authenticate(self.receptionist)
+        return client.post('/api/appointments/', {
+            'patient': self.patient.id,
+            'doctor': self.doctor.id,
+            'date': self.date.isoformat(),
+            'time': time,
+            'type': type,
+        }, format='json')
+
+    def test_same_slot_from_many_threads(self):
+        barrier = threading.Barrier(self.THREADS)
+        codes = []
+
+        def receptionist():
+            try:
+                barrier.wait()
+                codes.append(self.book().status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=receptionist) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(codes), [201] + [409] * (self.THREADS - 1))
+        self.assertEqual(Appointment.objects.filter(doctor=self.doctor, status='scheduled').count(), 1)
+        self.assertNotIn('10:00', slots.free_slots(self.doctor.id, self.date))
+
+    def test_no_query_for_the_slot_before_the_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.book().status_code, 201)
+        statements = [query['sql'] for query in queries if '"appointments"' in query['sql']]
+        self.assertTrue(statements[0].startswith('INSERT'), statements[0])
+
+    def test_cancelled_slot_can_be_rebooked(self):
+        first = self.book().json()
+        Appointment.objects.filter(pk=first['id']).update(status='cancelled')
+        self.assertEqual(self.book().status_code, 201)
+
+    def test_overlapping_appointment_is_a_conflict(self):
+        self.assertEqual(self.book('13:00', 'surgery').status_code, 201)
+        response = self.book('14:00')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Appointment.objects.count(), 1)
+        self.assertEqual(self.book('15:00').status_code, 201)
+
+
+
+class SlotOccupancyTests(TestCase):
+    """The bitmaps follow appointments as they are booked, moved and cancelled."""
+
+    def setUp(self):
+        self.doctor = User.objects.create_user('doctor', password='x', role='doctor')
+        self.receptionist = User.objects.create_user('receptionist', password='x', role='receptionist')
+        self.patient = Patient.objects.create(
+            name='Test Patient', age=40, gender='female', phone='555-0100',
+            email='patient@example.com', address='1 Test Street'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.receptionist)
+        self.date = timezone.localdate() + timedelta(days=7)
+        self.appointment = Appointment.objects.create(
+            patient=self.patient, doctor=self.doctor, date=self.date, time='09:00', type='consultation'
+        )
+
+    def test_booking_fills_the_slot(self):
+        self.assertNotIn('09:00', slots.free_slots(self.doctor.id, self.date))
+        self.assertIn('09:30', slots.free_slots(self.doctor.id, self.date))
+        response = self.client.get('/api/appointments/slot_search/', {
+            'doctors': self.doctor.id, 'start_date': self.date.isoformat(), 'earliest': 1,
+        })
+        self.assertEqual(response.json()['earliest'][0]['time'], '09:30')
+
+    def test_reschedule_moves_the_bits(self):
+        later = self.date + timedelta(days=1)
+        response = self.client.patch(f'/api/appointments/{self.appointment.pk}/reschedule/', {
+            'date': later.isoformat(), 'time': '11:00',
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(SlotOccupancy.objects.filter(doctor=self.doctor, date=self.date).exists())
+        self.assertNotIn('11:00', slots.free_slots(self.doctor.id, later))
+
+    def test_cancel_and_delete_free_the_slot(self):
+        other = Appointment.objects.create(
+            patient=self.patient, doctor=self.doctor, date=self.date, time='10:00', type='consultation'
+        )
+        self.appointment.status = 'cancelled'
+        self.appointment.save()
+        self.assertIn('09:00', slots.free_slots(self.doctor.id, self.date))
+        other.delete()
+        self.assertFalse(SlotOccupancy.objects.filter(doctor=self.doctor).exists())
+
+    def test_overlap_raises_slot_conflict(self):
+        with self.assertRaises(SlotConflict):
+            Appointment.objects.create(
+                patient=self.patient, doctor=self.doctor, date=self.date, time='09:15', type='follow-up'
+            )
+        self.assertEqual(Appointment.objects.count(), 1)
+        self.assertEqual(
+            slots.from_bitmap(SlotOccupancy.objects.get(doctor=self.doctor, date=self.date).bitmap),
+            slots.span_mask(9 * 60, 30),
+        )
+
+    def test_only_a_taken_slot_is_a_conflict(self):
+        with self.assertRaises(SlotConflict):
+            Appointment.objects.create(
+                patient=self.patient, doctor=self.doctor, date=self.date, time='09:00', type='consultation'
+            )
+        with self.assertRaises(IntegrityError) as raised:
+            Appointment.objects.create(patient=self.patient, doctor=self.doctor, date=self.date, time='12:00', type=None)
+        self.assertNotIsInstance(raised.exception, SlotConflict)
+
+class WorkingHoursTests(TestCase):
+    """Templates and exceptions resolve into each day's working intervals."""
+
+    def setUp(self):
+        self.doctor = User.objects.create_user('doctor', password='x', role='doctor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+        # A Monday, with a split shift on Mondays
+        self.monday = timezone.localdate() + timedelta(days=7)
+        self.monday -= timedelta(days=self.monday.weekday())
+        WorkingHours.objects.create(doctor=self.doctor, weekday=0, start_time='08:00', end_time='12:00')
+        WorkingHours.objects.create(doctor=self.doctor, weekday=0, start_time='13:00', end_time='17:00')
+
+    def hours(self, day):
+        return [
+            (slots.format_minute(start), slots.format_minute(end))
+            for start, end in slots.schedules([self.doctor.id], day, day)[self.doctor.id].hours(day)
+        ]
+
+    def test_split_shift(self):
+        self.assertEqual(self.hours(self.monday), [('08:00', '12:00'), ('13:00', '17:00')])
+        self.assertEqual(self.hours(self.monday + timedelta(days=1)), [])
+        free = slots.free_slots(self.doctor.id, self.monday)
+        self.assertIn('11:30', free)
+        self.assertNotIn('12:00', free)
+        self.assertEqual(free[free.index('11:30') + 1], '13:00')
+
+    def test_leave_and_extra_hours(self):
+        next_monday = self.monday + timedelta(days=7)
+        ScheduleException.objects.create(
+            doctor=self.doctor, kind='unavailable', start_date=self.monday, end_date=self.monday, reason='Leave'
+        )
+        ScheduleException.objects.create(
+            doctor=self.doctor, kind='unavailable', start_date=next_monday, end_date=next_monday,
+            start_time='10:00', end_time='14:00'
+        )
+        ScheduleException.objects.create(
+            doctor=self.doctor, kind='available', start_date=next_monday, end_date=next_monday,
+            start_time='17:00', end_time='19:00'
+        )
+        self.assertEqual(self.hours(self.monday), [])
+        self.assertEqual(self.hours(next_monday), [('08:00', '10:00'), ('14:00', '19:00')])
+
+        response = self.client.get('/api/working-hours/resolved/', {
+            'doctor_id': self.doctor.id, 'start_date': self.monday.isoformat(), 'days': 8,
+        })
+        days = response.json()['days']
+        self.assertEqual(days[0]['hours'], [])
+        self.assertEqual(days[7]['hours'], [['08:00', '10:00'], ['14:00', '19:00']])
+
+    def test_template_validity(self):
+        WorkingHours.objects.filter(doctor=self.doctor, start_time='13:00').update(valid_until=self.monday)
+        self.assertEqual(self.hours(self.monday), [('08:00', '12:00'), ('13:00', '17:00')])
+        self.assertEqual(self.hours(self.monday + timedelta(days=7)), [('08:00', '12:00')])
+
+    def test_interval_tree_matches_a_scan(self):
+        intervals = [
+            (start, start + length, (start, length)) for start in range(0, 200, 7) for length in (1, 5, 30)
+        ]
+        tree = IntervalTree(intervals)
+        for start, end in [(0, 1), (10, 11), (50, 80), (150, 400), (300, 301)]:
+            expected = sorted(value for first, last, value in intervals if first < end and start < last)
+            self.assertEqual(sorted(tree.overlapping(start, end)), expected)
+
+class SchedulePermissionTests(TestCase):
+    """Admins edit any doctor's schedule, doctors their own, others nobody's."""
+
+    def setUp(self):
+        self.doctor = User.objects.create_user('doctor', password='x', role='doctor')
+        self.other = User.objects.create_user('other', password='x', role='doctor')
+        self.admin = User.objects.create_user('admin', password='x', role='admin')
+        self.nurse = User.objects.create_user('nurse', password='x', role='nurse')
+        self.hours = WorkingHours.objects.create(doctor=self.other, weekday=0, start_time='08:00', end_time='12:00')
+        self.leave = ScheduleException.objects.create(
+            doctor=self.other, kind='unavailable', start_date=timezone.localdate(), end_date=timezone.localdate()
+        )
+        self.client = APIClient()
+
+    def as_user(self, user):
+        self.client.force_authenticate(user)
+        return self.client
+
+    def hours_data(self, doctor):
+        return {'doctor': doctor.pk, 'weekday': 1, 'start_time': '09:00', 'end_time': '13:00'}
+
+    def test_other_roles_cannot_write(self):
+        client = self.as_user(self.nurse)
+        self.assertEqual(client.post('/api/working-hours/', self.hours_data(self.other)).status_code, 403)
+        self.assertEqual(client.patch(f'/api/working-hours/{self.hours.pk}/', {'end_time': '18:00'}).status_code, 403)
+        self.assertEqual(client.delete(f'/api/working-hours/{self.hours.pk}/').status_code, 403)
+        self.assertEqual(client.delete(f'/api/schedule-exceptions/{self.leave.pk}/').status_code, 403)
+        self.assertTrue(ScheduleException.objects.filter(pk=self.leave.pk).exists())
+        self.assertEqual(WorkingHours.objects.get(pk=self.hours.pk).end_time.isoformat(), '12:00:00')
+        # Reads stay open.
+        self.assertEqual(client.get('/api/working-hours/').json()['count'], 1)
+
+    def test_doctors_write_only_their_own_rows(self):
+        client = self.as_user(self.doctor)
+        response = client.post('/api/working-hours/', self.hours_data(self.other))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['doctor'], self.doctor.pk)
+
+        self.assertEqual(client.patch(f'/api/working-hours/{self.hours.pk}/', {'end_time': '18:00'}).status_code, 404)
+        self.assertEqual(client.delete(f'/api/schedule-exceptions/{self.leave.pk}/').status_code, 404)
+        own = response.json()['id']
+        response = client.patch(f'/api/working-hours/{own}/', {'doctor': self.other.pk, 'end_time': '14:00'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(WorkingHours.objects.get(pk=own).doctor, self.doctor)
+
+    def test_admins_write_any_doctors_rows(self):
+        client = self.as_user(self.admin)
+        response = client.post('/api/working-hours/', self.hours_data(self.other))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['doctor'], self.other.pk)
+        self.assertEqual(client.delete(f'/api/schedule-exceptions/{self.leave.pk}/').status_code, 204)
+
+class SlotIndexTests(TestCase):
+    """``rebuild_slot_index`` repairs bitmaps after writes that skip signals."""
+
+    def setUp(self):
+        self.doctor = User.objects.create_user('doctor', password='x', role='doctor')
+        self.patient = Patient.objects.create(
+            name='Test Patient', age=40, gender='female', phone='555-0100',
+            email='patient@example.com', address='1 Test Street'
+        )
+        self.date = timezone.localdate() + timedelta(days=7)
+
+    def bulk_book(self, *bookings):
+        Appointment.objects.bulk_create([
+            Appointment(patient=self.patient, doctor=self.doctor, date=day, time=value, type=kind, status=status)
+            for day, value, kind, status in bookings
+        ])
+
+    def bitmap(self, day):
+        row = SlotOccupancy.objects.filter(doctor=self.doctor, date=day).first()
+        return slots.from_bitmap(row.bitmap) if row else None
+
+    def test_rebuild_writes_bitmaps_of_scheduled_appointments(self):
+        self.bulk_book(
+            (self.date, '10:00', 'consultation', 'scheduled'),
+            (self.date, '13:00', 'surgery', 'scheduled'),
+            (self.date, '16:00', 'consultation', 'cancelled'),
+        )
+        self.assertIsNone(self.bitmap(self.date))
+        call_command('rebuild_slot_index', stdout=StringIO())
+
+        expected = slots.span_mask(10 * 60, 30) | slots.span_mask(13 * 60, 120)
+        self.assertEqual(self.bitmap(self.date), expected)
+        free = slots.free_slots(self.doctor.id, self.date)
+        self.assertNotIn('10:00', free)
+        self.assertNotIn('14:30', free)
+        self.assertIn('16:00', free)
+        self.assertEqual(Appointment.objects.count(), 3)
+
+    def test_rebuild_from_a_date_keeps_earlier_rows(self):
+        later = self.date + timedelta(days=1)
+        self.bulk_book((self.date, '10:00', 'consultation', 'scheduled'), (later, '11:00', 'follow-up', 'scheduled'))
+        SlotOccupancy.objects.create(doctor=self.doctor, date=self.date, bitmap=slots.to_bitmap(1))
+
+        self.assertEqual(slots.rebuild(start=later), 1)
+        self.assertEqual(self.bitmap(self.date), 1)
+        self.assertEqual(self.bitmap(later), slots.span_mask(11 * 60, 15))
+
+class SeriesBookingTests(TestCase):
+
+    def setUp(self):
+        self.doctor = User.objects.create_user('doctor', password='x', role='doctor')
+        self.receptionist = User.objects.create_user('receptionist', password='x', role='receptionist')
+        self.patient = Patient.objects.create(
+            name='Test Patient', age=40, gender='female', phone='555-0100',
+            email='patient@example.com', address='1 Test Street'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.receptionist)
+        # A Monday, so the rule below starts on its first day
+        self.start = timezone.localdate() + timedelta(days=7)
+        self.start -= timedelta(days=self.start.weekday())
+
+    def book_series(self, **data):
+        return self.client.post('/api/appointments/book_series/', {
+            'patient': self.patient.id,
+            'doctor': self.doctor.id,
+            'type': 'follow-up',
+            'rule': 'FREQ=WEEKLY;BYDAY=MO,WE,FR;COUNT=6',
+            'start_date': self.start.isoformat(),
+            'time': '10:00',
+            **data,
+        }, format='json')
+
+    def test_books_free_occurrences_and_reports_conflicts(self):
+        wednesday = self.start + timedelta(days=2)
+        Appointment.objects.create(
+            patient=self.patient, doctor=self.doctor, date=wednesday, time='10:00', type='consultation'
+        )
+        response = self.book_series()
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data['requested'], 6)
+        self.assertEqual(len(data['created']), 5)
+        self.assertEqual(data['conflicts'], [
+            {'date': wednesday.isoformat(), 'time': '10:00', 'error': 'Time slot is not available'}
+        ])
+        friday = self.start + timedelta(days=4)
+        self.assertNotIn('10:00', slots.free_slots(self.doctor.id, friday, 'follow-up'))
+
+    def test_all_or_nothing(self):
+        self.assertEqual(self.book_series(rule='FREQ=DAILY;COUNT=2').status_code, 201)
+        response = self.book_series(partial=False)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(len(response.json()['conflicts']), 1)
+        self.assertEqual(Appointment.objects.count(), 2)
+
+    def test_invalid_rule(self):
+        response = self.book_series(rule='FREQ=MONTHLY;COUNT=3')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('rule', response.json())
+
+
+class ConcurrentSeriesTests(TransactionTestCase):
+    """Overlapping series booked at once: exactly one of them gets the time."""
+
+    THREADS = 6
+
+    def setUp(self):
+        self.doctor = User.objects.create_user('doctor', password='x', role='doctor')
+        self.receptionist = User.objects.create_user('receptionist', password='x', role='receptionist')
+        self.patient = Patient.objects.create(
+            name='Test Patient', age=40, gender='female', phone='555-0100',
+            email='patient@example.com', address='1 Test Street'
+        )
+        self.start = timezone.localdate() + timedelta(days=7)
+
+    def book_series(self, time):
+        client = APIClient()
+        client.force_authenticate(self.receptionist)
+        return client.post('/api/appointments/book_series/', {
+            'patient': self.patient.id,
+            'doctor': self.doctor.id,
+            'type': 'surgery',
+            'rule': 'FREQ=DAILY;COUNT=3',
+            'start_date': self.start.isoformat(),
+            'time': time,
+        }, format='json')
+
+    def test_overlapping_series_with_different_start_times(self):
+        # Two-hour surgeries starting 15 minutes apart all overlap each other.
+        times = [f'{10 + minutes // 60}:{minutes % 60:02d}' for minutes in range(0, 15 * self.THREADS, 15)]
+        barrier = threading.Barrier(self.THREADS)
+        codes = []
+
+        def receptionist(time):
+            try:
+                barrier.wait()
+                codes.append(self.book_series(time).status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=receptionist, args=(time,)) for time in times]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(codes), [201] + [409] * (self.THREADS - 1))
+        booked = Appointment.objects.filter(doctor=self.doctor, status='scheduled')
+        self.assertEqual(booked.count(), 3)
+        self.assertEqual(len(set(booked.values_list('time', flat=True))), 1)
+
+
+class NoShowSweepTests(TestCase):
+
+    def setUp(self):
+        doctor = User.objects.create_user('doctor', password='x', role='doctor')
+        patient = Patient.objects.create(
+            name='Test Patient', age=40, gender='female', phone='555-0100',
+            email='patient@example.com', address='1 Test Street'
+        )
+        today = timezone.localdate()
+        self.past = Appointment.objects.create(
+            patient=patient, doctor=doctor, date=today - timedelta(days=1), time='10:00', type='consultation'
+        )
+        self.today = Appointment.objects.create(
+            patient=patient, doctor=doctor, date=today, time='10:00', type='consultation'
+        )
+
+    def test_past_scheduled_appointments_become_no_shows(self):
+        run = run_job('appointment_no_shows', 'node-a')
+        self.assertEqual((run.status, run.rows), ('succeeded', 1))
+        self.past.refresh_from_db()
+        self.today.refresh_from_db()
+        self.assertEqual((self.past.status, self.today.status), ('no_show', 'scheduled'))
+
+    def test_another_nodes_lease_skips_the_job(self):
+        self.assertTrue(acquire_lease('appointment_no_shows', 'node-b', 60))
+        self.assertIsNone(run_job('appointment_no_shows', 'node-a'))
+        self.past.refresh_from_db()
+        self.assertEqual(self.past.status, 'scheduled')
@@ -2,17 +2,29 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_time
 from django.db.models import Q, Count
 from datetime import datetime, timedelta
-from .models import Appointment
-from .serializers import AppointmentSerializer
+from core.aggregation import time_buckets
+from core.cache import cached_action
+from core.exports import ExportMixin
+from core.pagination import KeysetOptInPagination
+from core.replica import use_replica
+from . import series, slots
+from .models import Appointment, ScheduleException, SlotConflict, WorkingHours
+from .serializers import (
+    AppointmentSerializer, AppointmentSeriesSerializer, ScheduleExceptionSerializer, WorkingHoursSerializer,
+    appointment_projection
+)
 
-class AppointmentViewSet(viewsets.ModelViewSet):
+class AppointmentViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = Appointment.objects.all()
     serializer_class = AppointmentSerializer
+    list_projection = appointment_projection
+    pagination_class = KeysetOptInPagination
     
     def get_queryset(self):
-        queryset = Appointment.objects.all()
+        queryset = Appointment.objects.select_related('patient', 'doctor', 'created_by').all()
         
         # Filter appointments for doctors - only show their appointments
         if self.request.user.role == 'doctor':
@@ -48,21 +60,37 @@ class AppointmentViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
     
+    def slot_conflict(self):
+        return Response(
+            {'error': 'Time slot is not available'},
+            status=status.HTTP_409_CONFLICT
+        )
+    
+    def create(self, request, *args, **kwargs):
+        try:
+            return super().create(request, *args, **kwargs)
+        except SlotConflict:
+            return self.slot_conflict()
+    
+    def update(self, request, *args, **kwargs):
+        try:
+            return super().update(request, *args, **kwargs)
+        except SlotConflict:
+            return self.slot_conflict()
+    
     @action(detail=False, methods=['get'])
     def today(self, request):
         """Get today's appointments"""
         today = timezone.now().date()
         appointments = self.get_queryset().filter(date=today)
-        serializer = self.get_serializer(appointments, many=True)
-        return Response(serializer.data)
+        return self.list_response(appointments)
     
     @action(detail=False, methods=['get'])
     def tomorrow(self, request):
         """Get tomorrow's appointments"""
         tomorrow = timezone.now().date() + timedelta(days=1)
         appointments = self.get_queryset().filter(date=tomorrow)
-        serializer = self.get_serializer(appointments, many=True)
-        return Response(serializer.data)
+        return self.list_response(appointments)
     
     @action(detail=False, methods=['get'])
     def this_week(self, request):
@@ -70,8 +98,7 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         today = timezone.now().date()
         week_end = today + timedelta(days=7)
         appointments = self.get_queryset().filter(date__range=[today, week_end])
-        serializer = self.get_serializer(appointments, many=True)
-        return Response(serializer.data)
+        return self.list_response(appointments)
     
     @action(detail=False, methods=['get'])
     def upcoming(self, request):
@@ -81,18 +108,18 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             date__gte=today,
             status='scheduled'
         )
-        serializer = self.get_serializer(appointments, many=True)
-        return Response(serializer.data)
+        return self.list_response(appointments)
     
     @action(detail=False, methods=['get'])
     def past(self, request):
         """Get past appointments"""
         today = timezone.now().date()
         appointments = self.get_queryset().filter(date__lt=today)
-        serializer = self.get_serializer(appointments, many=True)
-        return Response(serializer.data)
+        return self.list_response(appointments)
     
     @action(detail=False, methods=['get'])
+    @cached_action(depends_on=['appointments.Appointment'])
+    @use_replica
     def analytics(self, request):
         """Get appointment analytics"""
         total_appointments = Appointment.objects.count()
@@ -111,15 +138,17 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         
         # Weekly appointments
         week_start = today - timedelta(days=today.weekday())
-        weekly_appointments = []
-        for i in range(7):
-            day = week_start + timedelta(days=i)
-            count = Appointment.objects.filter(date=day).count()
-            weekly_appointments.append({
-                'date': day.strftime('%Y-%m-%d'),
-                'day': day.strftime('%A'),
-                'count': count
-            })
+        weekly_appointments = [
+            {
+                'date': bucket['start'].strftime('%Y-%m-%d'),
+                'day': bucket['start'].strftime('%A'),
+                'count': bucket['count']
+            }
+            for bucket in time_buckets(
+                Appointment.objects.all(), 'date', 'day',
+                start=week_start, end=week_start + timedelta(days=6)
+            )
+        ]
         
         return Response({
             'total_appointments': total_appointments,
@@ -188,27 +217,59 @@ class AppointmentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Check if new slot is available
-        existing = Appointment.objects.filter(
-            doctor=appointment.doctor,
-            date=new_date,
-            time=new_time,
-            status='scheduled'
-        ).exclude(id=appointment.id)
+        try:
+            new_date, new_time = parse_date(new_date), parse_time(new_time)
+        except ValueError:
+            new_date = None
+        if new_date is None or new_time is None:
+            return Response(
+                {'error': 'Date must be an ISO date and time HH:MM'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        if existing.exists():
+        if not slots.is_working(appointment.doctor_id, new_date, new_time, appointment.type):
             return Response(
-                {'error': 'Time slot is not available'}, 
+                {'error': 'Doctor is not working at this time'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
         appointment.date = new_date
         appointment.time = new_time
-        appointment.save()
+        try:
+            appointment.save()
+        except SlotConflict:
+            return self.slot_conflict()
         
         serializer = self.get_serializer(appointment)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['post'])
+    def book_series(self, request):
+        """Book a recurring series or a list of appointments in one request"""
+        serializer = AppointmentSeriesSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        
+        try:
+            created, conflicts = series.book(
+                data['patient'],
+                data['doctor'],
+                [(occurrence['date'], occurrence['time']) for occurrence in data['occurrences']],
+                data['type'],
+                notes=data['notes'],
+                created_by=request.user,
+                partial=data['partial']
+            )
+        except SlotConflict:
+            return self.slot_conflict()
+        
+        return Response({
+            'requested': len(data['occurrences']),
+            'created': AppointmentSerializer(created, many=True).data,
+            'conflicts': conflicts
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_409_CONFLICT)
+    
     @action(detail=False, methods=['get'])
     def available_slots(self, request):
         """Get available appointment slots for a doctor on a specific date"""
@@ -221,28 +282,74 @@ class AppointmentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get existing appointments for the doctor on that date
-        existing_appointments = Appointment.objects.filter(
-            doctor_id=doctor_id,
-            date=date,
-            status='scheduled'
-        ).values_list('time', flat=True)
+        try:
+            doctor_id = int(doctor_id)
+            date = parse_date(date)
+        except ValueError:
+            date = None
+        if date is None:
+            return Response(
+                {'error': 'Doctor ID must be a number and date an ISO date'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Generate available time slots (9 AM to 5 PM, 30-minute intervals)
-        available_slots = []
-        start_time = datetime.strptime('09:00', '%H:%M').time()
-        end_time = datetime.strptime('17:00', '%H:%M').time()
+        appointment_type = request.query_params.get('type', None)
+        if appointment_type and appointment_type not in dict(Appointment.TYPE_CHOICES):
+            return Response(
+                {'error': 'Unknown appointment type'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        current_time = datetime.combine(datetime.today(), start_time)
-        end_datetime = datetime.combine(datetime.today(), end_time)
+        # Free slots of the doctor's working hours, from the occupancy bitmap
+        return Response({'available_slots': slots.free_slots(doctor_id, date, appointment_type)})
+    
+    @action(detail=False, methods=['get'])
+    def slot_search(self, request):
+        """Find free slots for several doctors over several days"""
+        config = slots.slot_settings()
+        params = request.query_params
+        try:
+            doctor_ids = [int(pk) for pk in params.get('doctors', '').split(',') if pk.strip()]
+            start_date = parse_date(params['start_date']) if params.get('start_date') else timezone.localdate()
+            days = int(params.get('days', 7))
+            earliest = int(params['earliest']) if params.get('earliest') else None
+        except ValueError:
+            start_date = None
+        if start_date is None:
+            return Response(
+                {'error': 'doctors must be ids, start_date an ISO date, days and earliest numbers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not 1 <= days <= config['MAX_DAYS'] or (earliest is not None and earliest < 1):
+            return Response(
+                {'error': f"days must be between 1 and {config['MAX_DAYS']}, earliest at least 1"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        appointment_type = params.get('type', None)
+        if appointment_type and appointment_type not in dict(Appointment.TYPE_CHOICES):
+            return Response(
+                {'error': 'Unknown appointment type'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        while current_time < end_datetime:
-            time_str = current_time.strftime('%H:%M')
-            if current_time.time() not in existing_appointments:
-                available_slots.append(time_str)
-            current_time += timedelta(minutes=30)
+        doctors = slots.search_doctors(
+            doctor_ids,
+            specialization=params.get('specialization', None),
+            department=params.get('department', None)
+        )
+        end_date = start_date + timedelta(days=days - 1)
+        results = slots.search(
+            doctors, start_date, end_date, earliest=earliest, now=timezone.localtime(),
+            appointment_type=appointment_type
+        )
         
-        return Response({'available_slots': available_slots})
+        return Response({
+            'start_date': start_date,
+            'end_date': end_date,
+            'slot_minutes': slots.type_minutes(appointment_type, config),
+            'doctors_searched': len(doctors),
+            ('earliest' if earliest is not None else 'doctors'): results
+        })
     
     @action(detail=False, methods=['get'])
     def doctor_schedule(self, request):
@@ -257,7 +364,7 @@ class AppointmentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        queryset = Appointment.objects.filter(doctor_id=doctor_id)
+        queryset = Appointment.objects.filter(doctor_id=doctor_id).select_related('patient', 'doctor', 'created_by')
         
         if start_date:
             queryset = queryset.filter(date__gte=start_date)
@@ -265,5 +372,112 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(date__lte=end_date)
         
         appointments = queryset.order_by('date', 'time')
-        serializer = self.get_serializer(appointments, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return self.list_response(appointments)
+
+class DoctorScheduleWriteMixin:
+    """Schedules are edited by admins, or by doctors for themselves."""
+    
+    schedule_editors = ('admin', 'doctor')
+    
+    def permission_denied_response(self):
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    def create(self, request, *args, **kwargs):
+        if request.user.role not in self.schedule_editors:
+            return self.permission_denied_response()
+        return super().create(request, *args, **kwargs)
+    
+    def update(self, request, *args, **kwargs):
+        # Doctors reach only their own rows through get_queryset.
+        if request.user.role not in self.schedule_editors:
+            return self.permission_denied_response()
+        return super().update(request, *args, **kwargs)
+    
+    def destroy(self, request, *args, **kwargs):
+        if request.user.role not in self.schedule_editors:
+            return self.permission_denied_response()
+        return super().destroy(request, *args, **kwargs)
+    
+    def perform_create(self, serializer):
+        if self.request.user.role == 'doctor':
+            serializer.save(doctor=self.request.user)
+        else:
+            serializer.save()
+    
+    def perform_update(self, serializer):
+        if self.request.user.role == 'doctor':
+            serializer.save(doctor=self.request.user)
+        else:
+            serializer.save()
+
+class WorkingHoursViewSet(DoctorScheduleWriteMixin, viewsets.ModelViewSet):
+    queryset = WorkingHours.objects.all()
+    serializer_class = WorkingHoursSerializer
+    
+    def get_queryset(self):
+        queryset = WorkingHours.objects.select_related('doctor').all()
+        
+        # Doctors only see their own hours
+        if self.request.user.role == 'doctor':
+            queryset = queryset.filter(doctor=self.request.user)
+        
+        doctor_id = self.request.query_params.get('doctor', None)
+        if doctor_id:
+            queryset = queryset.filter(doctor_id=doctor_id)
+        
+        return queryset
+    
+    @action(detail=False, methods=['get'])
+    def resolved(self, request):
+        """Get a doctor's working hours day by day, exceptions applied"""
+        config = slots.slot_settings()
+        try:
+            doctor_id = int(request.query_params.get('doctor_id', ''))
+            start_date = parse_date(request.query_params.get('start_date', '')) or timezone.localdate()
+            days = int(request.query_params.get('days', 7))
+        except ValueError:
+            doctor_id = None
+        if doctor_id is None or not 1 <= days <= config['MAX_DAYS']:
+            return Response(
+                {'error': f"Doctor ID is required, days between 1 and {config['MAX_DAYS']}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        end_date = start_date + timedelta(days=days - 1)
+        doctor_schedule = slots.schedules([doctor_id], start_date, end_date, config)[doctor_id]
+        hours = []
+        for offset in range(days):
+            day = start_date + timedelta(days=offset)
+            hours.append({
+                'date': day,
+                'hours': [
+                    [slots.format_minute(start), slots.format_minute(end)]
+                    for start, end in doctor_schedule.hours(day)
+                ]
+            })
+        return Response({'doctor_id': doctor_id, 'days': hours})
+
+class ScheduleExceptionViewSet(DoctorScheduleWriteMixin, viewsets.ModelViewSet):
+    queryset = ScheduleException.objects.all()
+    serializer_class = ScheduleExceptionSerializer
+    
+    def get_queryset(self):
+        queryset = ScheduleException.objects.select_related('doctor').all()
+        
+        # Doctors only see their own exceptions
+        if self.request.user.role == 'doctor':
+            queryset = queryset.filter(doctor=self.request.user)
+        
+        doctor_id = self.request.query_params.get('doctor', None)
+        if doctor_id:
+            queryset = queryset.filter(doctor_id=doctor_id)
+        
+        # Exceptions overlapping a date range
+        start_date = self.request.query_params.get('start_date', None)
+        if start_date:
+            queryset = queryset.filter(end_date__gte=start_date)
+        end_date = self.request.query_params.get('end_date', None)
+        if end_date:
+            queryset = queryset.filter(start_date__lte=end_date)
+        
+        return queryset
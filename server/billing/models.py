@@ -32,6 +32,11 @@ class Bill(models.Model):
     class Meta:
         db_table = 'bills'
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['date'], name='bill_date_idx'),
+            models.Index(fields=['status', 'date'], name='bill_status_date_idx'),
+            models.Index(fields=['patient', 'date'], name='bill_patient_date_idx'),
+        ]
 
 class Payment(models.Model):
     PAYMENT_METHODS = [
@@ -55,4 +60,8 @@ class Payment(models.Model):
     
     class Meta:
         db_table = 'payments'
-        ordering = ['-date']
\ No newline at end of file
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['date'], name='payment_date_idx'),
+            models.Index(fields=['bill', 'date'], name='payment_bill_date_idx'),
+        ]
\ No newline at end of file
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from core.projections import Projection
 from .models import Bill, Payment
 
 class PaymentSerializer(serializers.ModelSerializer):
@@ -33,4 +34,6 @@ class BillSerializer(serializers.ModelSerializer):
     def validate_total_amount(self, value):
         if value <= 0:
             raise serializers.ValidationError("Total amount must be greater than 0")
-        return value
\ No newline at end of file
+        return value
+
+payment_projection = Projection(PaymentSerializer)
@@ -5,15 +5,24 @@ from django.utils import timezone
 from django.db.models import Sum, Count, Q
 from decimal import Decimal
 from datetime import datetime, timedelta
+from django.utils.dateparse import parse_date
+from core.dates import day_range, start_of_day
+from core.aggregation import shift, time_buckets
+from core.cache import cached_action
+from core.exports import ExportMixin
+from core.pagination import KeysetOptInPagination
+from core.replica import use_replica
 from .models import Bill, Payment
-from .serializers import BillSerializer, PaymentSerializer
+from .serializers import BillSerializer, PaymentSerializer, payment_projection
 
-class BillViewSet(viewsets.ModelViewSet):
+class BillViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = Bill.objects.all()
     serializer_class = BillSerializer
     
     def get_queryset(self):
-        queryset = Bill.objects.all()
+        queryset = Bill.objects.select_related('patient', 'created_by').prefetch_related(
+            'payments__processed_by'
+        ).all()
         
         # Filter by patient
         patient_id = self.request.query_params.get('patient', None)
@@ -46,16 +55,18 @@ class BillViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def pending(self, request):
         """Get pending bills"""
-        bills = Bill.objects.filter(status__in=['pending', 'partial'])
-        serializer = self.get_serializer(bills, many=True)
-        return Response(serializer.data)
+        bills = Bill.objects.filter(status__in=['pending', 'partial']).select_related(
+            'patient', 'created_by'
+        ).prefetch_related('payments__processed_by')
+        return self.list_response(bills)
     
     @action(detail=False, methods=['get'])
     def paid(self, request):
         """Get paid bills"""
-        bills = Bill.objects.filter(status='paid')
-        serializer = self.get_serializer(bills, many=True)
-        return Response(serializer.data)
+        bills = Bill.objects.filter(status='paid').select_related(
+            'patient', 'created_by'
+        ).prefetch_related('payments__processed_by')
+        return self.list_response(bills)
     
     @action(detail=False, methods=['get'])
     def overdue(self, request):
@@ -64,11 +75,12 @@ class BillViewSet(viewsets.ModelViewSet):
         bills = Bill.objects.filter(
             status__in=['pending', 'partial'],
             date__lt=thirty_days_ago
-        )
-        serializer = self.get_serializer(bills, many=True)
-        return Response(serializer.data)
+        ).select_related('patient', 'created_by').prefetch_related('payments__processed_by')
+        return self.list_response(bills)
     
     @action(detail=False, methods=['get'])
+    @cached_action(depends_on=['billing.Bill', 'billing.Payment'])
+    @use_replica
     def revenue_stats(self, request):
         """Get comprehensive revenue statistics"""
         # Basic stats
@@ -84,19 +96,20 @@ class BillViewSet(viewsets.ModelViewSet):
         
         # Today's revenue
         today = timezone.now().date()
-        today_revenue = Payment.objects.filter(date__date=today).aggregate(
+        today_start, today_end = day_range(today)
+        today_revenue = Payment.objects.filter(date__gte=today_start, date__lt=today_end).aggregate(
             total=Sum('amount')
         )['total'] or 0
         
         # This month's revenue
         month_start = today.replace(day=1)
-        month_revenue = Payment.objects.filter(date__date__gte=month_start).aggregate(
+        month_revenue = Payment.objects.filter(date__gte=start_of_day(month_start)).aggregate(
             total=Sum('amount')
         )['total'] or 0
         
         # This year's revenue
         year_start = today.replace(month=1, day=1)
-        year_revenue = Payment.objects.filter(date__date__gte=year_start).aggregate(
+        year_revenue = Payment.objects.filter(date__gte=start_of_day(year_start)).aggregate(
             total=Sum('amount')
         )['total'] or 0
         
@@ -117,16 +130,16 @@ class BillViewSet(viewsets.ModelViewSet):
         )
         
         # Daily revenue for last 30 days
-        daily_revenue = []
-        for i in range(30):
-            date = today - timedelta(days=i)
-            revenue = Payment.objects.filter(date__date=date).aggregate(
-                total=Sum('amount')
-            )['total'] or 0
-            daily_revenue.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'revenue': float(revenue)
-            })
+        daily_revenue = [
+            {
+                'date': bucket['start'].strftime('%Y-%m-%d'),
+                'revenue': float(bucket['revenue'])
+            }
+            for bucket in reversed(time_buckets(
+                Payment.objects.all(), 'date', 'day',
+                start=today - timedelta(days=29), end=today, revenue=Sum('amount')
+            ))
+        ]
         
         return Response({
             'total_revenue': float(total_revenue),
@@ -237,50 +250,38 @@ class BillViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @cached_action(depends_on=['billing.Bill', 'billing.Payment', 'patients.Patient'])
+    @use_replica
     def analytics(self, request):
         """Get detailed billing analytics"""
         # Revenue trends
         today = timezone.now().date()
         
         # Weekly revenue
-        weekly_revenue = []
-        for i in range(7):
-            date = today - timedelta(days=i)
-            revenue = Payment.objects.filter(date__date=date).aggregate(
-                total=Sum('amount')
-            )['total'] or 0
-            weekly_revenue.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'day': date.strftime('%A'),
-                'revenue': float(revenue)
-            })
+        weekly_revenue = [
+            {
+                'date': bucket['start'].strftime('%Y-%m-%d'),
+                'day': bucket['start'].strftime('%A'),
+                'revenue': float(bucket['revenue'])
+            }
+            for bucket in reversed(time_buckets(
+                Payment.objects.all(), 'date', 'day',
+                start=today - timedelta(days=6), end=today, revenue=Sum('amount')
+            ))
+        ]
         
         # Monthly revenue for last 12 months
-        monthly_revenue = []
-        for i in range(12):
-            if i == 0:
-                month_start = today.replace(day=1)
-            else:
-                month_start = (today.replace(day=1) - timedelta(days=1)).replace(day=1)
-                for _ in range(i-1):
-                    month_start = (month_start - timedelta(days=1)).replace(day=1)
-            
-            if i == 11:
-                month_end = month_start.replace(day=28) + timedelta(days=4)
-                month_end = month_end - timedelta(days=month_end.day)
-            else:
-                next_month = month_start.replace(day=28) + timedelta(days=4)
-                month_end = next_month - timedelta(days=next_month.day)
-            
-            revenue = Payment.objects.filter(
-                date__date__range=[month_start, month_end]
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            monthly_revenue.append({
-                'month': month_start.strftime('%Y-%m'),
-                'month_name': month_start.strftime('%B %Y'),
-                'revenue': float(revenue)
-            })
+        monthly_revenue = [
+            {
+                'month': bucket['start'].strftime('%Y-%m'),
+                'month_name': bucket['start'].strftime('%B %Y'),
+                'revenue': float(bucket['revenue'])
+            }
+            for bucket in reversed(time_buckets(
+                Payment.objects.all(), 'date', 'month',
+                start=shift(today.replace(day=1), 'month', -11), end=today, revenue=Sum('amount')
+            ))
+        ]
         
         # Top paying patients
         top_patients = Bill.objects.values(
@@ -295,12 +296,14 @@ class BillViewSet(viewsets.ModelViewSet):
             'top_patients': list(top_patients)
         })
 
-class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
+class PaymentViewSet(ExportMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
+    list_projection = payment_projection
+    pagination_class = KeysetOptInPagination
     
     def get_queryset(self):
-        queryset = Payment.objects.all()
+        queryset = Payment.objects.select_related('processed_by').all()
         
         # Filter by bill
         bill_id = self.request.query_params.get('bill', None)
@@ -315,10 +318,12 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
         # Filter by date range
         start_date = self.request.query_params.get('start_date', None)
         end_date = self.request.query_params.get('end_date', None)
+        start_date = parse_date(start_date) if start_date else None
+        end_date = parse_date(end_date) if end_date else None
         if start_date:
-            queryset = queryset.filter(date__date__gte=start_date)
+            queryset = queryset.filter(date__gte=start_of_day(start_date))
         if end_date:
-            queryset = queryset.filter(date__date__lte=end_date)
+            queryset = queryset.filter(date__lt=day_range(end_date)[1])
         
         return queryset
     
@@ -326,11 +331,15 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
     def today(self, request):
         """Get today's payments"""
         today = timezone.now().date()
-        payments = Payment.objects.filter(date__date=today)
-        serializer = self.get_serializer(payments, many=True)
-        return Response(serializer.data)
+        today_start, today_end = day_range(today)
+        payments = Payment.objects.filter(
+            date__gte=today_start, date__lt=today_end
+        ).select_related('processed_by')
+        return self.list_response(payments)
     
     @action(detail=False, methods=['get'])
+    @cached_action(depends_on=['billing.Payment'])
+    @use_replica
     def analytics(self, request):
         """Get payment analytics"""
         total_payments = Payment.objects.count()
@@ -344,8 +353,9 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
         
         # Today's payments
         today = timezone.now().date()
-        today_payments = Payment.objects.filter(date__date=today).count()
-        today_amount = Payment.objects.filter(date__date=today).aggregate(
+        today_start, today_end = day_range(today)
+        today_payments = Payment.objects.filter(date__gte=today_start, date__lt=today_end).count()
+        today_amount = Payment.objects.filter(date__gte=today_start, date__lt=today_end).aggregate(
             total=Sum('amount')
         )['total'] or 0
         
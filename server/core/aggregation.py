@@ -0,0 +1,86 @@
+"""
+Time-bucketed aggregation.
+
+``time_buckets`` groups a queryset by day, week (starting Monday) or month
+of a date or datetime field and computes any aggregates per bucket in a
+single query. Buckets with no rows are filled with zeros. Datetimes are
+bucketed in the current time zone, so "today" means the same thing here as
+in ``timezone.localdate()``.
+"""
+
+from datetime import timedelta
+
+from django.db.models import Count, DateField, DateTimeField
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .dates import start_of_day
+
+PERIODS = ('day', 'week', 'month')
+
+
+def period_start(day, period):
+    """First day of the bucket that contains ``day``."""
+    if period == 'day':
+        return day
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    raise ValueError(f'Unknown period {period!r}; expected one of {PERIODS}')
+
+
+def shift(day, period, count=1):
+    """Move a bucket start ``count`` buckets forward (or back when negative)."""
+    if period == 'day':
+        return day + timedelta(days=count)
+    if period == 'week':
+        return day + timedelta(weeks=count)
+    if period == 'month':
+        month = day.year * 12 + day.month - 1 + count
+        return day.replace(year=month // 12, month=month % 12 + 1, day=1)
+    raise ValueError(f'Unknown period {period!r}; expected one of {PERIODS}')
+
+
+def bucket_starts(start, end, period):
+    """Start of every bucket from the one containing ``start`` to the one containing ``end``."""
+    current, last = period_start(start, period), period_start(end, period)
+    starts = []
+    while current <= last:
+        starts.append(current)
+        current = shift(current, period)
+    return starts
+
+
+def time_buckets(queryset, field, period='day', start=None, end=None, **measures):
+    """Aggregate ``queryset`` per ``period`` of ``field`` between two dates.
+
+    ``measures`` are aggregate expressions, e.g. ``revenue=Sum('amount')``;
+    the default is ``count=Count('pk')``. ``start`` and ``end`` are dates
+    (inclusive, default today) and are widened to whole buckets. Returns one
+    dict per bucket, oldest first::
+
+        [{'start': date(2024, 5, 1), 'revenue': Decimal('120.00')}, ...]
+    """
+    measures = measures or {'count': Count('pk')}
+    end = end or timezone.localdate()
+    start = start or end
+    starts = bucket_starts(start, end, period)
+    lower, upper = starts[0], shift(starts[-1], period)
+
+    if isinstance(queryset.model._meta.get_field(field), DateTimeField):
+        lower, upper = start_of_day(lower), start_of_day(upper)
+        bucket = Trunc(field, period, output_field=DateField(), tzinfo=timezone.get_current_timezone())
+    else:
+        bucket = Trunc(field, period, output_field=DateField())
+
+    rows = (
+        queryset.filter(**{f'{field}__gte': lower, f'{field}__lt': upper})
+        .order_by()
+        .annotate(bucket=bucket)
+        .values('bucket')
+        .annotate(**measures)
+    )
+    found = {row.pop('bucket'): row for row in rows}
+    empty = dict.fromkeys(measures, 0)
+    return [{'start': day, **found.get(day, empty)} for day in starts]
@@ -0,0 +1,21 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'core'
+
+    def ready(self):
+        from .instrumentation import install_serializer_timing
+        from .middleware import profiling_settings
+        from .nplusone import detection_settings, install_serializer_hooks
+        from .search import connect_signals as connect_search_signals
+        from .sqlite import apply_pragmas
+
+        if profiling_settings()['ENABLED']:
+            install_serializer_timing()
+        if detection_settings()['ENABLED']:
+            install_serializer_hooks()
+        connection_created.connect(apply_pragmas, dispatch_uid='core.sqlite.apply_pragmas')
+        connect_search_signals()
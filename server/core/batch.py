@@ -0,0 +1,312 @@
+"""
+Batch jobs: status sweeps run on a schedule, by one node at a time.
+
+Jobs are configured in ``settings.BATCH_JOBS['JOBS']`` as
+``name: {'task': 'app.module.function', 'at': 'HH:MM'}`` (daily, local
+time) or ``{'task': ..., 'every': minutes}``, with optional ``options``
+passed to the task. A task takes a ``BatchContext`` and returns a dict of
+details for the run history.
+
+Running a job:
+
+* takes the job's lease, a ``BatchLease`` row naming the holder and an
+  expiry. Of several nodes running the scheduler only the holder runs the
+  job; a node that dies leaves a lease that simply expires;
+* records a ``BatchRun`` with its start, finish, duration, outcome, rows
+  changed and chunks;
+* renews the lease after every chunk and stops with ``LeaseLost`` if
+  another node has taken it over.
+
+Tasks change rows in chunks: ``BatchContext.update_in_chunks`` issues one
+``UPDATE ... WHERE id IN (SELECT id ... LIMIT n)`` per chunk, each in its
+own short transaction, so a sweep over 100k rows never holds the write lock
+for long and its progress survives an interruption.
+
+A job is due when it has not started since its latest scheduled time, so a
+scheduler that was down catches up once. ``python manage.py
+run_batch_jobs`` runs jobs by name, ``--due`` or ``--scheduler``; with
+``IN_PROCESS`` the WSGI process runs ``start_scheduler`` in a thread.
+"""
+
+import logging
+import os
+import socket
+import threading
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections, router, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import BatchLease, BatchRun
+
+logger = logging.getLogger(__name__)
+
+BATCH_DEFAULTS = {
+    'JOBS': {},
+    'CHUNK_SIZE': 1000,
+    'LEASE_SECONDS': 300,
+    'POLL_SECONDS': 60,
+    'IN_PROCESS': False,
+}
+
+
+def batch_settings():
+    return {**BATCH_DEFAULTS, **getattr(settings, 'BATCH_JOBS', {})}
+
+
+def jobs():
+    return batch_settings()['JOBS']
+
+
+def default_holder():
+    """This process, as named in leases and run history."""
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+class LeaseLost(Exception):
+    """Another node took over a job's lease while the job was running."""
+
+
+# Leases
+
+def acquire_lease(name, holder, seconds, using=None):
+    """Take ``name``'s lease unless another holder's is still valid."""
+    using = using or router.db_for_write(BatchLease)
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=seconds)
+    with transaction.atomic(using=using):
+        taken = (
+            BatchLease.objects.using(using)
+            .filter(Q(expires_at__lte=now) | Q(holder=holder), name=name)
+            .update(holder=holder, expires_at=expires_at)
+        )
+        if taken:
+            return True
+        _, created = BatchLease.objects.using(using).get_or_create(
+            name=name, defaults={'holder': holder, 'expires_at': expires_at}
+        )
+        return created
+
+
+def renew_lease(name, holder, seconds, using=None):
+    using = using or router.db_for_write(BatchLease)
+    now = timezone.now()
+    renewed = (
+        BatchLease.objects.using(using)
+        .filter(name=name, holder=holder, expires_at__gt=now)
+        .update(expires_at=now + timedelta(seconds=seconds))
+    )
+    if not renewed:
+        raise LeaseLost(f'Lease of {name} lost by {holder}')
+
+
+def release_lease(name, holder, using=None):
+    using = using or router.db_for_write(BatchLease)
+    BatchLease.objects.using(using).filter(name=name, holder=holder).update(expires_at=timezone.now())
+
+
+# Running jobs
+
+class BatchContext:
+    """What a task gets: the run's start time, options, chunking and lease."""
+
+    def __init__(self, name, holder, options=None, using=None):
+        config = batch_settings()
+        self.name = name
+        self.holder = holder
+        self.options = options or {}
+        self.using = using or router.db_for_write(BatchRun)
+        self.now = timezone.now()
+        self.chunk_size = config['CHUNK_SIZE']
+        self.lease_seconds = config['LEASE_SECONDS']
+        self.rows = 0
+        self.chunks = 0
+
+    def heartbeat(self):
+        renew_lease(self.name, self.holder, self.lease_seconds, self.using)
+
+    def in_chunks(self, step):
+        """Call ``step(limit)`` until it handles fewer than ``limit`` rows.
+
+        ``step`` returns how many rows it changed. Returns the total.
+        """
+        total = 0
+        while True:
+            changed = step(self.chunk_size)
+            total += changed
+            self.rows += changed
+            self.chunks += 1
+            self.heartbeat()
+            if changed < self.chunk_size:
+                return total
+
+    def update_in_chunks(self, queryset, **values):
+        """``queryset.update(**values)``, one chunk per statement and transaction.
+
+        ``values`` must take the rows out of ``queryset``, or the same chunk
+        would be updated again and again.
+        """
+        model = queryset.model
+        queryset = queryset.using(self.using).order_by()
+
+        def step(limit):
+            with transaction.atomic(using=self.using):
+                return (
+                    model._base_manager.using(self.using)
+                    .filter(pk__in=queryset.values('pk')[:limit])
+                    .update(**values)
+                )
+
+        return self.in_chunks(step)
+
+
+def run_job(name, holder=None, using=None):
+    """Run one job now if its lease is free; returns the ``BatchRun`` or None."""
+    job = jobs()[name]
+    config = batch_settings()
+    holder = holder or default_holder()
+    using = using or router.db_for_write(BatchRun)
+    if not acquire_lease(name, holder, config['LEASE_SECONDS'], using):
+        return None
+
+    context = BatchContext(name, holder, job.get('options'), using)
+    run = BatchRun.objects.using(using).create(job=name, holder=holder, started_at=context.now)
+    try:
+        detail = import_string(job['task'])(context) or {}
+    except Exception as exc:
+        logger.exception('Batch job %s failed', name)
+        run.status = 'failed'
+        run.error = ''.join(traceback.format_exception_only(type(exc), exc)).strip()
+        run.detail = {}
+    else:
+        run.status = 'succeeded'
+        run.detail = detail
+    finally:
+        release_lease(name, holder, using)
+
+    run.finished_at = timezone.now()
+    run.duration = run.finished_at - run.started_at
+    run.rows = context.rows
+    run.chunks = context.chunks
+    run.save(using=using)
+    return run
+
+
+def last_started(using=None):
+    """``{job: when its latest run started}``."""
+    using = using or router.db_for_read(BatchRun)
+    rows = BatchRun.objects.using(using).order_by().values('job').annotate(started=Max('started_at'))
+    return {row['job']: row['started'] for row in rows}
+
+
+def scheduled_before(job, now):
+    """The latest time at or before ``now`` that ``job`` was scheduled for."""
+    if 'every' in job:
+        return None
+    local = timezone.localtime(now)
+    hour, minute = (int(part) for part in job['at'].split(':'))
+    at = local.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    return at if at <= local else at - timedelta(days=1)
+
+
+def due_jobs(now=None, using=None):
+    """Names of the jobs that should run at ``now``."""
+    now = now or timezone.now()
+    started = last_started(using)
+    due = []
+    for name, job in jobs().items():
+        last = started.get(name)
+        if 'every' in job:
+            is_due = last is None or now - last >= timedelta(minutes=job['every'])
+        else:
+            is_due = last is None or last < scheduled_before(job, now)
+        if is_due:
+            due.append(name)
+    return due
+
+
+def run_due(holder=None, now=None):
+    """Run every due job; returns the runs that took place."""
+    holder = holder or default_holder()
+    runs = []
+    for name in due_jobs(now):
+        run = run_job(name, holder)
+        if run is not None:
+            runs.append(run)
+    return runs
+
+
+def run_scheduler(stop=None, holder=None, poll_seconds=None, on_run=None):
+    """Run due jobs every ``POLL_SECONDS`` until ``stop`` is set."""
+    stop = stop or threading.Event()
+    holder = holder or default_holder()
+    poll_seconds = poll_seconds or batch_settings()['POLL_SECONDS']
+    while not stop.is_set():
+        close_old_connections()
+        try:
+            for run in run_due(holder):
+                if on_run is not None:
+                    on_run(run)
+        except Exception:
+            logger.exception('Batch scheduler pass failed')
+        stop.wait(poll_seconds)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def start_scheduler():
+    """Run the scheduler in a daemon thread of this process (once)."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is not None:
+            return _scheduler
+
+        def scheduler():
+            try:
+                run_scheduler()
+            finally:
+                connections.close_all()
+
+        _scheduler = threading.Thread(target=scheduler, name='batch-scheduler', daemon=True)
+        _scheduler.start()
+        return _scheduler
+
+
+def job_status(using=None):
+    """Each configured job with its schedule and latest run."""
+    using = using or router.db_for_read(BatchRun)
+    due = set(due_jobs(using=using))
+    status = []
+    for name, job in jobs().items():
+        latest = BatchRun.objects.using(using).filter(job=name).order_by('-started_at').first()
+        status.append({
+            'job': name,
+            'task': job['task'],
+            'schedule': f"every {job['every']} minutes" if 'every' in job else f"daily at {job['at']}",
+            'due': name in due,
+            'last_run': run_summary(latest) if latest else None,
+        })
+    return status
+
+
+def run_summary(run):
+    return {
+        'id': run.id,
+        'job': run.job,
+        'status': run.status,
+        'holder': run.holder,
+        'started_at': run.started_at,
+        'finished_at': run.finished_at,
+        'duration_seconds': round(run.duration.total_seconds(), 3) if run.duration is not None else None,
+        'rows': run.rows,
+        'chunks': run.chunks,
+        'detail': run.detail,
+        'error': run.error,
+    }
@@ -0,0 +1,160 @@
+"""
+Endpoint benchmarks.
+
+Every ViewSet registered on the API router is exercised through the test
+client: ``list``, ``retrieve`` and each GET ``@action``. For each endpoint we
+record p50/p95 latency, SQL query count and rows fetched, and compare them
+with a stored budget.
+"""
+
+import json
+import math
+import time
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .instrumentation import capture_queries
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+class Endpoint:
+    def __init__(self, name, path, params=None):
+        self.name = name
+        self.path = path
+        self.params = params or {}
+
+    def __repr__(self):
+        return f'<Endpoint {self.name}>'
+
+
+def _first_pk(viewset):
+    queryset = viewset.queryset
+    if queryset is None:
+        return None
+    return queryset.model._default_manager.order_by('pk').values_list('pk', flat=True).first()
+
+
+def _action_params(prefix, url_path):
+    """Query parameters for actions that refuse to run without them."""
+    from django.contrib.auth import get_user_model
+
+    today = timezone.localdate()
+    doctor_id = get_user_model().objects.filter(role='doctor').values_list('pk', flat=True).first()
+    if prefix == 'patients' and url_path == 'autocomplete':
+        from patients.models import Patient
+
+        name = Patient.objects.order_by('pk').values_list('name', flat=True).first() or ''
+        return {'q': name[:3]}
+    if prefix == 'working-hours' and url_path == 'resolved':
+        return {'doctor_id': doctor_id, 'start_date': today.isoformat()}
+    if prefix == 'appointments' and url_path in ('available_slots', 'doctor_schedule'):
+        return {
+            'doctor_id': doctor_id,
+            'date': today.isoformat(),
+            'start_date': today.isoformat(),
+            'end_date': (today + timedelta(days=7)).isoformat(),
+        }
+    return {}
+
+
+def discover_endpoints(router):
+    """Build the list of benchmarkable GET endpoints from a DRF router."""
+    endpoints = []
+    for prefix, viewset, basename in router.registry:
+        base = f'/api/{prefix}/'
+        pk = _first_pk(viewset)
+        if hasattr(viewset, 'list'):
+            endpoints.append(Endpoint(f'{basename}-list', base))
+        if hasattr(viewset, 'retrieve') and pk is not None:
+            endpoints.append(Endpoint(f'{basename}-detail', f'{base}{pk}/'))
+        for action in viewset.get_extra_actions():
+            if 'get' not in action.mapping:
+                continue
+            url_path = action.url_path
+            name = f'{basename}-{url_path.replace("_", "-")}'
+            if action.detail:
+                if pk is None:
+                    continue
+                path = f'{base}{pk}/{url_path}/'
+            else:
+                path = f'{base}{url_path}/'
+            endpoints.append(Endpoint(name, path, _action_params(prefix, url_path)))
+    return endpoints
+
+
+def measure(client, endpoint, iterations, warmup=1):
+    """Hit ``endpoint`` repeatedly and summarise latency and SQL cost."""
+    for _ in range(warmup):
+        client.get(endpoint.path, endpoint.params)
+
+    timings = []
+    queries = rows = 0
+    status_code = None
+    for _ in range(iterations):
+        with capture_queries() as log:
+            started = time.perf_counter()
+            response = client.get(endpoint.path, endpoint.params)
+            timings.append((time.perf_counter() - started) * 1000)
+        status_code = response.status_code
+        # Query counts are deterministic; keep the worst observed run.
+        queries = max(queries, log.count)
+        rows = max(rows, log.rows)
+
+    return {
+        'name': endpoint.name,
+        'path': endpoint.path,
+        'status': status_code,
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'queries': queries,
+        'rows': rows,
+    }
+
+
+def check_budget(result, budget, latency_tolerance, count_tolerance=0.0):
+    """Return a list of human-readable budget violations for one result."""
+    violations = []
+    if result['status'] and result['status'] >= 500:
+        violations.append(f"returned HTTP {result['status']}")
+    if not budget:
+        return violations
+    # Seeded data is relative to today, so counts drift slightly between days.
+    for key in ('queries', 'rows'):
+        if key in budget and result[key] > math.ceil(budget[key] * (1 + count_tolerance)):
+            violations.append(f"{result[key]} {key} > budget {budget[key]}")
+    if 'p95_ms' in budget:
+        limit = budget['p95_ms'] * (1 + latency_tolerance)
+        if result['p95_ms'] > limit:
+            violations.append(f"p95 {result['p95_ms']}ms > budget {budget['p95_ms']}ms")
+    return violations
+
+
+def budget_from_result(result, latency_headroom):
+    return {
+        'queries': result['queries'],
+        'rows': result['rows'],
+        'p95_ms': round(max(result['p95_ms'], 1.0) * latency_headroom, 1),
+    }
+
+
+def load_budgets(path):
+    try:
+        with open(path) as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return {}
+
+
+def make_client(user):
+    client = APIClient(HTTP_HOST='localhost')
+    client.force_authenticate(user=user)
+    return client
@@ -0,0 +1,188 @@
+"""
+Response cache for analytics actions.
+
+``cached_action(depends_on=[...])`` stores an action's response data under a
+key built from the endpoint, the user's role, the query parameters, today's
+date and a *generation* token for every model the action reads. Saving or
+deleting any instance of one of those models (``post_save``/``post_delete``)
+replaces its generation token, so every key that depended on it is
+abandoned at once and old entries simply expire. Writes that bypass model
+signals (``bulk_create``, ``QuerySet.update``) call ``invalidate_models``;
+anything else is covered by the ``TIMEOUT`` fallback.
+
+Actions stack ``cached_action`` on top of ``core.replica.use_replica``. A
+replica snapshot can predate the write that replaced a generation, so the
+key also names the database the request would read from (the primary, or
+the replica snapshot), and a response is only stored when that is where
+it was actually read. Users who just wrote read the primary and never get
+an entry computed from an older snapshot.
+
+Hit and miss counts are kept per endpoint in the cache itself so every worker
+sharing the cache reports the same numbers.
+"""
+
+import functools
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .replica import read_source
+
+ANALYTICS_CACHE_DEFAULTS = {
+    'ENABLED': True,
+    'CACHE': 'default',
+    'TIMEOUT': 300,
+    'KEY_PREFIX': 'analytics',
+}
+
+# Headers stored with the data; X-Replica-Lag plus Age gives total staleness.
+REPLAYED_HEADERS = ('X-Replica-Lag',)
+
+# 'ViewSet.action' -> model labels, filled in as views are imported.
+REGISTRY = {}
+
+
+def cache_settings():
+    return {**ANALYTICS_CACHE_DEFAULTS, **getattr(settings, 'ANALYTICS_CACHE', {})}
+
+
+def _cache():
+    return caches[cache_settings()['CACHE']]
+
+
+def _key(*parts):
+    return ':'.join([cache_settings()['KEY_PREFIX'], *map(str, parts)])
+
+
+def _generation_key(label):
+    return _key('generation', label.lower())
+
+
+def generations(labels):
+    """Current generation token of each model label, creating missing ones."""
+    cache = _cache()
+    keys = [_generation_key(label) for label in labels]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            token = uuid.uuid4().hex
+            # Another worker may have created it first; use whichever won.
+            if not cache.add(key, token, None):
+                token = cache.get(key, token)
+            found[key] = token
+    return [found[key] for key in keys]
+
+
+def invalidate_models(*models):
+    """Abandon every cached response that depends on ``models``."""
+    cache = _cache()
+    cache.set_many({_generation_key(model._meta.label): uuid.uuid4().hex for model in models}, None)
+
+
+def _invalidate_sender(sender, **kwargs):
+    invalidate_models(sender)
+
+
+def _count(endpoint, outcome):
+    cache = _cache()
+    key = _key('stats', endpoint, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def cache_stats():
+    """Hit/miss counters for every registered endpoint."""
+    cache = _cache()
+    keys = {
+        endpoint: (_key('stats', endpoint, 'hit'), _key('stats', endpoint, 'miss'))
+        for endpoint in REGISTRY
+    }
+    values = cache.get_many([key for pair in keys.values() for key in pair])
+    endpoints = {}
+    for endpoint, (hit_key, miss_key) in sorted(keys.items()):
+        hits, misses = values.get(hit_key, 0), values.get(miss_key, 0)
+        endpoints[endpoint] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+            'depends_on': REGISTRY[endpoint],
+        }
+    return {
+        'enabled': cache_settings()['ENABLED'],
+        'timeout': cache_settings()['TIMEOUT'],
+        'hits': sum(entry['hits'] for entry in endpoints.values()),
+        'misses': sum(entry['misses'] for entry in endpoints.values()),
+        'endpoints': endpoints,
+    }
+
+
+def cached_action(depends_on, timeout=None):
+    """Cache a read-only DRF action's response data.
+
+    ``depends_on`` lists ``'app_label.ModelName'`` labels of every model the
+    action reads. Only ``200`` responses are stored. Responses carry
+    ``X-Cache: HIT`` or ``MISS``, and hits also carry ``Age``.
+    """
+    labels = list(depends_on)
+    for label in labels:
+        # Lazy string senders resolve once the app registry is ready.
+        post_save.connect(_invalidate_sender, sender=label, weak=False, dispatch_uid=f'analytics-cache:{label}')
+        post_delete.connect(_invalidate_sender, sender=label, weak=False, dispatch_uid=f'analytics-cache:{label}')
+
+    def decorator(view_method):
+        endpoint = view_method.__qualname__
+        REGISTRY[endpoint] = labels
+
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            config = cache_settings()
+            if not config['ENABLED'] or request.method != 'GET':
+                return view_method(self, request, *args, **kwargs)
+
+            cache = _cache()
+            source = read_source(request.user)
+            key = _response_key(endpoint, request, labels, kwargs, source)
+            entry = cache.get(key)
+            if entry is not None:
+                _count(endpoint, 'hit')
+                response = Response(entry['data'])
+                for header, value in entry['headers'].items():
+                    response[header] = value
+                response['X-Cache'] = 'HIT'
+                response['Age'] = str(int(time.time() - entry['stored_at']))
+                return response
+
+            _count(endpoint, 'miss')
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200 and getattr(response, 'replica_source', (None, None)) == source:
+                entry = {
+                    'data': response.data,
+                    'headers': {name: response[name] for name in REPLAYED_HEADERS if name in response},
+                    'stored_at': time.time(),
+                }
+                cache.set(key, entry, config['TIMEOUT'] if timeout is None else timeout)
+            response['X-Cache'] = 'MISS'
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def _response_key(endpoint, request, labels, kwargs, source):
+    role = getattr(request.user, 'role', None) or 'anonymous'
+    params = sorted((name, tuple(request.query_params.getlist(name))) for name in request.query_params)
+    material = repr((
+        params, sorted(kwargs.items()), timezone.localdate().isoformat(), generations(labels), source
+    ))
+    digest = hashlib.sha1(material.encode()).hexdigest()
+    return _key('response', endpoint, role, digest)
@@ -0,0 +1,345 @@
+"""
+Composite dashboards: everything one role's dashboard shows, in one request.
+
+Each role has a list of *sections*, small functions that take a
+``DashboardContext`` and return JSON-ready data. Sections that need the same
+rows (today's appointments, the ward occupancy table...) get them through
+``context.shared()``, which computes each value once per request even when
+several sections ask for it at the same time. Independent sections run
+concurrently on a process-wide pool of ``MAX_WORKERS`` threads, each with
+its own database connection; ``MAX_WORKERS = 0`` runs them one after
+another on the request's connection, which tests that rely on uncommitted
+data need. A failing section is reported in ``errors`` instead of failing
+the whole dashboard.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from appointments.models import Appointment
+from appointments.serializers import AppointmentSerializer
+from billing.models import Bill, Payment
+from inventory.models import InventoryItem
+from medical_records.models import LabTest, Prescription
+from medical_records.serializers import LabTestSerializer
+from patients.models import Patient
+from visitors.models import Visitor
+from wards.models import Ward
+
+from .dates import day_range, start_of_day
+from .instrumentation import QueryLog, capture_queries, capturing
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+DASHBOARD_DEFAULTS = {
+    'MAX_WORKERS': 4,
+    # Rows returned by list sections; counts always cover every row.
+    'LIST_LIMIT': 10,
+}
+
+
+def dashboard_settings():
+    return {**DASHBOARD_DEFAULTS, **getattr(settings, 'DASHBOARD', {})}
+
+
+def _money(value):
+    return float(value or Decimal('0'))
+
+
+class DashboardContext:
+    """Per-request state shared by a dashboard's sections."""
+
+    def __init__(self, user, role):
+        self.user = user
+        self.role = role
+        self.today = timezone.localdate()
+        self.limit = dashboard_settings()['LIST_LIMIT']
+        self._values = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def shared(self, key, compute):
+        """Return ``compute()``, computed once per request for ``key``."""
+        with self._guard:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._values:
+                self._values[key] = compute()
+            return self._values[key]
+
+    @property
+    def is_doctor(self):
+        return self.role == 'doctor'
+
+    def appointments_today(self):
+        """Today's appointments, only the doctor's own on a doctor dashboard."""
+        def compute():
+            queryset = Appointment.objects.filter(date=self.today).select_related(
+                'patient', 'doctor', 'created_by'
+            ).order_by('time')
+            if self.is_doctor:
+                queryset = queryset.filter(doctor=self.user)
+            return list(queryset)
+        return self.shared('appointments_today', compute)
+
+    def wards(self):
+        """Wards with their bed counts by status, read from the ward counters."""
+        return self.shared('wards', lambda: list(
+            Ward.objects.annotate(
+                bed_count=F('available_count') + F('occupied_count') + F('maintenance_count') + F('cleaning_count'),
+                occupied=F('occupied_count'),
+                available=F('available_count'),
+            ).order_by('name')
+        ))
+
+
+# Sections
+
+def patients_section(context):
+    queryset = Patient.objects.all()
+    if context.is_doctor:
+        queryset = queryset.filter(assigned_doctor=context.user)
+    return queryset.aggregate(
+        total=Count('id'),
+        admitted=Count('id', filter=Q(status='admitted')),
+        outpatient=Count('id', filter=Q(status='outpatient')),
+        discharged=Count('id', filter=Q(status='discharged')),
+        registered_today=Count('id', filter=Q(registration_date=context.today)),
+    )
+
+
+def appointment_counts_section(context):
+    appointments = context.appointments_today()
+    by_status = {}
+    for appointment in appointments:
+        by_status[appointment.status] = by_status.get(appointment.status, 0) + 1
+    upcoming = Appointment.objects.filter(
+        date__gt=context.today, date__lte=context.today + timedelta(days=7), status='scheduled'
+    )
+    if context.is_doctor:
+        upcoming = upcoming.filter(doctor=context.user)
+    return {
+        'today': len(appointments),
+        'today_by_status': by_status,
+        'upcoming_week': upcoming.count(),
+    }
+
+
+def appointments_today_section(context):
+    # Still to come first, then the rest of the day's list in time order.
+    appointments = sorted(context.appointments_today(), key=lambda a: a.status != 'scheduled')
+    return AppointmentSerializer(appointments[:context.limit], many=True).data
+
+
+def staff_section(context):
+    counts = dict(
+        User.objects.filter(status='active').values_list('role').annotate(count=Count('id')).order_by()
+    )
+    return {role: counts.get(role, 0) for role, _ in User.ROLE_CHOICES}
+
+
+def available_doctors_section(context):
+    return list(
+        User.objects.filter(role='doctor', status='active')
+        .order_by('first_name', 'last_name')
+        .values('id', 'first_name', 'last_name', 'department', 'specialization')
+    )
+
+
+def revenue_section(context):
+    today_start, today_end = day_range(context.today)
+    month_start = start_of_day(context.today.replace(day=1))
+    totals = Payment.objects.filter(date__gte=month_start).aggregate(
+        month=Sum('amount'),
+        today=Sum('amount', filter=Q(date__gte=today_start, date__lt=today_end)),
+    )
+    return {'today': _money(totals['today']), 'month': _money(totals['month'])}
+
+
+def pending_bills_section(context):
+    totals = Bill.objects.filter(status__in=['pending', 'partial']).aggregate(
+        count=Count('id'),
+        outstanding=Sum(F('total_amount') - F('paid_amount')),
+    )
+    return {'count': totals['count'], 'outstanding': _money(totals['outstanding'])}
+
+
+def low_stock_section(context):
+    items = InventoryItem.objects.filter(quantity__lte=F('min_stock')).order_by('quantity')
+    return {
+        'count': items.count(),
+        'items': list(items.values('id', 'name', 'category', 'quantity', 'min_stock', 'unit')[:context.limit]),
+    }
+
+
+def occupancy_section(context):
+    wards = context.wards()
+    total = sum(ward.bed_count for ward in wards)
+    occupied = sum(ward.occupied for ward in wards)
+    return {
+        'total_beds': total,
+        'occupied_beds': occupied,
+        'available_beds': sum(ward.available for ward in wards),
+        'occupancy_rate': round(occupied / total * 100, 1) if total else 0,
+    }
+
+
+def wards_section(context):
+    return [
+        {
+            'id': ward.id,
+            'name': ward.name,
+            'department': ward.department,
+            'total_beds': ward.bed_count,
+            'occupied_beds': ward.occupied,
+            'available_beds': ward.available,
+        }
+        for ward in context.wards()
+    ]
+
+
+def lab_tests_section(context):
+    pending = LabTest.objects.filter(status='pending', ordered_by=context.user).select_related(
+        'patient', 'ordered_by'
+    ).order_by('-ordered_date')
+    return {
+        'pending': pending.count(),
+        'urgent': pending.filter(priority__in=['urgent', 'stat']).count(),
+        'recent': LabTestSerializer(pending[:context.limit], many=True).data,
+    }
+
+
+def prescriptions_section(context):
+    return Prescription.objects.filter(doctor=context.user).aggregate(
+        active=Count('id', filter=Q(status='active')),
+        issued_today=Count('id', filter=Q(date=context.today)),
+    )
+
+
+def visitors_section(context):
+    today_start, today_end = day_range(context.today)
+    return Visitor.objects.aggregate(
+        visiting=Count('id', filter=Q(status='visiting')),
+        waiting=Count('id', filter=Q(status='waiting')),
+        checked_in_today=Count('id', filter=Q(checkInTime__gte=today_start, checkInTime__lt=today_end)),
+    )
+
+
+SECTIONS = {
+    'admin': {
+        'patients': patients_section,
+        'staff': staff_section,
+        'appointments': appointment_counts_section,
+        'revenue': revenue_section,
+        'pending_bills': pending_bills_section,
+        'low_stock': low_stock_section,
+        'occupancy': occupancy_section,
+    },
+    'doctor': {
+        'patients': patients_section,
+        'appointments': appointment_counts_section,
+        'appointments_today': appointments_today_section,
+        'lab_tests': lab_tests_section,
+        'prescriptions': prescriptions_section,
+    },
+    'nurse': {
+        'patients': patients_section,
+        'occupancy': occupancy_section,
+        'wards': wards_section,
+        'low_stock': low_stock_section,
+    },
+    'receptionist': {
+        'patients': patients_section,
+        'appointments': appointment_counts_section,
+        'appointments_today': appointments_today_section,
+        'pending_bills': pending_bills_section,
+        'visitors': visitors_section,
+        'available_doctors': available_doctors_section,
+    },
+}
+
+
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+
+def _executor(workers):
+    """Process-wide worker pool, so threads and their connections are reused."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                # Sections already submitted still finish; the idle threads
+                # then exit and their connections go with them.
+                _pool.shutdown(wait=False)
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dashboard')
+            _pool_workers = workers
+        return _pool
+
+
+def _run_section(name, section, context, pooled):
+    """Run one section; returns ``(data, error, elapsed, queries)``.
+
+    ``queries`` is the pool thread's ``QueryLog`` when the request is being
+    profiled, for the request thread to merge, and ``None`` otherwise.
+    """
+    if pooled:
+        # What request_started/finished do for request threads: drop
+        # connections past CONN_MAX_AGE or that failed a health check.
+        close_old_connections()
+    queries = QueryLog() if pooled and capturing() else None
+    started = time.perf_counter()
+    try:
+        with capture_queries(queries) if queries is not None else nullcontext():
+            return section(context), None, time.perf_counter() - started, queries
+    except Exception:
+        logger.exception('Dashboard section %s for %s failed', name, context.role)
+        return None, 'section failed', time.perf_counter() - started, queries
+    finally:
+        if pooled:
+            close_old_connections()
+
+
+def build_dashboard(user, role):
+    """Run every section of ``role``'s dashboard and collect the results."""
+    context = DashboardContext(user, role)
+    sections = SECTIONS[role]
+    workers = dashboard_settings()['MAX_WORKERS']
+
+    if workers > 1:
+        pool = _executor(workers)
+        futures = {
+            name: pool.submit(contextvars.copy_context().run, _run_section, name, section, context, True)
+            for name, section in sections.items()
+        }
+        outcomes = {name: future.result() for name, future in futures.items()}
+        for _, _, _, queries in outcomes.values():
+            if queries is not None:
+                for log in capturing():
+                    log.merge(queries)
+    else:
+        outcomes = {name: _run_section(name, section, context, False) for name, section in sections.items()}
+
+    return {
+        'role': role,
+        'date': context.today.isoformat(),
+        'generated_at': timezone.now().isoformat(),
+        'sections': {name: data for name, (data, error, _, _) in outcomes.items() if error is None},
+        'errors': {name: error for name, (_, error, _, _) in outcomes.items() if error is not None},
+        'timings_ms': {name: round(elapsed * 1000, 1) for name, (_, _, elapsed, _) in outcomes.items()},
+    }
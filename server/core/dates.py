@@ -0,0 +1,25 @@
+"""
+Calendar-day bounds for filtering ``DateTimeField`` columns.
+
+``field__date=day`` wraps the column in a function call, so the database has
+to evaluate it for every row and cannot use an index on the column. Comparing
+against the aware datetimes returned here keeps the predicate sargable.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+
+def start_of_day(day):
+    """Aware datetime for midnight at the start of ``day`` in the current time zone."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def day_range(start, end=None):
+    """``(lower, upper)`` bounds covering the days ``start`` to ``end`` inclusive.
+
+    Filter with ``field__gte=lower, field__lt=upper``.
+    """
+    end = start if end is None else end
+    return start_of_day(start), start_of_day(end + timedelta(days=1))
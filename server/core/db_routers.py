@@ -0,0 +1,34 @@
+from .replica import current_scope, replica_settings
+
+
+class AnalyticsReplicaRouter:
+    """
+    Send reads inside ``replica_reads`` to the analytics replica.
+
+    Everything else, including every write, uses the primary. Once a block
+    writes, its later reads go back to the primary so it sees its own rows.
+    """
+
+    def db_for_read(self, model, **hints):
+        scope = current_scope()
+        if scope is None or scope.alias is None or scope.wrote:
+            return None
+        return scope.alias
+
+    def db_for_write(self, model, **hints):
+        scope = current_scope()
+        if scope is not None:
+            scope.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary.
+        replica = replica_settings()['ALIAS']
+        if {obj1._state.db, obj2._state.db} <= {'default', replica}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == replica_settings()['ALIAS']:
+            return False
+        return None
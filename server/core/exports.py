@@ -0,0 +1,153 @@
+"""
+Streaming CSV and NDJSON exports for list endpoints.
+
+``?format=csv`` or ``?format=ndjson`` (or the matching ``Accept`` header) on
+a list endpoint of an ``ExportMixin`` viewset returns every matching row as
+a ``StreamingHttpResponse``. Rows are read with ``QuerySet.iterator()`` and
+serialized ``EXPORT_CHUNK_SIZE`` at a time, so a worker holds one chunk in
+memory however large the export is. Exports are not paginated.
+
+Custom list actions opt in by returning ``self.list_response(queryset)``
+instead of serializing the queryset themselves.
+
+Viewsets with a ``list_projection`` (``core.projections.Projection``) render
+lists, list actions and exports from ``values()`` rows instead of building a
+serializer per row; the output is the same.
+"""
+
+import csv
+import json
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.renderers import BaseRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .projections import projection_settings
+
+EXPORT_CHUNK_SIZE = 1000
+
+
+class _Echo:
+    """File-like object that hands back what ``csv.writer`` writes."""
+
+    def write(self, value):
+        return value
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, cls=JSONEncoder)
+    return value
+
+
+def _rows(data):
+    if isinstance(data, dict):
+        return [data]
+    return data or []
+
+
+class CSVRenderer(BaseRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def stream(self, rows, header):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow([_cell(row.get(name)) for name in header])
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Error responses and non-list endpoints.
+        rows = _rows(data)
+        header = list(rows[0]) if rows else []
+        return ''.join(self.stream(rows, header))
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def stream(self, rows, header=None):
+        for row in rows:
+            yield json.dumps(row, cls=JSONEncoder, ensure_ascii=False) + '\n'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return ''.join(self.stream(_rows(data)))
+
+
+EXPORT_RENDERERS = (CSVRenderer, NDJSONRenderer)
+
+
+class ExportMixin:
+    """Stream ``list`` and custom list actions as CSV or NDJSON on request."""
+
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, *EXPORT_RENDERERS]
+    export_chunk_size = EXPORT_CHUNK_SIZE
+    list_projection = None
+
+    def is_export(self):
+        return isinstance(getattr(self.request, 'accepted_renderer', None), EXPORT_RENDERERS)
+
+    def get_projection(self):
+        """``list_projection``, unless disabled or the action uses another serializer."""
+        projection = self.list_projection
+        if projection is None or not projection_settings()['ENABLED']:
+            return None
+        if self.get_serializer_class() is not projection.serializer_class:
+            return None
+        return projection
+
+    def list(self, request, *args, **kwargs):
+        if self.is_export():
+            return self.export(self.filter_queryset(self.get_queryset()))
+        projection = self.get_projection()
+        if projection is None:
+            return super().list(request, *args, **kwargs)
+
+        rows = projection.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(projection.serialize(page))
+        return Response(projection.serialize(rows))
+
+    def list_response(self, queryset):
+        """Serialize ``queryset`` as a JSON list, or stream it for exports."""
+        if self.is_export():
+            return self.export(queryset)
+        projection = self.get_projection()
+        if projection is not None:
+            return Response(projection.serialize(projection.values(queryset)))
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    def export(self, queryset):
+        renderer = self.request.accepted_renderer
+        header = [name for name, field in self.get_serializer().fields.items() if not field.write_only]
+        response = StreamingHttpResponse(
+            renderer.stream(self.export_rows(queryset), header),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{self.export_filename(renderer.format)}"'
+        return response
+
+    def export_rows(self, queryset):
+        projection = self.get_projection()
+        if projection is not None:
+            for row in projection.values(queryset).iterator(chunk_size=self.export_chunk_size):
+                yield projection.to_representation(row)
+            return
+        rows = queryset.iterator(chunk_size=self.export_chunk_size)
+        while chunk := list(islice(rows, self.export_chunk_size)):
+            yield from self.get_serializer(chunk, many=True).data
+
+    def export_filename(self, extension):
+        name = self.basename if self.action == 'list' else f'{self.basename}-{self.action}'
+        return f'{name}-{timezone.localdate():%Y%m%d}.{extension}'
@@ -0,0 +1,201 @@
+"""
+Low-level query instrumentation shared by the benchmarks and middleware.
+
+``QueryLog`` is installed as a database execute wrapper and records how many
+statements ran, how long they took, how many rows were fetched and which
+statement shapes (fingerprints) were repeated. ``RequestProfile`` adds
+serialization and render timings for a single request.
+
+Execute wrappers are per connection, and connections are per thread, so
+``capture_queries`` only sees the calling thread's queries. Code that hands
+work to other threads (``core.dashboard``) runs it with a copy of the
+caller's context, records each task into its own ``QueryLog`` while
+``capturing()`` is non-empty, and ``merge``s those into the caller's logs.
+"""
+
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Reduce a SQL statement to its shape so repeated queries group together."""
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class QueryLog:
+    """Execute wrapper that accumulates statistics about executed queries."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.rows = 0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+            self._count_rows(context['cursor'])
+
+    def _count_rows(self, cursor):
+        # Rows are fetched after execute() returns, so wrap the fetch methods
+        # of this particular cursor to see what the caller actually reads.
+        if getattr(cursor, '_query_log_rows', None) is self:
+            return
+        cursor._query_log_rows = self
+        log = self
+        fetchone, fetchmany, fetchall = cursor.fetchone, cursor.fetchmany, cursor.fetchall
+
+        def counted_fetchone():
+            row = fetchone()
+            if row is not None:
+                log.rows += 1
+            return row
+
+        def counted_fetchmany(*args, **kwargs):
+            rows = fetchmany(*args, **kwargs)
+            log.rows += len(rows)
+            return rows
+
+        def counted_fetchall():
+            rows = fetchall()
+            log.rows += len(rows)
+            return rows
+
+        cursor.fetchone = counted_fetchone
+        cursor.fetchmany = counted_fetchmany
+        cursor.fetchall = counted_fetchall
+
+    def merge(self, other):
+        """Add the statistics of ``other``, e.g. a worker thread's log."""
+        self.count += other.count
+        self.duration += other.duration
+        self.rows += other.rows
+        self.fingerprints.update(other.fingerprints)
+
+    def repeated(self, threshold=2):
+        """Fingerprints executed at least ``threshold`` times, most frequent first."""
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count >= threshold]
+
+
+_capturing = ContextVar('capturing_query_logs', default=())
+
+
+def capturing():
+    """The logs of the ``capture_queries`` blocks the caller is running in."""
+    return _capturing.get()
+
+
+@contextmanager
+def capture_queries(log=None):
+    """Record this thread's queries on every configured database while the block runs."""
+    log = log if log is not None else QueryLog()
+    token = _capturing.set((*_capturing.get(), log))
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(log))
+            yield log
+    finally:
+        _capturing.reset(token)
+
+
+class RequestProfile:
+    """Timings collected for one profiled request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = QueryLog()
+        self.serialize = 0.0
+        self.render = 0.0
+        self._serialize_depth = 0
+
+    @contextmanager
+    def serializing(self):
+        # Nested serializers run inside the outer one; only time the outermost.
+        self._serialize_depth += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._serialize_depth -= 1
+            if not self._serialize_depth:
+                self.serialize += time.perf_counter() - started
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Format the collected timings as a ``Server-Timing`` header value."""
+        return ', '.join([
+            f'db;dur={self.queries.duration * 1000:.1f};desc="{self.queries.count} queries"',
+            f'serialize;dur={self.serialize * 1000:.1f}',
+            f'render;dur={self.render * 1000:.1f}',
+            f'total;dur={self.elapsed * 1000:.1f}',
+        ])
+
+
+_current_profile = ContextVar('request_profile', default=None)
+
+
+def current_profile():
+    return _current_profile.get()
+
+
+@contextmanager
+def profiling(profile):
+    """Make ``profile`` the active profile and record its queries."""
+    token = _current_profile.set(profile)
+    try:
+        with capture_queries(profile.queries):
+            yield profile
+    finally:
+        _current_profile.reset(token)
+
+
+_serializer_timing_installed = False
+
+
+def install_serializer_timing():
+    """Time ``serializer.data`` for profiled requests.
+
+    Every serializer (including ``ListSerializer``) builds its output through
+    ``BaseSerializer.data``, so wrapping that one property covers all apps
+    without touching their serializers.
+    """
+    global _serializer_timing_installed
+    if _serializer_timing_installed:
+        return
+    _serializer_timing_installed = True
+
+    from rest_framework.serializers import BaseSerializer
+
+    original = BaseSerializer.data
+
+    def data(self):
+        profile = _current_profile.get()
+        if profile is None:
+            return original.fget(self)
+        with profile.serializing():
+            return original.fget(self)
+
+    BaseSerializer.data = property(data)
@@ -0,0 +1,160 @@
+"""
+Benchmark every API endpoint against the current (or a freshly seeded) database.
+
+    python manage.py benchmark_endpoints --output report.json
+    python manage.py benchmark_endpoints --isolated --update-budgets
+
+Exits with an error when an endpoint exceeds its stored budget so the command
+can gate CI.
+"""
+
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from core.benchmarks import (
+    budget_from_result,
+    check_budget,
+    discover_endpoints,
+    load_budgets,
+    make_client,
+    measure,
+)
+
+DEFAULT_BUDGETS = Path(__file__).resolve().parents[2] / 'benchmark_budgets.json'
+
+# Big enough to expose per-row costs, small enough to benchmark every
+# unpaginated action in a few minutes.
+ISOLATED_VOLUMES = {
+    'patients': 2000,
+    'appointments': 10000,
+    'medical_records': 3000,
+    'prescriptions': 2000,
+    'lab_tests': 2000,
+    'bills': 3000,
+    'payments': 4000,
+    'inventory_items': 500,
+    'inventory_transactions': 20000,
+    'visitors': 1000,
+}
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Measure latency and SQL cost of every API endpoint and enforce stored budgets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5)
+        parser.add_argument('--warmup', type=int, default=1)
+        parser.add_argument('--budgets', default=str(DEFAULT_BUDGETS),
+                            help='Budget file (default: core/benchmark_budgets.json)')
+        parser.add_argument('--output', help='Write the JSON report to this path')
+        parser.add_argument('--user', help='Username to authenticate as (default: first admin)')
+        parser.add_argument('--filter', default='', help='Only run endpoints whose name contains this')
+        parser.add_argument('--latency-tolerance', type=float, default=0.25,
+                            help='Allowed p95 growth over budget before failing (default: 0.25)')
+        parser.add_argument('--count-tolerance', type=float, default=0.1,
+                            help='Allowed query/row count growth over budget (default: 0.1)')
+        parser.add_argument('--update-budgets', action='store_true',
+                            help='Rewrite the budget file from this run instead of checking it')
+        parser.add_argument('--isolated', action='store_true',
+                            help='Run against a throwaway, freshly seeded database')
+        parser.add_argument('--cache', action='store_true',
+                            help='Serve analytics from the response cache (default: measure the computation)')
+
+    def handle(self, *args, **options):
+        if options['iterations'] <= 0:
+            raise CommandError('--iterations must be positive')
+
+        analytics_cache = {**getattr(settings, 'ANALYTICS_CACHE', {}), 'ENABLED': options['cache']}
+        with override_settings(ANALYTICS_CACHE=analytics_cache):
+            return self.run_benchmarks(options)
+
+    def run_benchmarks(self, options):
+        if not options['isolated']:
+            return self.run(options)
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            call_command('seed_scale_data', stdout=self.stdout, **ISOLATED_VOLUMES)
+            User.objects.get_or_create(
+                username='benchmark_admin',
+                defaults={'role': 'admin', 'is_staff': True, 'first_name': 'Benchmark'},
+            )
+            return self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, options):
+        from hospital_backend.urls import router
+
+        user = self.get_user(options['user'])
+        client = make_client(user)
+        budgets = load_budgets(options['budgets'])
+
+        results = []
+        failures = 0
+        for endpoint in discover_endpoints(router):
+            if options['filter'] not in endpoint.name:
+                continue
+            result = measure(client, endpoint, options['iterations'], options['warmup'])
+            result['violations'] = [] if options['update_budgets'] else check_budget(
+                result, budgets.get(endpoint.name),
+                options['latency_tolerance'], options['count_tolerance'],
+            )
+            failures += bool(result['violations'])
+            results.append(result)
+            self.report_line(result)
+
+        report = {
+            'generated_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'user': user.username,
+            'iterations': options['iterations'],
+            'endpoints': results,
+            'failures': failures,
+        }
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(report, indent=2))
+            self.stdout.write(f"Report written to {options['output']}")
+
+        if options['update_budgets']:
+            budgets.update({result['name']: budget_from_result(result, 2.0) for result in results})
+            Path(options['budgets']).write_text(json.dumps(budgets, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Budgets updated in {options['budgets']}"))
+            return
+
+        if failures:
+            raise CommandError(f'{failures} endpoint(s) exceeded their budget')
+        self.stdout.write(self.style.SUCCESS(f'{len(results)} endpoints within budget'))
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" does not exist')
+        user = User.objects.filter(role='admin').order_by('pk').first()
+        if user is None:
+            raise CommandError('No admin user found; pass --user or use --isolated')
+        return user
+
+    def report_line(self, result):
+        line = (
+            f"{result['name']:<45} {result['status']} "
+            f"p50={result['p50_ms']:>8.2f}ms p95={result['p95_ms']:>8.2f}ms "
+            f"queries={result['queries']:<5} rows={result['rows']}"
+        )
+        if result['violations']:
+            self.stdout.write(self.style.ERROR(f"{line}  FAIL: {'; '.join(result['violations'])}"))
+        else:
+            self.stdout.write(line)
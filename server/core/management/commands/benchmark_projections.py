@@ -0,0 +1,84 @@
+"""
+Compare every list projection with the serializer it replaces.
+
+    python manage.py benchmark_projections
+    python manage.py benchmark_projections --rows 20000 --filter Patient --output projections.json
+
+For each registered ``core.projections.Projection``, serializes the same rows
+both ways (serializer over ``select_related`` instances, and projection over
+``values()`` rows), renders both with DRF's ``JSONRenderer`` and reports rows
+per second. Fails if the rendered bytes differ.
+"""
+
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from core.projections import PROJECTIONS
+
+
+class Command(BaseCommand):
+    help = 'Benchmark values()-based list projections against their serializers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help='Rows per list (default: 5000)')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per mode; the fastest counts')
+        parser.add_argument('--filter', default='', help='Only run projections whose serializer name contains this')
+        parser.add_argument('--output', help='Write the results to this file as JSON')
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+        results = []
+        mismatches = []
+        for projection in PROJECTIONS:
+            name = projection.serializer_class.__name__
+            if options['filter'] not in name:
+                continue
+            model = projection.model
+            queryset = model._default_manager.order_by('pk')[:options['rows']]
+
+            def serializer_run():
+                rows = queryset.select_related(*projection.select_related)
+                return renderer.render(projection.serializer_class(rows, many=True).data)
+
+            def projection_run():
+                return renderer.render(projection.serialize(projection.values(queryset)))
+
+            before, expected = self.best_of(serializer_run, options['repeat'])
+            after, actual = self.best_of(projection_run, options['repeat'])
+            count = queryset.count()
+            result = {
+                'serializer': name,
+                'rows': count,
+                'identical': actual == expected,
+                'serializer_rows_per_second': round(count / before) if before else None,
+                'projection_rows_per_second': round(count / after) if after else None,
+                'speedup': round(before / after, 2) if after else None,
+            }
+            results.append(result)
+            if not result['identical']:
+                mismatches.append(name)
+
+            self.stdout.write(
+                f"{name:<32} {count:>7,} rows  "
+                f"{result['serializer_rows_per_second'] or 0:>9,} -> {result['projection_rows_per_second'] or 0:>9,} rows/s  "
+                f"x{result['speedup'] or 0:<5} {'identical' if result['identical'] else 'DIFFERENT'}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(results, handle, indent=2)
+        if mismatches:
+            raise CommandError(f"Projection output differs from the serializer for: {', '.join(mismatches)}")
+
+    def best_of(self, run, repeat):
+        best = None
+        output = None
+        for _ in range(max(1, repeat)):
+            started = time.perf_counter()
+            output = run()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, output
@@ -0,0 +1,66 @@
+"""
+Run EXPLAIN QUERY PLAN for every registered filter combination.
+
+    python manage.py check_query_plans
+    python manage.py check_query_plans --analyze --filter appointments --verbose
+
+Exits with an error when a check reads a table without an index so the
+command can gate CI next to ``benchmark_endpoints``.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.query_plans import PLAN_CHECKS, explain_check, partial_indexes
+
+
+class Command(BaseCommand):
+    help = 'Flag registered queries whose plan scans a whole table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filter', default='', help='Only run checks whose name contains this')
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--analyze', action='store_true',
+                            help='Run ANALYZE first so the planner sees real table statistics')
+        parser.add_argument('--verbose', action='store_true', help='Print the full plan for every check')
+        parser.add_argument('--strict', action='store_true',
+                            help='Also fail on unbounded index walks and temporary sorts')
+
+    def handle(self, *args, **options):
+        if options['analyze']:
+            with connections[options['database']].cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        partial = partial_indexes()
+        failures = 0
+        checked = 0
+        for check in PLAN_CHECKS:
+            if options['filter'] not in check.name:
+                continue
+            try:
+                result = explain_check(check, options['database'], partial)
+            except NotImplementedError as exc:
+                raise CommandError(str(exc))
+            checked += 1
+
+            problems = [f'full scan of {table}' for table in result.scans]
+            warnings = [f'walks all of {index}' for index in result.index_walks]
+            if result.sorts:
+                warnings.append('temporary sort')
+            if options['strict']:
+                problems, warnings = problems + warnings, []
+            failures += bool(problems)
+
+            if problems:
+                self.stdout.write(self.style.ERROR(f"{check.name:<40} FAIL: {', '.join(problems + warnings)}"))
+            elif warnings:
+                self.stdout.write(self.style.WARNING(f"{check.name:<40} ok ({', '.join(warnings)})"))
+            else:
+                self.stdout.write(f'{check.name:<40} ok')
+            if problems or options['verbose']:
+                for line in result.lines:
+                    self.stdout.write(f'    {line}')
+
+        if failures:
+            raise CommandError(f'{failures} of {checked} query plan(s) read a full table')
+        self.stdout.write(self.style.SUCCESS(f'{checked} query plans use indexes'))
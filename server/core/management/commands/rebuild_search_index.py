@@ -0,0 +1,43 @@
+"""
+Rebuild the full-text search indexes from their tables.
+
+    python manage.py rebuild_search_index
+    python manage.py rebuild_search_index patients inventory
+
+Needed after writes that skip model signals: ``bulk_create``, raw SQL,
+restoring a database copy.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from core.search import SEARCH_INDEXES
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the FTS5 search indexes for patients, medical records and inventory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('indexes', nargs='*', metavar='index',
+                            help=f"Indexes to rebuild (default: all of {', '.join(SEARCH_INDEXES)})")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        names = options['indexes'] or list(SEARCH_INDEXES)
+        unknown = [name for name in names if name not in SEARCH_INDEXES]
+        if unknown:
+            raise CommandError(f"Unknown index {', '.join(unknown)}; choose from {', '.join(SEARCH_INDEXES)}")
+
+        using = options['database']
+        for name in names:
+            started = time.monotonic()
+            with transaction.atomic(using=using):
+                count = SEARCH_INDEXES[name].rebuild(using)
+            if count is None:
+                self.stdout.write(self.style.WARNING(
+                    f'{name}: no search index on this database (run migrate; SQLite only)'
+                ))
+            else:
+                self.stdout.write(f'{name}: {count:,} rows indexed in {time.monotonic() - started:.1f}s')
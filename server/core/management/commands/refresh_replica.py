@@ -0,0 +1,34 @@
+"""
+Copy the primary SQLite database to the analytics replica.
+
+    python manage.py refresh_replica
+    python manage.py refresh_replica --interval 300   # keep refreshing
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.replica import refresh_replica, replica_settings
+
+
+class Command(BaseCommand):
+    help = 'Refresh the read-only analytics replica from the primary database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep refreshing every N seconds (default: refresh once)')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            try:
+                refresh_replica()
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(
+                f"Replica {replica_settings()['PATH']} refreshed in {time.monotonic() - started:.1f}s"
+            )
+            if options['interval'] <= 0:
+                return
+            time.sleep(max(0, options['interval'] - (time.monotonic() - started)))
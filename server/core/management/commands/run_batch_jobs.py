@@ -0,0 +1,66 @@
+"""
+Run the batch sweeps configured in settings.BATCH_JOBS.
+
+    python manage.py run_batch_jobs                        # list jobs and their last run
+    python manage.py run_batch_jobs appointment_no_shows   # run jobs now
+    python manage.py run_batch_jobs --due                  # run the jobs whose time has come
+    python manage.py run_batch_jobs --scheduler            # keep running due jobs
+
+Any number of nodes can run the scheduler: each job's lease lets only one
+of them run it at a time.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.batch import default_holder, job_status, jobs, run_due, run_job, run_scheduler
+
+
+class Command(BaseCommand):
+    help = 'Run batch sweeps now, when due, or on a schedule'
+
+    def add_arguments(self, parser):
+        parser.add_argument('jobs', nargs='*', help='Jobs to run now')
+        parser.add_argument('--due', action='store_true', help='Run every job that is due')
+        parser.add_argument('--scheduler', action='store_true',
+                            help='Keep running due jobs every BATCH_JOBS["POLL_SECONDS"]')
+        parser.add_argument('--poll', type=int, default=None, help='Seconds between scheduler passes')
+
+    def handle(self, *args, **options):
+        unknown = set(options['jobs']) - set(jobs())
+        if unknown:
+            raise CommandError(f"Unknown jobs: {', '.join(sorted(unknown))}; configured: {', '.join(jobs())}")
+        holder = default_holder()
+
+        if options['scheduler']:
+            self.stdout.write(f'Batch scheduler running as {holder}')
+            try:
+                run_scheduler(holder=holder, poll_seconds=options['poll'], on_run=self.report)
+            except KeyboardInterrupt:
+                return
+        elif options['due']:
+            runs = run_due(holder)
+            for run in runs:
+                self.report(run)
+            if not runs:
+                self.stdout.write('No jobs due')
+        elif options['jobs']:
+            for name in options['jobs']:
+                run = run_job(name, holder)
+                if run is None:
+                    self.stdout.write(f'{name}: skipped, another node holds its lease')
+                else:
+                    self.report(run)
+        else:
+            for job in job_status():
+                last = job['last_run']
+                summary = 'never run' if last is None else (
+                    f"last {last['status']} at {last['started_at']:%Y-%m-%d %H:%M}, "
+                    f"{last['rows']:,} rows in {last['duration_seconds']}s"
+                )
+                self.stdout.write(f"{job['job']} ({job['schedule']}{', due' if job['due'] else ''}): {summary}")
+
+    def report(self, run):
+        line = f'{run.job}: {run.status}, {run.rows:,} rows in {run.chunks} chunks, {run.duration.total_seconds():.2f}s'
+        if run.error:
+            line += f' ({run.error})'
+        self.stdout.write(line)
@@ -0,0 +1,762 @@
+"""
+Generate production-sized data for load testing.
+
+Every table is filled with bulk_create in fixed-size chunks, primary keys are
+assigned up front so related rows can reference each other without reading
+anything back, and all randomness comes from a single seeded generator so two
+runs against the same starting database produce identical data.
+
+Example:
+    python manage.py seed_scale_data --patients 500000 --appointments 5000000 \
+        --payments 2000000 --inventory-transactions 10000000
+"""
+
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from appointments import slots
+from appointments.models import Appointment
+from billing.models import Bill, Payment
+from core.cache import invalidate_models
+from core.dates import start_of_day
+from core.search import search_index_for
+from core.sqlite import retry_on_locked
+from inventory.models import InventoryItem, InventoryTransaction
+from medical_records.models import LabTest, MedicalRecord, Prescription
+from patients.models import Patient
+from visitors.models import Visitor
+from wards.bedmap import reset_bed_map
+from wards.counters import reconcile
+from wards.models import Bed, Ward
+
+User = get_user_model()
+
+FIRST_NAMES = [
+    'James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda',
+    'William', 'Elizabeth', 'David', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica',
+    'Thomas', 'Sarah', 'Charles', 'Karen', 'Christopher', 'Nancy', 'Daniel', 'Lisa',
+    'Matthew', 'Betty', 'Anthony', 'Margaret', 'Mark', 'Sandra', 'Priya', 'Arjun',
+    'Wei', 'Mei', 'Ahmed', 'Fatima', 'Carlos', 'Sofia', 'Kenji', 'Aiko',
+]
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis',
+    'Rodriguez', 'Martinez', 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson',
+    'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin', 'Lee', 'Perez', 'Thompson',
+    'White', 'Harris', 'Sanchez', 'Clark', 'Ramirez', 'Lewis', 'Robinson', 'Kumar',
+    'Patel', 'Chen', 'Wang', 'Khan', 'Ali', 'Silva', 'Tanaka', 'Sato', 'Nguyen',
+]
+STREETS = ['Main St', 'Oak Ave', 'Pine Rd', 'Maple Dr', 'Cedar Ln', 'Elm St', 'Lake View', 'Hill Rd']
+DEPARTMENTS = [
+    ('Cardiology', 'Cardiologist'),
+    ('Neurology', 'Neurologist'),
+    ('Orthopedics', 'Orthopedic Surgeon'),
+    ('Pediatrics', 'Pediatrician'),
+    ('General Medicine', 'General Physician'),
+    ('Dermatology', 'Dermatologist'),
+    ('Oncology', 'Oncologist'),
+    ('Emergency', 'Emergency Physician'),
+]
+WARD_TYPES = [
+    ('General Ward', 'General Medicine'),
+    ('ICU', 'Intensive Care'),
+    ('Maternity', 'Obstetrics'),
+    ('Pediatric Ward', 'Pediatrics'),
+    ('Surgical Ward', 'Surgery'),
+    ('Cardiac Unit', 'Cardiology'),
+]
+DIAGNOSES = [
+    'Hypertension', 'Type 2 Diabetes', 'Upper Respiratory Infection', 'Migraine',
+    'Asthma', 'Gastroenteritis', 'Lower Back Pain', 'Anxiety Disorder',
+    'Urinary Tract Infection', 'Osteoarthritis', 'Bronchitis', 'Allergic Rhinitis',
+]
+MEDICATIONS = [
+    ('Paracetamol', '500mg'), ('Amoxicillin', '250mg'), ('Metformin', '500mg'),
+    ('Lisinopril', '10mg'), ('Ibuprofen', '400mg'), ('Omeprazole', '20mg'),
+    ('Salbutamol', '100mcg'), ('Atorvastatin', '20mg'),
+]
+LAB_TESTS = [
+    ('Complete Blood Count', 'CBC', 'Blood'), ('Lipid Panel', 'LIPID', 'Blood'),
+    ('HbA1c', 'HBA1C', 'Blood'), ('Urinalysis', 'UA', 'Urine'),
+    ('Liver Function Test', 'LFT', 'Blood'), ('Thyroid Panel', 'TSH', 'Blood'),
+    ('Chest X-Ray', 'CXR', 'Imaging'),
+]
+SERVICES = [
+    ('Consultation', 100), ('Blood Test', 50), ('X-Ray', 120), ('ECG', 80),
+    ('Room Charge', 250), ('Medication', 40), ('Physiotherapy', 90), ('MRI Scan', 600),
+]
+INVENTORY_NAMES = {
+    'medication': ['Paracetamol', 'Amoxicillin', 'Insulin', 'Morphine', 'Saline', 'Heparin'],
+    'medical_supplies': ['Surgical Gloves', 'Syringes', 'Gauze', 'Bandages', 'Catheters', 'Masks'],
+    'equipment': ['Thermometer', 'BP Monitor', 'Pulse Oximeter', 'Stethoscope', 'Infusion Pump'],
+    'consumables': ['Cotton Rolls', 'Alcohol Swabs', 'Specimen Cups', 'Tongue Depressors'],
+}
+SUPPLIERS = ['PharmaCorp', 'MedSupply Co', 'HealthLine', 'CareSource', 'BioMed Ltd', 'Global Meds']
+
+# Rough population frequencies so blood-type filters see realistic selectivity.
+BLOOD_TYPES = (['O+', 'A+', 'B+', 'AB+', 'O-', 'A-', 'B-', 'AB-'], [37, 36, 9, 3, 7, 6, 1.5, 0.5])
+APPOINTMENT_TYPES = (['consultation', 'follow-up', 'routine', 'emergency', 'surgery'], [45, 30, 15, 7, 3])
+PAYMENT_METHODS = (['card', 'cash', 'insurance', 'bank_transfer', 'check'], [40, 25, 25, 8, 2])
+LAB_PRIORITIES = (['routine', 'urgent', 'stat'], [80, 15, 5])
+
+SLOT_TIMES = [dt_time(9 + minutes // 60, minutes % 60) for minutes in range(0, 8 * 60, 30)]
+
+
+def chunked(iterable, size):
+    """Yield lists of at most ``size`` items from ``iterable``."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def next_id(model):
+    return (model.objects.aggregate(max_id=Max('id'))['max_id'] or 0) + 1
+
+
+@contextmanager
+def explicit_auto_dates(*models):
+    """Let generated rows carry their own auto_now/auto_now_add timestamps."""
+    saved = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                saved.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Seed large, realistic volumes of data across every app for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Rows per bulk_create/transaction (default: 5000)')
+        parser.add_argument('--days', type=int, default=730,
+                            help='Days of history to spread activity over (default: 730)')
+        parser.add_argument('--doctors', type=int, default=50)
+        parser.add_argument('--nurses', type=int, default=80)
+        parser.add_argument('--receptionists', type=int, default=20)
+        parser.add_argument('--wards', type=int, default=20)
+        parser.add_argument('--beds-per-ward', type=int, default=30)
+        parser.add_argument('--patients', type=int, default=10000)
+        parser.add_argument('--appointments', type=int, default=50000)
+        parser.add_argument('--medical-records', type=int, default=20000)
+        parser.add_argument('--prescriptions', type=int, default=15000)
+        parser.add_argument('--lab-tests', type=int, default=15000)
+        parser.add_argument('--bills', type=int, default=15000)
+        parser.add_argument('--payments', type=int, default=20000,
+                            help='Target number of payments, spread over the generated bills')
+        parser.add_argument('--inventory-items', type=int, default=2000)
+        parser.add_argument('--inventory-transactions', type=int, default=100000)
+        parser.add_argument('--visitors', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0:
+            raise CommandError('--chunk-size must be positive')
+        if options['patients'] <= 0 or options['doctors'] <= 0:
+            raise CommandError('At least one patient and one doctor are required')
+
+        self.rng = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        self.now = timezone.now().replace(microsecond=0)
+        self.today = timezone.localdate()
+        self.days = max(options['days'], 1)
+        self.started = time.monotonic()
+
+        with explicit_auto_dates(User, Ward, Bed, Patient, Appointment, MedicalRecord,
+                                 Prescription, LabTest, Bill, Payment, InventoryItem,
+                                 InventoryTransaction):
+            self.seed_users(options)
+            self.seed_wards(options)
+            self.seed_patients(options)
+            self.seed_beds(options)
+            self.seed_appointments(options)
+            self.seed_medical_records(options)
+            self.seed_prescriptions(options)
+            self.seed_lab_tests(options)
+            self.seed_bills_and_payments(options)
+            self.seed_inventory(options)
+            self.seed_visitors(options)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeding finished in {time.monotonic() - self.started:.1f}s'
+        ))
+
+    # Helpers
+
+    def bulk_insert(self, model, rows):
+        """Insert ``rows`` (an iterable of unsaved instances) chunk by chunk."""
+        started = time.monotonic()
+        total = 0
+        # Each chunk commits on its own and is retried if a running server
+        # holds the write lock.
+        insert = retry_on_locked(model.objects.bulk_create)
+        for chunk in chunked(rows, self.chunk_size):
+            insert(chunk, batch_size=self.chunk_size)
+            total += len(chunk)
+        # bulk_create sends no post_save, so cached analytics and search
+        # indexes are told directly.
+        invalidate_models(model)
+        index = search_index_for(model)
+        if index is not None:
+            using = router.db_for_write(model)
+            with transaction.atomic(using=using):
+                index.rebuild(using)
+        elapsed = time.monotonic() - started
+        rate = total / elapsed if elapsed > 0 else total
+        self.stdout.write(f'  {model._meta.db_table}: {total} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)')
+        return total
+
+    def past_datetime(self, max_days=None):
+        """A timestamp in the seeded history window, skewed towards recent days."""
+        span = self.days if max_days is None else min(max_days, self.days)
+        days_ago = int(span * (self.rng.random() ** 1.5))
+        seconds = self.rng.randint(7 * 3600, 20 * 3600)
+        moment = self.now - timedelta(days=days_ago)
+        return moment.replace(hour=0, minute=0, second=0) + timedelta(seconds=seconds)
+
+    def person_name(self):
+        return f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}"
+
+    def phone(self):
+        return f"555-{self.rng.randint(0, 9999):04d}-{self.rng.randint(0, 999):03d}"
+
+    def weighted(self, choices):
+        values, weights = choices
+        return self.rng.choices(values, weights)[0]
+
+    # Generators
+
+    def seed_users(self, options):
+        self.stdout.write('Seeding users...')
+        password = make_password('hospital123')
+        start = next_id(User)
+        roles = (
+            [('doctor', i) for i in range(options['doctors'])]
+            + [('nurse', i) for i in range(options['nurses'])]
+            + [('receptionist', i) for i in range(options['receptionists'])]
+        )
+
+        def rows():
+            for offset, (role, index) in enumerate(roles):
+                pk = start + offset
+                department, specialization = self.rng.choice(DEPARTMENTS)
+                joined = self.past_datetime()
+                yield User(
+                    id=pk,
+                    username=f'{role}_{pk}',
+                    password=password,
+                    first_name=self.rng.choice(FIRST_NAMES),
+                    last_name=self.rng.choice(LAST_NAMES),
+                    email=f'{role}_{pk}@hospital.test',
+                    role=role,
+                    department=department if role != 'receptionist' else 'Front Desk',
+                    phone=self.phone(),
+                    specialization=specialization if role == 'doctor' else '',
+                    experience=f'{self.rng.randint(1, 30)} years',
+                    status='active' if self.rng.random() > 0.05 else 'inactive',
+                    date_joined=joined,
+                    created_at=joined,
+                    updated_at=joined,
+                )
+
+        self.bulk_insert(User, rows())
+        ids = list(range(start, start + len(roles)))
+        self.doctor_ids = ids[:options['doctors']]
+        self.nurse_ids = ids[options['doctors']:options['doctors'] + options['nurses']]
+        self.receptionist_ids = ids[options['doctors'] + options['nurses']:]
+        self.staff_ids = self.nurse_ids + self.receptionist_ids or self.doctor_ids
+
+    def seed_wards(self, options):
+        self.stdout.write('Seeding wards...')
+        start = next_id(Ward)
+        self.wards = []
+
+        def rows():
+            for offset in range(options['wards']):
+                pk = start + offset
+                label, department = WARD_TYPES[offset % len(WARD_TYPES)]
+                created = self.now - timedelta(days=self.days)
+                ward = Ward(
+                    id=pk,
+                    name=f'{label} {pk}',
+                    department=department,
+                    floor=1 + offset % 6,
+                    total_beds=options['beds_per_ward'],
+                    nurse_in_charge=self.person_name(),
+                    status='active' if self.rng.random() > 0.1 else 'maintenance',
+                    description=f'{department} ward on floor {1 + offset % 6}',
+                    created_at=created,
+                    updated_at=created,
+                )
+                self.wards.append(ward)
+                yield ward
+
+        self.bulk_insert(Ward, rows())
+
+    def seed_patients(self, options):
+        self.stdout.write('Seeding patients...')
+        count = options['patients']
+        start = next_id(Patient)
+        self.patient_ids = range(start, start + count)
+
+        # Admissions are limited by the beds that exist; a small share of the
+        # population is in hospital at any time.
+        total_beds = len(self.wards) * options['beds_per_ward']
+        admitted = min(int(count * 0.05), int(total_beds * 0.8))
+        admitted_offsets = set(self.rng.sample(range(count), admitted)) if admitted else set()
+        bed_slots = [
+            (ward, number)
+            for ward in self.wards
+            for number in range(1, options['beds_per_ward'] + 1)
+        ]
+        self.rng.shuffle(bed_slots)
+        self.admissions = {}
+
+        def rows():
+            free_beds = iter(bed_slots)
+            for offset in range(count):
+                pk = start + offset
+                registered = self.past_datetime()
+                age = max(0, min(100, int(self.rng.gauss(44, 22))))
+                gender = self.rng.choices(['Male', 'Female', 'Other'], [49, 49, 2])[0]
+                name = self.person_name()
+                status = 'outpatient'
+                ward = None
+                bed_number = ''
+                admission_date = None
+                if offset in admitted_offsets:
+                    ward, number = next(free_beds)
+                    status = 'admitted'
+                    bed_number = f"{ward.name[:3].upper()}-{str(number).zfill(2)}"
+                    admission_date = self.today - timedelta(days=int(self.rng.expovariate(1 / 5)))
+                    self.admissions[(ward.id, bed_number)] = (pk, admission_date)
+                elif self.rng.random() < 0.15:
+                    status = 'discharged'
+                yield Patient(
+                    id=pk,
+                    name=name,
+                    age=age,
+                    gender=gender,
+                    phone=self.phone(),
+                    email=f"{name.lower().replace(' ', '.')}{pk}@example.com",
+                    address=f"{self.rng.randint(1, 9999)} {self.rng.choice(STREETS)}, City",
+                    emergency_contact=f"{self.person_name()} - {self.phone()}",
+                    blood_type=self.weighted(BLOOD_TYPES) if self.rng.random() > 0.1 else '',
+                    allergies=self.rng.choice(['None', 'None', 'None', 'Penicillin', 'Peanuts', 'Latex']),
+                    registration_date=registered.date(),
+                    last_visit=registered.date(),
+                    assigned_doctor_id=self.rng.choice(self.doctor_ids) if self.rng.random() > 0.2 else None,
+                    status=status,
+                    ward=ward,
+                    bed_number=bed_number,
+                    admission_date=admission_date,
+                    created_at=registered,
+                    updated_at=registered,
+                )
+
+        self.bulk_insert(Patient, rows())
+
+    def seed_beds(self, options):
+        self.stdout.write('Seeding beds...')
+        start = next_id(Bed)
+
+        def rows():
+            pk = start
+            for ward in self.wards:
+                for number in range(1, options['beds_per_ward'] + 1):
+                    bed_number = f"{ward.name[:3].upper()}-{str(number).zfill(2)}"
+                    patient_id, admission_date = self.admissions.get((ward.id, bed_number), (None, None))
+                    if patient_id:
+                        status = 'occupied'
+                    else:
+                        status = self.rng.choices(['available', 'cleaning', 'maintenance'], [88, 7, 5])[0]
+                    yield Bed(
+                        id=pk,
+                        ward=ward,
+                        number=bed_number,
+                        patient_id=patient_id,
+                        status=status,
+                        admission_date=admission_date,
+                        status_since=start_of_day(admission_date) if admission_date else self.now,
+                        created_at=ward.created_at,
+                        updated_at=self.now,
+                    )
+                    pk += 1
+
+        self.bulk_insert(Bed, rows())
+        # bulk_create skips the signals that keep the ward counters and
+        # the bed map version.
+        using = router.db_for_write(Ward)
+        with transaction.atomic(using=using):
+            reconcile(using)
+        reset_bed_map(using)
+
+    def seed_appointments(self, options):
+        count = options['appointments']
+        if not count:
+            return
+        self.stdout.write('Seeding appointments...')
+        start = next_id(Appointment)
+
+        # (doctor, date, time) must be unique. Walk the doctor/day/slot grid
+        # with a multiplicative permutation so slots are spread out but never
+        # reused. The grid covers the history window plus 60 days ahead.
+        future_days = 60
+        grid_days = self.days + future_days
+        per_doctor = grid_days * len(SLOT_TIMES)
+        capacity = per_doctor * len(self.doctor_ids)
+        if count > capacity:
+            raise CommandError(
+                f'{count} appointments do not fit in {len(self.doctor_ids)} doctors x '
+                f'{grid_days} days x {len(SLOT_TIMES)} slots; add --doctors or --days'
+            )
+        stride = self._coprime_stride(capacity)
+        offset_seed = self.rng.randrange(capacity)
+        first_day = self.today - timedelta(days=self.days)
+        creators = self.receptionist_ids or self.staff_ids
+
+        def rows():
+            for offset in range(count):
+                cell = (offset_seed + offset * stride) % capacity
+                doctor_index, rest = divmod(cell, per_doctor)
+                day_index, slot_index = divmod(rest, len(SLOT_TIMES))
+                day = first_day + timedelta(days=day_index)
+                if day < self.today:
+                    status = self.rng.choices(
+                        ['completed', 'cancelled', 'no_show', 'scheduled'], [78, 12, 8, 2]
+                    )[0]
+                else:
+                    status = 'scheduled' if self.rng.random() > 0.08 else 'cancelled'
+                created = timezone.make_aware(
+                    datetime.combine(day - timedelta(days=self.rng.randint(1, 30)), dt_time(10))
+                )
+                yield Appointment(
+                    id=start + offset,
+                    patient_id=self.rng.choice(self.patient_ids),
+                    doctor_id=self.doctor_ids[doctor_index],
+                    date=day,
+                    time=SLOT_TIMES[slot_index],
+                    type=self.weighted(APPOINTMENT_TYPES),
+                    status=status,
+                    notes='',
+                    created_by_id=self.rng.choice(creators),
+                    created_at=created,
+                    updated_at=created,
+                )
+
+        self.bulk_insert(Appointment, rows())
+        # bulk_create skips the signals that keep the slot occupancy bitmaps.
+        using = router.db_for_write(Appointment)
+        with transaction.atomic(using=using):
+            slots.rebuild(using)
+
+    def _coprime_stride(self, modulus):
+        # Any stride coprime with the modulus visits every cell exactly once.
+        from math import gcd
+        stride = int(modulus * 0.618033) | 1
+        while gcd(stride, modulus) != 1:
+            stride += 2
+        return stride
+
+    def seed_medical_records(self, options):
+        count = options['medical_records']
+        if not count:
+            return
+        self.stdout.write('Seeding medical records...')
+        start = next_id(MedicalRecord)
+        self.record_ids = range(start, start + count)
+
+        def rows():
+            for offset in range(count):
+                moment = self.past_datetime()
+                diagnosis = self.rng.choice(DIAGNOSES)
+                medication, dosage = self.rng.choice(MEDICATIONS)
+                follow_up = None
+                if self.rng.random() < 0.3:
+                    follow_up = moment.date() + timedelta(days=self.rng.choice([7, 14, 30, 90]))
+                yield MedicalRecord(
+                    id=start + offset,
+                    patient_id=self.rng.choice(self.patient_ids),
+                    doctor_id=self.rng.choice(self.doctor_ids),
+                    date=moment.date(),
+                    symptoms=f'Presented with symptoms consistent with {diagnosis.lower()}',
+                    diagnosis=diagnosis,
+                    treatment=f'Prescribed {medication} and advised rest',
+                    medications=[{'name': medication, 'dosage': dosage, 'frequency': 'Twice daily'}],
+                    notes='',
+                    follow_up=follow_up,
+                    vital_signs={
+                        'blood_pressure': f'{self.rng.randint(100, 160)}/{self.rng.randint(60, 100)}',
+                        'temperature': round(self.rng.uniform(36.1, 39.0), 1),
+                        'pulse': self.rng.randint(55, 110),
+                    },
+                    allergies_noted='',
+                    created_at=moment,
+                    updated_at=moment,
+                )
+
+        self.bulk_insert(MedicalRecord, rows())
+
+    def seed_prescriptions(self, options):
+        count = options['prescriptions']
+        if not count:
+            return
+        self.stdout.write('Seeding prescriptions...')
+        start = next_id(Prescription)
+        record_ids = getattr(self, 'record_ids', None)
+
+        def rows():
+            for offset in range(count):
+                moment = self.past_datetime()
+                medication, dosage = self.rng.choice(MEDICATIONS)
+                days = self.rng.choice([5, 7, 10, 14, 30])
+                recent = (self.now - moment).days < days
+                refills = self.rng.choice([0, 0, 1, 2, 3])
+                yield Prescription(
+                    id=start + offset,
+                    patient_id=self.rng.choice(self.patient_ids),
+                    doctor_id=self.rng.choice(self.doctor_ids),
+                    medical_record_id=self.rng.choice(record_ids) if record_ids and self.rng.random() < 0.6 else None,
+                    date=moment.date(),
+                    medications=[{
+                        'name': medication, 'dosage': dosage,
+                        'frequency': 'Twice daily', 'duration': f'{days} days',
+                    }],
+                    instructions='Take after meals',
+                    status='active' if recent else self.rng.choices(['completed', 'cancelled'], [92, 8])[0],
+                    duration=f'{days} days',
+                    refills_allowed=refills,
+                    refills_used=self.rng.randint(0, refills),
+                    created_at=moment,
+                    updated_at=moment,
+                )
+
+        self.bulk_insert(Prescription, rows())
+
+    def seed_lab_tests(self, options):
+        count = options['lab_tests']
+        if not count:
+            return
+        self.stdout.write('Seeding lab tests...')
+        start = next_id(LabTest)
+
+        def rows():
+            for offset in range(count):
+                moment = self.past_datetime()
+                test_type, code, sample = self.rng.choice(LAB_TESTS)
+                age_days = (self.now - moment).days
+                if age_days > 7:
+                    status = self.rng.choices(['completed', 'cancelled'], [95, 5])[0]
+                else:
+                    status = self.rng.choices(['pending', 'in_progress', 'completed'], [40, 25, 35])[0]
+                completed = None
+                if status == 'completed':
+                    completed = moment.date() + timedelta(days=min(age_days, self.rng.randint(0, 3)))
+                yield LabTest(
+                    id=start + offset,
+                    patient_id=self.rng.choice(self.patient_ids),
+                    ordered_by_id=self.rng.choice(self.doctor_ids),
+                    test_type=test_type,
+                    test_code=code,
+                    ordered_date=moment.date(),
+                    status=status,
+                    priority=self.weighted(LAB_PRIORITIES),
+                    results='Within normal limits' if completed else '',
+                    completed_date=completed,
+                    sample_type=sample,
+                    fasting_required=code in ('LIPID', 'HBA1C'),
+                    created_at=moment,
+                    updated_at=moment,
+                )
+
+        self.bulk_insert(LabTest, rows())
+
+    def seed_bills_and_payments(self, options):
+        bill_count = options['bills']
+        if not bill_count:
+            return
+        self.stdout.write('Seeding bills and payments...')
+        bill_start = next_id(Bill)
+        payment_start = next_id(Payment)
+        payments_per_bill = options['payments'] / bill_count
+        payments = []
+        remaining = options['payments']
+        creators = self.receptionist_ids or self.staff_ids
+
+        def bills():
+            nonlocal remaining
+            for offset in range(bill_count):
+                pk = bill_start + offset
+                moment = self.past_datetime()
+                services = [
+                    {'name': name, 'amount': float(amount)}
+                    for name, amount in self.rng.sample(SERVICES, self.rng.randint(1, 4))
+                ]
+                total = Decimal(sum(service['amount'] for service in services)).quantize(Decimal('0.01'))
+
+                wanted = min(remaining, int(self.rng.uniform(0, 2 * payments_per_bill) + 0.5))
+                status = 'pending'
+                paid = Decimal('0.00')
+                payment_date = None
+                if wanted:
+                    fully_paid = self.rng.random() < 0.8
+                    target = total if fully_paid else (total * Decimal('0.5')).quantize(Decimal('0.01'))
+                    share = (target / wanted).quantize(Decimal('0.01'))
+                    for index in range(wanted):
+                        amount = share if index < wanted - 1 else target - share * (wanted - 1)
+                        paid_at = min(moment + timedelta(days=index * self.rng.randint(1, 20)), self.now)
+                        payments.append(Payment(
+                            bill_id=pk,
+                            amount=amount,
+                            payment_method=self.weighted(PAYMENT_METHODS),
+                            transaction_id=f'TXN{pk:09d}{index:02d}',
+                            notes='',
+                            processed_by_id=self.rng.choice(creators),
+                            date=paid_at,
+                        ))
+                    remaining -= wanted
+                    paid = target
+                    status = 'paid' if fully_paid else 'partial'
+                    payment_date = payments[-1].date.date() if fully_paid else None
+                elif self.rng.random() < 0.1:
+                    status = 'cancelled'
+
+                yield Bill(
+                    id=pk,
+                    patient_id=self.rng.choice(self.patient_ids),
+                    date=moment.date(),
+                    services=services,
+                    total_amount=total,
+                    paid_amount=paid,
+                    status=status,
+                    payment_date=payment_date,
+                    created_by_id=self.rng.choice(creators),
+                    created_at=moment,
+                    updated_at=moment,
+                )
+
+        def payment_rows():
+            # Drain the payments produced while bills were being generated.
+            pk = payment_start
+            for bill_chunk in chunked(bills(), self.chunk_size):
+                with transaction.atomic():
+                    Bill.objects.bulk_create(bill_chunk, batch_size=self.chunk_size)
+                self.bills_created += len(bill_chunk)
+                pending = payments[:]
+                payments.clear()
+                for payment in pending:
+                    payment.id = pk
+                    pk += 1
+                    yield payment
+
+        self.bills_created = 0
+        self.bulk_insert(Payment, payment_rows())
+        invalidate_models(Bill)
+        self.stdout.write(f'  bills: {self.bills_created} rows')
+
+    def seed_inventory(self, options):
+        item_count = options['inventory_items']
+        if not item_count:
+            return
+        self.stdout.write('Seeding inventory...')
+        item_start = next_id(InventoryItem)
+        categories = list(INVENTORY_NAMES)
+
+        def items():
+            for offset in range(item_count):
+                category = self.rng.choice(categories)
+                base = self.rng.choice(INVENTORY_NAMES[category])
+                created = self.now - timedelta(days=self.days)
+                min_stock = self.rng.choice([10, 20, 50, 100])
+                yield InventoryItem(
+                    id=item_start + offset,
+                    name=f'{base} #{item_start + offset}',
+                    category=category,
+                    quantity=max(0, int(self.rng.gauss(min_stock * 3, min_stock * 1.5))),
+                    unit=self.rng.choice(['Tablets', 'Boxes', 'Units', 'Vials', 'Packs']),
+                    min_stock=min_stock,
+                    supplier=self.rng.choice(SUPPLIERS),
+                    expiry_date=self.today + timedelta(days=self.rng.randint(-60, 3 * 365)),
+                    cost_per_unit=Decimal(self.rng.uniform(0.2, 250)).quantize(Decimal('0.01')),
+                    location=f"{self.rng.choice(['Pharmacy', 'Storage', 'Ward Store'])} "
+                             f"{self.rng.choice('ABCDEF')}-{self.rng.randint(1, 9)}",
+                    created_at=created,
+                    updated_at=self.now,
+                )
+
+        self.bulk_insert(InventoryItem, items())
+
+        count = options['inventory_transactions']
+        if not count:
+            return
+        item_ids = range(item_start, item_start + item_count)
+        start = next_id(InventoryTransaction)
+        performers = self.staff_ids
+
+        def transactions():
+            for offset in range(count):
+                kind = self.rng.choices(['out', 'in', 'adjustment'], [70, 25, 5])[0]
+                if kind == 'out':
+                    quantity, reason = self.rng.randint(1, 20), 'Dispensed to ward'
+                elif kind == 'in':
+                    quantity, reason = self.rng.randint(20, 500), f'Restocked from {self.rng.choice(SUPPLIERS)}'
+                else:
+                    quantity, reason = self.rng.randint(1, 10), 'Stock count correction'
+                yield InventoryTransaction(
+                    id=start + offset,
+                    item_id=self.rng.choice(item_ids),
+                    transaction_type=kind,
+                    quantity=quantity,
+                    reason=reason,
+                    performed_by_id=self.rng.choice(performers),
+                    date=self.past_datetime(),
+                )
+
+        self.bulk_insert(InventoryTransaction, transactions())
+
+    def seed_visitors(self, options):
+        count = options['visitors']
+        if not count:
+            return
+        self.stdout.write('Seeding visitors...')
+        start = next_id(Visitor)
+        relationships = ['Spouse', 'Parent', 'Child', 'Sibling', 'Friend']
+
+        def rows():
+            for offset in range(count):
+                checked_in = self.past_datetime(max_days=90)
+                recent = (self.now - checked_in) < timedelta(hours=4)
+                yield Visitor(
+                    id=start + offset,
+                    name=self.person_name(),
+                    phone=self.phone(),
+                    patient_id=self.rng.choice(self.patient_ids),
+                    relationship=self.rng.choice(relationships),
+                    purpose='Visit',
+                    idType=self.rng.choice(['Driver License', 'Passport', 'National ID']),
+                    idNumber=f'ID{self.rng.randint(100000, 999999)}',
+                    checkInTime=checked_in,
+                    status=self.rng.choice(['visiting', 'waiting']) if recent else 'checked-out',
+                )
+
+        self.bulk_insert(Visitor, rows())
@@ -0,0 +1,83 @@
+import logging
+import random
+import time
+
+from django.conf import settings
+
+from .instrumentation import RequestProfile, current_profile, profiling
+
+logger = logging.getLogger(__name__)
+
+PROFILING_DEFAULTS = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 1.0,
+    'SLOW_REQUEST_MS': 500,
+    'MAX_QUERIES': 50,
+    'TOP_FINGERPRINTS': 5,
+}
+
+
+def profiling_settings():
+    return {**PROFILING_DEFAULTS, **getattr(settings, 'REQUEST_PROFILING', {})}
+
+
+class RequestProfilingMiddleware:
+    """
+    Measure queries, DB time, serialization and render time per request.
+
+    Sampled requests get a ``Server-Timing`` header; requests that are slower
+    than ``SLOW_REQUEST_MS`` or run more than ``MAX_QUERIES`` statements are
+    logged with their most repeated SQL fingerprints. Unsampled requests only
+    pay for one random number.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = profiling_settings()
+
+    def should_profile(self, request):
+        if not self.config['ENABLED']:
+            return False
+        return random.random() < self.config['SAMPLE_RATE']
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        with profiling(RequestProfile()) as profile:
+            response = self.get_response(request)
+
+        response['Server-Timing'] = profile.server_timing()
+        self.log_if_slow(request, response, profile)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after this hook returns.
+        profile = current_profile()
+        if profile is not None:
+            render_started = time.perf_counter()
+
+            def rendered(response):
+                profile.render += time.perf_counter() - render_started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def log_if_slow(self, request, response, profile):
+        elapsed_ms = profile.elapsed * 1000
+        queries = profile.queries
+        if elapsed_ms < self.config['SLOW_REQUEST_MS'] and queries.count <= self.config['MAX_QUERIES']:
+            return
+        top = queries.fingerprints.most_common(self.config['TOP_FINGERPRINTS'])
+        logger.warning(
+            'Slow request %s %s -> %s: %.0fms, %d queries (db %.0fms, serialize %.0fms, render %.0fms)%s',
+            request.method,
+            request.get_full_path(),
+            response.status_code,
+            elapsed_ms,
+            queries.count,
+            queries.duration * 1000,
+            profile.serialize * 1000,
+            profile.render * 1000,
+            ''.join(f'\n  {count}x {sql[:300]}' for sql, count in top),
+        )
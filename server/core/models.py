@@ -0,0 +1,42 @@
+from django.db import models
+
+class BatchRun(models.Model):
+    """One run of a batch job (core.batch), kept as history."""
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    job = models.CharField(max_length=100)
+    holder = models.CharField(max_length=200)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration = models.DurationField(null=True, blank=True)
+    rows = models.IntegerField(default=0)
+    chunks = models.IntegerField(default=0)
+    detail = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        db_table = 'batch_runs'
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['job', 'started_at'], name='batch_run_job_started_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.job} at {self.started_at} - {self.status}"
+
+class BatchLease(models.Model):
+    """Which node may run a batch job, until ``expires_at``."""
+    name = models.CharField(max_length=100, primary_key=True)
+    holder = models.CharField(max_length=200)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'batch_leases'
+
+    def __str__(self):
+        return f"{self.name} held by {self.holder} until {self.expires_at}"
@@ -0,0 +1,198 @@
+"""
+N+1 query detection for DRF serializers.
+
+While a serializer builds its output (one *serialization pass*, i.e. one call
+to ``serializer.data``), every query is attributed to the serializer field
+that was being rendered when it ran. When the same statement shape runs at
+least ``THRESHOLD`` times for the same field, the field is reported together
+with the view that served the request, and optionally an ``NPlusOneError`` is
+raised so tests fail.
+"""
+
+import logging
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+from .instrumentation import fingerprint
+
+logger = logging.getLogger(__name__)
+
+DETECTION_DEFAULTS = {
+    'ENABLED': False,
+    'THRESHOLD': 3,
+    'RAISE': False,
+}
+
+
+def detection_settings():
+    return {**DETECTION_DEFAULTS, **getattr(settings, 'NPLUSONE_DETECTION', {})}
+
+
+class NPlusOneError(Exception):
+    def __init__(self, reports):
+        self.reports = reports
+        super().__init__('; '.join(str(report) for report in reports))
+
+
+class NPlusOneReport:
+    def __init__(self, view, field, sql, count):
+        self.view = view
+        self.field = field
+        self.sql = sql
+        self.count = count
+
+    def __str__(self):
+        return f'{self.view or "<no view>"}: {self.field} ran {self.count} similar queries: {self.sql[:200]}'
+
+
+class NPlusOneDetector:
+    """Execute wrapper that groups queries by serializer field."""
+
+    def __init__(self, threshold=3, raise_errors=False, view=None):
+        self.threshold = threshold
+        self.raise_errors = raise_errors
+        self.view = view
+        self.reports = []
+        self._fields = []
+        self._depth = 0
+        self._counts = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        if self._depth:
+            self._counts[(self.current_field(), fingerprint(sql))] += 1
+        return execute(sql, params, many, context)
+
+    def current_field(self):
+        return ' > '.join(self._fields) if self._fields else '<queryset>'
+
+    @contextmanager
+    def serialization_pass(self, serializer):
+        self._depth += 1
+        if self._depth == 1:
+            self._fields = [type(serializer).__name__]
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if not self._depth:
+                self._finish_pass()
+
+    def enter_field(self, serializer, field):
+        self._fields.append(f'{type(serializer).__name__}.{field.field_name}')
+
+    def leave_field(self):
+        self._fields.pop()
+
+    def _finish_pass(self):
+        found = [
+            NPlusOneReport(self.view, field, sql, count)
+            for (field, sql), count in self._counts.items()
+            if count >= self.threshold
+        ]
+        self._counts.clear()
+        self._fields = []
+        if not found:
+            return
+        self.reports.extend(found)
+        for report in found:
+            logger.warning('Possible N+1 query in %s', report)
+        if self.raise_errors:
+            raise NPlusOneError(found)
+
+
+_current_detector = ContextVar('nplusone_detector', default=None)
+
+
+@contextmanager
+def detect_nplusone(threshold=None, raise_errors=None, view=None):
+    """Watch serializers for N+1 queries while the block runs.
+
+    Usable directly in tests::
+
+        with detect_nplusone(raise_errors=True):
+            client.get('/api/appointments/')
+    """
+    config = detection_settings()
+    detector = NPlusOneDetector(
+        threshold=config['THRESHOLD'] if threshold is None else threshold,
+        raise_errors=config['RAISE'] if raise_errors is None else raise_errors,
+        view=view,
+    )
+    token = _current_detector.set(detector)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(detector))
+            yield detector
+    finally:
+        _current_detector.reset(token)
+
+
+_installed = False
+
+
+def install_serializer_hooks():
+    """Track which serializer field is being rendered.
+
+    ``Serializer.to_representation`` walks ``_readable_fields`` and renders
+    each field before asking for the next one, so a generator that records
+    the field it just yielded knows which field any query belongs to. The
+    outermost ``serializer.data`` call delimits a serialization pass.
+    """
+    global _installed
+    if _installed:
+        return
+    _installed = True
+
+    from rest_framework.serializers import BaseSerializer, Serializer
+
+    original_data = BaseSerializer.data
+    original_fields = Serializer._readable_fields
+
+    def data(self):
+        detector = _current_detector.get()
+        if detector is None:
+            return original_data.fget(self)
+        with detector.serialization_pass(self):
+            return original_data.fget(self)
+
+    def _readable_fields(self):
+        detector = _current_detector.get()
+        if detector is None or not detector._depth:
+            yield from original_fields.fget(self)
+            return
+        for field in original_fields.fget(self):
+            detector.enter_field(self, field)
+            try:
+                yield field
+            finally:
+                detector.leave_field()
+
+    BaseSerializer.data = property(data)
+    Serializer._readable_fields = property(_readable_fields)
+
+
+class NPlusOneDetectionMiddleware:
+    """Run every request under ``detect_nplusone`` when detection is enabled."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = detection_settings()['ENABLED']
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+        with detect_nplusone():
+            return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        detector = _current_detector.get()
+        if detector is not None:
+            view_class = getattr(view_func, 'cls', None)
+            name = view_class.__name__ if view_class else view_func.__name__
+            detector.view = f'{name} ({request.resolver_match.view_name})'
+        return None
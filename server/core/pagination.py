@@ -0,0 +1,189 @@
+"""
+Opt-in keyset (cursor) pagination.
+
+``PageNumberPagination`` counts the whole table and skips ``OFFSET`` rows on
+every request, so page 500 of payments reads 10,000 rows to return 20.
+Keyset pagination remembers the ordering values of the last row instead and
+asks for rows after it, which an index on the ordering walks straight to.
+
+``KeysetOptInPagination`` keeps page-number responses by default. Passing
+``cursor`` (empty for the first page) switches a request to keyset mode::
+
+    GET /api/payments/?cursor=
+    {"next": ".../api/payments/?cursor=eyJ2Ijo...", "previous": null, "results": [...]}
+
+The keyset is the view's existing ordering (its ``order_by`` or the model's
+``Meta.ordering``) with the primary key appended, in the direction of the
+last field, so rows sharing a date still come out in a stable order.
+"""
+
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Paginate on ``(ordering..., pk)`` without ``COUNT`` or ``OFFSET``."""
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, page_size=None):
+        self.page_size = page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        self.meta = queryset.model._meta
+        self.keys = self.get_keys(queryset)
+        position, reverse = self.decode_cursor(request)
+
+        rows = list(self.order_after(queryset, position, reverse)[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        # A forward cursor came from an earlier page and a backward one from
+        # a later page, so that side always has rows (barring deletes).
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = position is not None if not reverse else has_more
+        if not rows:
+            self.has_next = self.has_previous = False
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        page_size = self.page_size or api_settings.PAGE_SIZE or 20
+        try:
+            requested = int(request.query_params.get(self.page_size_query_param, page_size))
+        except (TypeError, ValueError):
+            return page_size
+        return max(1, min(requested, self.max_page_size))
+
+    def get_keys(self, queryset):
+        """``(field, descending)`` pairs for the view's ordering plus the pk."""
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        pk = queryset.model._meta.pk.name
+        keys = []
+        for name in ordering:
+            if not isinstance(name, str) or name == '?':
+                raise ValueError(f'Keyset pagination needs plain field orderings, got {name!r}')
+            descending = name.startswith('-')
+            name = name.lstrip('-+')
+            keys.append(('pk' if name == pk else name, descending))
+        if not any(name == 'pk' for name, _ in keys):
+            keys.append(('pk', keys[-1][1] if keys else False))
+        return keys
+
+    def order_after(self, queryset, position=None, reverse=False):
+        """``queryset`` in keyset order (backwards if ``reverse``), from ``position`` on."""
+        keys = [(name, descending != reverse) for name, descending in self.keys]
+        queryset = queryset.order_by(*[f'-{name}' if descending else name for name, descending in keys])
+        if position is not None:
+            queryset = queryset.filter(self.after(keys, position))
+        return queryset
+
+    def after(self, keys, position):
+        """Rows strictly after ``position`` in ``keys`` order.
+
+        ``a > x OR (a = x AND b > y) ...``, plus a plain bound on the leading
+        key so the database can seek its index instead of scanning.
+        """
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(keys, position):
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        name, descending = keys[0]
+        return Q(**{f'{name}__{"lte" if descending else "gte"}': position[0]}) & condition
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+            values, reverse = payload['v'], bool(payload.get('r'))
+            if len(values) != len(self.keys):
+                raise ValueError(values)
+            fields = [self.field(name) for name, _ in self.keys]
+            return [field.to_python(value) for field, value in zip(fields, values)], reverse
+        except (TypeError, ValueError, KeyError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance, reverse):
+        fields = [self.field(name) for name, _ in self.keys]
+        if isinstance(instance, dict):
+            # A values() row, as core.projections renders lists from.
+            values = [instance[field.name] for field in fields]
+        else:
+            values = [getattr(instance, field.attname) for field in fields]
+        payload = {'v': [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]}
+        if reverse:
+            payload['r'] = 1
+        token = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def field(self, name):
+        return self.meta.pk if name == 'pk' else self.meta.get_field(name)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+
+class KeysetOptInPagination(PageNumberPagination):
+    """Page numbers by default; keyset pages when the request sends ``cursor``."""
+
+    keyset_class = KeysetPagination
+    page_size_query_param = KeysetPagination.page_size_query_param
+    max_page_size = KeysetPagination.max_page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class(self.page_size)
+            return self.keyset.paginate_queryset(queryset, request, view)
+        self.keyset = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
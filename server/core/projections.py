@@ -0,0 +1,213 @@
+"""
+Read-only list serialization straight from ``values()`` rows.
+
+A ``ModelSerializer`` list builds a model instance for every row, then walks
+each field's ``source`` with ``get_attribute``; on long lists that is most of
+the request's CPU. A ``Projection`` reads its serializer's fields once and
+turns each into a ``values()`` lookup (``patient.name`` -> ``patient__name``),
+so a list is one ``values()`` query and a loop that copies columns into
+dicts.
+
+The output is the serializer's, byte for byte: the same keys in the same
+order, the field's own ``to_representation`` wherever it changes the value
+(dates, times, decimals, JSON), and a field on a null relation left out of
+the row, as DRF's ``SkipField`` does. Model properties and methods
+(``total_value``, ``get_full_name``) are run on a stand-in object holding the
+columns named in ``attributes``. Fields a projection cannot reproduce
+(nested serializers, ``SerializerMethodField``...) raise
+``ImproperlyConfigured`` the first time the projection is used.
+
+Viewsets opt in with ``list_projection``; see ``core.exports.ExportMixin``.
+``python manage.py benchmark_projections`` checks every registered
+projection against its serializer and reports rows per second for both.
+"""
+
+import threading
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from rest_framework import serializers
+
+LIST_PROJECTIONS_DEFAULTS = {
+    'ENABLED': True,
+}
+
+# Columns each model method or property reads, by attribute name.
+DEFAULT_ATTRIBUTES = {
+    'get_full_name': ('first_name', 'last_name'),
+}
+
+# Field types whose to_representation() returns database values unchanged.
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+    serializers.PrimaryKeyRelatedField,
+    serializers.ReadOnlyField,
+)
+
+# Field types that need a model instance or a request to render.
+UNSUPPORTED_FIELDS = (
+    serializers.BaseSerializer,
+    serializers.HiddenField,
+    serializers.ManyRelatedField,
+    serializers.SerializerMethodField,
+)
+
+PROJECTIONS = []
+
+
+def projection_settings():
+    return {**LIST_PROJECTIONS_DEFAULTS, **getattr(settings, 'LIST_PROJECTIONS', {})}
+
+
+class ProjectedField:
+    """How one serializer field is read from a ``values()`` row."""
+
+    __slots__ = ('name', 'lookup', 'guards', 'convert', 'compute')
+
+    def __init__(self, name, lookup=None, guards=(), convert=None, compute=None):
+        self.name = name
+        self.lookup = lookup
+        self.guards = guards
+        self.convert = convert
+        self.compute = compute
+
+
+class Projection:
+    """Render ``serializer_class``'s list output from ``values()`` rows."""
+
+    def __init__(self, serializer_class, attributes=None):
+        self.serializer_class = serializer_class
+        self.attributes = {**DEFAULT_ATTRIBUTES, **(attributes or {})}
+        self._fields = None
+        self._lock = threading.Lock()
+        PROJECTIONS.append(self)
+
+    def __repr__(self):
+        return f'<Projection {self.serializer_class.__name__}>'
+
+    @property
+    def model(self):
+        return self.serializer_class.Meta.model
+
+    @property
+    def fields(self):
+        if self._fields is None:
+            with self._lock:
+                if self._fields is None:
+                    self._fields = self.compile()
+        return self._fields
+
+    @property
+    def lookups(self):
+        names = []
+        for field in self.fields:
+            for name in (*field.guards, *(field.lookup if field.compute else [field.lookup])):
+                if name not in names:
+                    names.append(name)
+        return names
+
+    @property
+    def select_related(self):
+        """Relations the serializer follows, to benchmark it without N+1 queries."""
+        lookups = [name for field in self.fields for name in (field.lookup if field.compute else [field.lookup])]
+        return sorted({lookup.rsplit('__', 1)[0] for lookup in lookups if '__' in lookup})
+
+    def compile(self):
+        serializer = self.serializer_class()
+        return [
+            self.compile_field(name, field)
+            for name, field in serializer.fields.items()
+            if not field.write_only
+        ]
+
+    def compile_field(self, name, field):
+        if isinstance(field, UNSUPPORTED_FIELDS) or not field.source_attrs:
+            raise ImproperlyConfigured(
+                f'{self.serializer_class.__name__}.{name} ({type(field).__name__}) '
+                'cannot be rendered from values() rows'
+            )
+        convert = None if isinstance(field, PASSTHROUGH_FIELDS) else field.to_representation
+
+        model = self.model
+        path = []
+        guards = []
+        *relations, attr = field.source_attrs
+        for relation in relations:
+            try:
+                model_field = model._meta.get_field(relation)
+            except FieldDoesNotExist:
+                model_field = None
+            if model_field is None or not (model_field.many_to_one or model_field.one_to_one) \
+                    or model_field.auto_created:
+                raise ImproperlyConfigured(
+                    f'{self.serializer_class.__name__}.{name}: {relation!r} is not a forward relation'
+                )
+            path.append(relation)
+            if model_field.null:
+                guards.append('__'.join(path))
+            model = model_field.related_model
+
+        try:
+            model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            model_field = None
+        if model_field is not None and model_field.concrete:
+            return ProjectedField(name, '__'.join([*path, attr]), tuple(guards), convert)
+
+        if attr not in self.attributes or not hasattr(model, attr):
+            raise ImproperlyConfigured(
+                f'{self.serializer_class.__name__}.{name}: list the columns '
+                f'{model.__name__}.{attr} reads in Projection(attributes=...)'
+            )
+        columns = self.attributes[attr]
+        lookups = ['__'.join([*path, column]) for column in columns]
+        member = getattr(model, attr)
+        function = member.fget if isinstance(member, property) else member
+        return ProjectedField(name, lookups, tuple(guards), convert, _computed(function, columns, lookups))
+
+    def values(self, queryset):
+        """``queryset`` as ``values()`` rows carrying every column needed.
+
+        Ordering columns and the primary key come along too, so keyset
+        pagination can build its cursor from the last row.
+        """
+        meta = queryset.model._meta
+        names = self.lookups
+        for name in [meta.pk.name, *(queryset.query.order_by or meta.ordering)]:
+            if not isinstance(name, str):
+                continue
+            name = name.lstrip('-+')
+            name = meta.pk.name if name == 'pk' else name
+            if name not in names and name != '?':
+                names.append(name)
+        return queryset.prefetch_related(None).values(*names)
+
+    def to_representation(self, row):
+        data = {}
+        for field in self.fields:
+            if field.guards and any(row[guard] is None for guard in field.guards):
+                continue
+            value = field.compute(row) if field.compute else row[field.lookup]
+            if value is None:
+                data[field.name] = None
+            elif field.convert is None:
+                data[field.name] = value
+            else:
+                data[field.name] = field.convert(value)
+        return data
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
+def _computed(function, columns, lookups):
+    """Call a model method or property getter on a stand-in holding ``columns``."""
+    pairs = tuple(zip(columns, lookups))
+
+    def compute(row):
+        return function(SimpleNamespace(**{column: row[lookup] for column, lookup in pairs}))
+    return compute
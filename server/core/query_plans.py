@@ -0,0 +1,204 @@
+"""
+Query-plan checks for the filter combinations the API depends on.
+
+Each entry in ``PLAN_CHECKS`` builds the queryset a view runs (same filters,
+same ordering, first page where the view paginates) for a given ``today``.
+``explain_check`` asks the database for its plan and reports every table it
+would read without an index, so a missing or unusable index is caught before
+the data grows.
+"""
+
+import re
+from datetime import time, timedelta
+
+from django.apps import apps
+from django.db import connections
+from django.db.models import F
+from django.utils import timezone
+
+from accounts.models import User
+from appointments.models import Appointment
+from billing.models import Bill, Payment
+from core.dates import day_range, start_of_day
+from core.pagination import KeysetPagination
+from inventory.models import InventoryItem, InventoryTransaction
+from medical_records.models import LabTest, MedicalRecord, Prescription
+from patients.models import Patient
+from visitors.models import Visitor
+from wards.models import Bed
+
+PAGE = 20
+
+# Full scans look different per backend. SQLite before 3.36 says "SCAN TABLE";
+# "SCAN x USING INDEX y" walks the whole index in order instead of the table.
+SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?:TABLE )?(?P<table>\w+)(?: USING (?:COVERING )?INDEX (?P<index>\w+))?'),
+    'postgresql': re.compile(r'\bSeq Scan on (?P<table>\w+)'),
+}
+SORT_PATTERNS = {
+    'sqlite': re.compile(r'USE TEMP B-TREE FOR (?:ORDER BY|RIGHT PART OF ORDER BY)'),
+    'postgresql': re.compile(r'^\s*(?:->\s*)?Sort\b'),
+}
+
+
+class PlanCheck:
+    def __init__(self, name, build, allow_scan=()):
+        self.name = name
+        self.build = build
+        # Tables that are expected to be scanned, e.g. tiny lookup tables.
+        self.allow_scan = set(allow_scan)
+
+    def __repr__(self):
+        return f'<PlanCheck {self.name}>'
+
+
+class PlanResult:
+    def __init__(self, check, lines):
+        self.check = check
+        self.lines = lines
+        self.scans = []
+        self.index_walks = []
+        self.sorts = 0
+
+
+def partial_indexes():
+    """Names of indexes declared with a ``condition``; scanning them is cheap."""
+    return {
+        index.name
+        for model in apps.get_models()
+        for index in model._meta.indexes
+        if index.condition is not None
+    }
+
+
+def explain_check(check, using='default', partial=None):
+    """Explain one check and classify what its plan reads in full.
+
+    ``scans`` are tables read without any index. ``index_walks`` are
+    unbounded walks over a whole index, which the planner prefers for
+    unselective filters because they avoid a sort; they are reported but
+    usually acceptable. Walks stopped by a LIMIT or over a partial index
+    are not reported.
+    """
+    vendor = connections[using].vendor
+    if vendor not in SCAN_PATTERNS:
+        raise NotImplementedError(f'Query plan checks do not support {vendor}')
+    partial = partial_indexes() if partial is None else partial
+    queryset = check.build(timezone.localdate()).using(using)
+    limited = queryset.query.high_mark is not None
+    result = PlanResult(check, queryset.explain().splitlines())
+    for line in result.lines:
+        match = SCAN_PATTERNS[vendor].search(line)
+        index = match and match.groupdict().get('index')
+        if match and not index:
+            if match['table'] not in check.allow_scan:
+                result.scans.append(match['table'])
+        elif match and not limited and index not in partial:
+            result.index_walks.append(index)
+        if SORT_PATTERNS[vendor].search(line):
+            result.sorts += 1
+    return result
+
+
+WEEK = timedelta(days=7)
+MONTH = timedelta(days=30)
+
+
+def keyset_page(queryset, *position):
+    """The query ``KeysetOptInPagination`` runs for the page after ``position``."""
+    paginator = KeysetPagination()
+    paginator.keys = paginator.get_keys(queryset)
+    return paginator.order_after(queryset, list(position))[:PAGE + 1]
+
+PLAN_CHECKS = [
+    # Appointments
+    PlanCheck('appointments-list', lambda today: Appointment.objects.select_related(
+        'patient', 'doctor', 'created_by')[:PAGE]),
+    PlanCheck('appointments-by-date', lambda today: Appointment.objects.filter(date=today).select_related(
+        'patient', 'doctor', 'created_by')),
+    PlanCheck('appointments-by-date-status', lambda today: Appointment.objects.filter(
+        date=today, status='completed').order_by()),
+    PlanCheck('appointments-by-status', lambda today: Appointment.objects.filter(status='no_show').order_by()),
+    PlanCheck('appointments-this-week', lambda today: Appointment.objects.filter(
+        date__range=[today, today + WEEK])),
+    PlanCheck('appointments-upcoming', lambda today: Appointment.objects.filter(
+        date__gte=today, status='scheduled')),
+    PlanCheck('appointments-past', lambda today: Appointment.objects.filter(date__lt=today)[:PAGE]),
+    PlanCheck('appointments-doctor-schedule', lambda today: Appointment.objects.filter(
+        doctor_id=1, date__gte=today, date__lte=today + WEEK).order_by('date', 'time')),
+    PlanCheck('appointments-keyset', lambda today: keyset_page(
+        Appointment.objects.all(), today - MONTH, time(9, 0), 1)),
+    PlanCheck('appointments-patient-history', lambda today: Appointment.objects.filter(
+        patient_id=1).order_by('-date', '-time')),
+
+    # Billing
+    PlanCheck('bills-list', lambda today: Bill.objects.select_related('patient', 'created_by')[:PAGE]),
+    PlanCheck('bills-by-status', lambda today: Bill.objects.filter(status='paid')),
+    PlanCheck('bills-pending', lambda today: Bill.objects.filter(status__in=['pending', 'partial'])),
+    PlanCheck('bills-overdue', lambda today: Bill.objects.filter(
+        status__in=['pending', 'partial'], date__lt=today - MONTH)),
+    PlanCheck('bills-patient', lambda today: Bill.objects.filter(patient_id=1).order_by('-date')),
+    PlanCheck('payments-list', lambda today: Payment.objects.select_related('processed_by')[:PAGE]),
+    PlanCheck('payments-today', lambda today: Payment.objects.filter(
+        date__gte=day_range(today)[0], date__lt=day_range(today)[1])),
+    PlanCheck('payments-since-month-start', lambda today: Payment.objects.filter(
+        date__gte=start_of_day(today.replace(day=1))).order_by()),
+    PlanCheck('payments-keyset', lambda today: keyset_page(Payment.objects.all(), start_of_day(today - MONTH), 1)),
+    PlanCheck('payments-bill', lambda today: Payment.objects.filter(bill_id=1)),
+
+    # Medical records
+    PlanCheck('medical-records-list', lambda today: MedicalRecord.objects.select_related(
+        'patient', 'doctor')[:PAGE]),
+    PlanCheck('medical-records-doctor', lambda today: MedicalRecord.objects.filter(doctor_id=1)[:PAGE]),
+    PlanCheck('medical-records-patient', lambda today: MedicalRecord.objects.filter(
+        patient_id=1).order_by('-date')),
+    PlanCheck('medical-records-recent', lambda today: MedicalRecord.objects.filter(
+        date__gte=today - MONTH).order_by()),
+    PlanCheck('medical-records-keyset', lambda today: keyset_page(MedicalRecord.objects.all(), today - MONTH, 1)),
+    PlanCheck('medical-records-follow-ups', lambda today: MedicalRecord.objects.filter(
+        follow_up__isnull=False, follow_up__gte=today).order_by('follow_up')),
+    PlanCheck('prescriptions-active', lambda today: Prescription.objects.filter(status='active')),
+    PlanCheck('prescriptions-doctor', lambda today: Prescription.objects.filter(doctor_id=1)[:PAGE]),
+    PlanCheck('lab-tests-pending', lambda today: LabTest.objects.filter(status='pending')),
+    PlanCheck('lab-tests-urgent', lambda today: LabTest.objects.filter(priority__in=['urgent', 'stat'])),
+    PlanCheck('lab-tests-status-priority', lambda today: LabTest.objects.filter(
+        status='pending', priority='stat').order_by()),
+    PlanCheck('lab-tests-keyset', lambda today: keyset_page(LabTest.objects.all(), today - MONTH, 1)),
+    PlanCheck('lab-tests-ordered-by', lambda today: LabTest.objects.filter(ordered_by_id=1)[:PAGE]),
+
+    # Inventory
+    PlanCheck('inventory-items-list', lambda today: InventoryItem.objects.all()[:PAGE]),
+    PlanCheck('inventory-items-expiring', lambda today: InventoryItem.objects.filter(
+        expiry_date__lte=today + MONTH)),
+    PlanCheck('inventory-items-low-stock', lambda today: InventoryItem.objects.filter(
+        quantity__lte=F('min_stock'))),
+    PlanCheck('inventory-items-category', lambda today: InventoryItem.objects.filter(category='medication')),
+    PlanCheck('inventory-transactions-list', lambda today: InventoryTransaction.objects.select_related(
+        'item', 'performed_by')[:PAGE]),
+    PlanCheck('inventory-transactions-recent', lambda today: InventoryTransaction.objects.filter(
+        date__gte=start_of_day(today - WEEK))),
+    PlanCheck('inventory-transactions-type', lambda today: InventoryTransaction.objects.filter(
+        transaction_type='in')[:PAGE]),
+    PlanCheck('inventory-transactions-keyset', lambda today: keyset_page(
+        InventoryTransaction.objects.all(), start_of_day(today - MONTH), 1)),
+    PlanCheck('inventory-transactions-item', lambda today: InventoryTransaction.objects.filter(item_id=1)[:PAGE]),
+
+    # Wards
+    PlanCheck('beds-by-status', lambda today: Bed.objects.filter(status='available').select_related('ward'),
+              allow_scan=['wards']),
+    PlanCheck('beds-ward-status', lambda today: Bed.objects.filter(ward_id=1, status='occupied').order_by()),
+
+    # Patients and staff
+    PlanCheck('patients-list', lambda today: Patient.objects.select_related('assigned_doctor', 'ward')[:PAGE]),
+    PlanCheck('patients-by-status', lambda today: Patient.objects.filter(status='admitted').select_related(
+        'assigned_doctor', 'ward')),
+    PlanCheck('patients-status-doctor', lambda today: Patient.objects.filter(
+        status='admitted', assigned_doctor_id=1)),
+    PlanCheck('patients-doctor', lambda today: Patient.objects.filter(assigned_doctor_id=1)[:PAGE]),
+    PlanCheck('patients-recent-registrations', lambda today: Patient.objects.filter(
+        registration_date__gte=today - MONTH).order_by()),
+    PlanCheck('patients-age-group', lambda today: Patient.objects.filter(age__gte=18, age__lt=35).order_by()),
+    PlanCheck('users-active-doctors', lambda today: User.objects.filter(role='doctor', status='active')),
+    PlanCheck('visitors-current', lambda today: Visitor.objects.filter(
+        status='visiting').order_by('-checkInTime')),
+]
@@ -0,0 +1,248 @@
+"""
+Analytics replica: a read-only copy of the primary database for heavy
+aggregation endpoints.
+
+Actions decorated with ``use_replica`` read through
+``core.db_routers.AnalyticsReplicaRouter`` from the ``ANALYTICS_REPLICA``
+alias, unless the replica is missing or older than ``MAX_LAG_SECONDS``, or
+the requesting user has written something since the replica was taken, so
+users always see their own changes. Writes always go to the primary.
+
+By default the replica is a SQLite file refreshed with the online backup
+API (``manage.py refresh_replica``). Each refresh records when the snapshot
+was taken in a JSON file next to it; the difference to now is the lag
+reported to clients. A replica maintained some other way can be configured
+with ``PATH = None``; it is then used without a lag check.
+
+Read-after-write routing needs every worker to see every user's last write,
+so the replica is only used when the default cache is shared between
+processes, or when ``ALLOW_LOCAL_CACHE`` says the server is one process.
+"""
+
+import functools
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+
+REPLICA_DEFAULTS = {
+    'ENABLED': False,
+    'ALIAS': 'analytics',
+    'PATH': None,
+    'MAX_LAG_SECONDS': 900,
+    'REFRESH_INTERVAL_SECONDS': 300,
+    'ALLOW_LOCAL_CACHE': False,
+}
+
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+def replica_settings():
+    return {**REPLICA_DEFAULTS, **getattr(settings, 'ANALYTICS_REPLICA', {})}
+
+
+def writes_are_shared():
+    """Whether ``record_write`` markers are seen by every worker process."""
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_BACKENDS
+
+
+def _meta_path(path):
+    return Path(f'{path}.json')
+
+
+def read_snapshot():
+    """When the current replica was taken, as a Unix timestamp, or ``None``."""
+    path = replica_settings()['PATH']
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return json.loads(_meta_path(path).read_text())['taken_at']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def refresh_replica(using='default'):
+    """Copy the primary SQLite database to the replica path.
+
+    The copy is written next to the replica and moved into place, so readers
+    never see a half-written file. Returns the snapshot timestamp.
+    """
+    config = replica_settings()
+    if not config['PATH']:
+        raise ValueError('ANALYTICS_REPLICA has no PATH; the replica is maintained externally')
+    source = connections[using]
+    if source.vendor != 'sqlite':
+        raise ValueError('Only a SQLite primary can be copied to a replica file')
+
+    target = Path(config['PATH'])
+    partial = target.with_name(target.name + '.partial')
+    source.ensure_connection()
+    taken_at = time.time()
+    copy = sqlite3.connect(partial)
+    try:
+        source.connection.backup(copy)
+        # The replica is opened read-only; it must not expect a WAL file.
+        copy.execute('PRAGMA journal_mode = delete')
+    finally:
+        copy.close()
+    os.replace(partial, target)
+
+    meta = _meta_path(target)
+    meta_partial = meta.with_name(meta.name + '.partial')
+    meta_partial.write_text(json.dumps({'taken_at': taken_at}))
+    os.replace(meta_partial, meta)
+    return taken_at
+
+
+def replica_status():
+    config = replica_settings()
+    taken_at = read_snapshot()
+    lag = time.time() - taken_at if taken_at is not None else None
+    return {
+        'enabled': config['ENABLED'],
+        'alias': config['ALIAS'],
+        'snapshot_at': (
+            datetime.fromtimestamp(taken_at, tz=timezone.get_current_timezone()).isoformat()
+            if taken_at is not None else None
+        ),
+        'lag_seconds': round(lag, 1) if lag is not None else None,
+        'max_lag_seconds': config['MAX_LAG_SECONDS'],
+        'writes_shared': writes_are_shared(),
+        'available': _usable(config, taken_at),
+    }
+
+
+def _usable(config, taken_at):
+    if not config['ENABLED'] or config['ALIAS'] not in settings.DATABASES:
+        return False
+    if not (config['ALLOW_LOCAL_CACHE'] or writes_are_shared()):
+        return False
+    if not config['PATH']:
+        return True
+    return taken_at is not None and time.time() - taken_at <= config['MAX_LAG_SECONDS']
+
+
+def _last_write_key(user):
+    return f'replica:last-write:{user.pk}'
+
+
+def record_write(user):
+    """Remember that ``user`` changed data, for read-after-write routing."""
+    config = replica_settings()
+    if config['ENABLED'] and user is not None and user.is_authenticated:
+        cache.set(_last_write_key(user), time.time(), config['MAX_LAG_SECONDS'])
+
+
+class ReplicaScope:
+    def __init__(self, alias=None, taken_at=None):
+        self.alias = alias
+        self.taken_at = taken_at
+        self.wrote = False
+
+    @property
+    def source(self):
+        """Where the block's reads went, in ``read_source`` form."""
+        if self.alias is None or self.wrote:
+            return None, None
+        return self.alias, self.taken_at
+
+    @property
+    def lag(self):
+        if self.alias is None or self.taken_at is None:
+            return 0.0
+        return time.time() - self.taken_at
+
+
+_scope = ContextVar('replica_scope', default=None)
+
+
+def current_scope():
+    return _scope.get()
+
+
+def read_source(user=None):
+    """Return ``(alias, taken_at)`` when reads may use the replica, else ``(None, None)``.
+
+    Only looks at settings, the snapshot file and the user's last write; use
+    ``choose_replica`` to actually read from the result.
+    """
+    config = replica_settings()
+    taken_at = read_snapshot() if config['PATH'] else None
+    if not _usable(config, taken_at):
+        return None, None
+    if user is not None and user.is_authenticated and taken_at is not None:
+        last_write = cache.get(_last_write_key(user))
+        if last_write is not None and last_write >= taken_at:
+            return None, None
+    return config['ALIAS'], taken_at
+
+
+def choose_replica(user=None):
+    """``read_source``, with the replica connection ready for the snapshot."""
+    alias, taken_at = read_source(user)
+    if alias is None:
+        return None, None
+
+    connection = connections[alias]
+    # Persistent connections keep the file they opened; reopen after a refresh.
+    if getattr(connection, 'replica_taken_at', taken_at) != taken_at:
+        connection.close()
+    connection.replica_taken_at = taken_at
+    return alias, taken_at
+
+
+@contextmanager
+def replica_reads(user=None):
+    """Route reads in the block to the replica when it is usable."""
+    scope = ReplicaScope(*choose_replica(user))
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+
+
+def use_replica(view_method):
+    """Serve a read-only DRF action from the analytics replica.
+
+    The response carries ``X-Replica-Lag`` (seconds; ``0`` when the primary
+    served it) so dashboards can show how fresh the numbers are.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        with replica_reads(request.user) as scope:
+            response = view_method(self, request, *args, **kwargs)
+        # Read by cached_action, which must not store a replica's answer
+        # under a key meant for the primary.
+        response.replica_source = scope.source
+        if replica_settings()['ENABLED']:
+            response['X-Replica-Lag'] = f'{scope.lag:.0f}'
+        return response
+    return wrapper
+
+
+class ReplicaConsistencyMiddleware:
+    """Record successful write requests per user for read-after-write routing."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            # DRF stores the token-authenticated user on the Django request.
+            record_write(getattr(request, 'user', None))
+        return response
@@ -0,0 +1,213 @@
+"""
+Full-text search for the ``search`` query parameter.
+
+``?search=`` on patients, medical records and inventory used to OR together
+``__icontains`` filters, i.e. ``LIKE '%x%'`` over every row, on every
+keystroke of the search bar. Each of those tables now has an SQLite FTS5
+index (``<table>_fts``, created by a migration in the owning app) whose rowid
+is the row's primary key:
+
+* every word of the search term is matched as a word prefix (``jo sm``
+  finds "John Smith"), case- and accent-insensitively;
+* results come back best match first (FTS5's bm25 ``rank``), then in the
+  view's usual order;
+* ``post_save``/``post_delete`` keep the index in step with the table, and
+  ``patients_imported`` covers the bulk importer. Anything else that writes
+  around signals (``bulk_create``, raw SQL, restoring a backup) is fixed
+  with ``python manage.py rebuild_search_index``.
+
+Terms with no searchable words, databases other than SQLite and databases
+missing the index fall back to the old ``__icontains`` filters.
+"""
+
+import logging
+import re
+
+from django.conf import settings
+from django.db import DatabaseError, connections, router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+
+from inventory.models import InventoryItem
+from medical_records.models import MedicalRecord
+from patients.models import Patient
+from patients.signals import patients_imported
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_DEFAULTS = {
+    'ENABLED': True,
+    # Search terms are cut to this many words.
+    'MAX_TERMS': 8,
+}
+
+# Runs of letters and digits, the same tokens FTS5's unicode61 tokenizer keeps.
+TOKEN_RE = re.compile(r'[^\W_]+')
+
+
+def search_settings():
+    return {**SEARCH_INDEX_DEFAULTS, **getattr(settings, 'SEARCH_INDEX', {})}
+
+
+class SearchIndex:
+    """An FTS5 table mirroring ``fields`` of ``model``, keyed by primary key."""
+
+    def __init__(self, name, model, fields):
+        self.name = name
+        self.model = model
+        self.fields = tuple(fields)
+        self.table = f'{model._meta.db_table}_fts'
+        self._available = set()
+
+    def __repr__(self):
+        return f'<SearchIndex {self.name}>'
+
+    def available(self, using):
+        """Whether ``using`` has this index; positive answers are remembered."""
+        if not search_settings()['ENABLED']:
+            return False
+        if using in self._available:
+            return True
+        connection = connections[using]
+        if connection.vendor != 'sqlite':
+            return False
+        if self.table not in connection.introspection.table_names():
+            return False
+        self._available.add(using)
+        return True
+
+    # Queries
+
+    def match_expression(self, term):
+        """FTS5 query matching every word of ``term`` as a prefix, or None.
+
+        A word with punctuation inside (``555-01``, ``j.smith@``) becomes a
+        phrase, so its parts must appear next to each other, as they did.
+        """
+        phrases = []
+        for word in term.split()[:search_settings()['MAX_TERMS']]:
+            tokens = TOKEN_RE.findall(word)
+            if tokens:
+                phrases.append(f'"{" ".join(tokens)}"*')
+        return ' '.join(phrases) or None
+
+    def fallback(self, term):
+        condition = Q()
+        for field in self.fields:
+            condition |= Q(**{f'{field}__icontains': term})
+        return condition
+
+    def filter(self, queryset, term, rank=True):
+        """Rows of ``queryset`` matching ``term``, best match first if ``rank``."""
+        match = self.match_expression(term)
+        if match is None or not self.available(queryset.db):
+            return queryset.filter(self.fallback(term))
+
+        # The MATCH gives the matching rowids, i.e. primary keys, so rows are
+        # fetched by pk. Ranks are looked up in the same matches, which
+        # OFFSET 0 keeps SQLite from flattening into the outer query: they
+        # are computed once and indexed, not re-matched for every row.
+        table = self.table
+        meta = queryset.model._meta
+        quote = connections[queryset.db].ops.quote_name
+        ordering = list(queryset.query.order_by or meta.ordering)
+        queryset = queryset.filter(pk__in=RawSQL(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [match]))
+        if rank:
+            pk = f'{quote(meta.db_table)}.{quote(meta.pk.column)}'
+            ranks = f'SELECT rowid AS id, rank FROM {table} WHERE {table} MATCH %s LIMIT -1 OFFSET 0'
+            queryset = queryset.order_by(
+                RawSQL(f'(SELECT ranked.rank FROM ({ranks}) ranked WHERE ranked.id = {pk})', [match]),
+                *ordering,
+            )
+        return queryset
+
+    # Keeping the index in step
+
+    def rows(self, instances):
+        return [
+            (instance.pk, *[getattr(instance, field) for field in self.fields])
+            for instance in instances
+        ]
+
+    def index(self, instances, using):
+        """Add or replace the index entries of ``instances``."""
+        rows = self.rows(instances)
+        if not rows or not self.available(using):
+            return
+        columns = ', '.join(self.fields)
+        placeholders = ', '.join(['%s'] * (len(self.fields) + 1))
+        with connections[using].cursor() as cursor:
+            self._delete(cursor, [row[0] for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, {columns}) VALUES ({placeholders})', rows
+            )
+
+    def remove(self, pks, using):
+        if pks and self.available(using):
+            with connections[using].cursor() as cursor:
+                self._delete(cursor, pks)
+
+    def _delete(self, cursor, pks):
+        cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(pk,) for pk in pks])
+
+    def rebuild(self, using):
+        """Re-create every entry from the table; returns the number indexed."""
+        if not self.available(using):
+            return None
+        meta = self.model._meta
+        columns = ', '.join(self.fields)
+        source = ', '.join(meta.get_field(field).column for field in self.fields)
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, {columns}) '
+                f'SELECT {meta.pk.column}, {source} FROM {meta.db_table}'
+            )
+            count = cursor.rowcount
+            cursor.execute(f"INSERT INTO {self.table} ({self.table}) VALUES ('optimize')")
+        return count
+
+
+SEARCH_INDEXES = {
+    'patients': SearchIndex('patients', Patient, ['name', 'phone', 'email']),
+    'medical_records': SearchIndex('medical_records', MedicalRecord, ['diagnosis', 'symptoms', 'treatment']),
+    'inventory': SearchIndex('inventory', InventoryItem, ['name', 'category', 'supplier', 'location']),
+}
+
+
+def search_index_for(model):
+    for index in SEARCH_INDEXES.values():
+        if index.model is model:
+            return index
+    return None
+
+
+def _saved(sender, instance, using, update_fields=None, raw=False, **kwargs):
+    index = search_index_for(sender)
+    if raw or (update_fields is not None and not set(update_fields) & set(index.fields)):
+        return
+    try:
+        index.index([instance], using)
+    except DatabaseError:
+        # The row is saved; a stale index entry is fixed by a rebuild.
+        logger.exception('Could not update the %s search index for pk %s', index.name, instance.pk)
+
+
+def _deleted(sender, instance, using, **kwargs):
+    index = search_index_for(sender)
+    try:
+        index.remove([instance.pk], using)
+    except DatabaseError:
+        logger.exception('Could not remove pk %s from the %s search index', instance.pk, index.name)
+
+
+def _patients_imported(sender, patients, **kwargs):
+    SEARCH_INDEXES['patients'].index(patients, router.db_for_write(Patient))
+
+
+def connect_signals():
+    for name, index in SEARCH_INDEXES.items():
+        post_save.connect(_saved, sender=index.model, dispatch_uid=f'core.search.saved.{name}')
+        post_delete.connect(_deleted, sender=index.model, dispatch_uid=f'core.search.deleted.{name}')
+    patients_imported.connect(_patients_imported, dispatch_uid='core.search.patients_imported')
@@ -0,0 +1,252 @@
+"""
+Production tuning for the SQLite database.
+
+SQLite allows one writer at a time. With the default rollback journal,
+readers also block that writer, and writers that find the database busy
+poll with sleeps until ``timeout`` runs out. Under concurrent receptionist
+traffic that shows up as "database is locked" errors and throughput that
+drops as workers are added.
+
+The production profile (``SQLITE_TUNING['ENABLED']``):
+
+* sets WAL journaling and the other ``PRAGMAS`` on every new connection, so
+  readers never block the writer;
+* queues write requests (``SerializedWriteMiddleware``) so at most one
+  request per database writes at a time. Waiting requests block on a lock
+  in arrival order instead of polling SQLite's busy handler. A lock file
+  extends the queue across worker processes;
+* turns a lock error that still slips through into ``503`` with
+  ``Retry-After``, and offers ``retry_on_locked`` for code that writes
+  outside a request.
+"""
+
+import functools
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import OperationalError, connections, transaction
+from django.http import JsonResponse
+
+try:
+    import fcntl
+except ImportError:  # Windows: the queue only spans one process.
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SQLITE_DEFAULTS = {
+    'ENABLED': False,
+    # Read-only replicas (core.replica) are left alone.
+    'ALIASES': ['default'],
+    'PRAGMAS': {
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'cache_size': -64000,
+        'mmap_size': 268435456,
+        'temp_store': 'memory',
+        'busy_timeout': 5000,
+    },
+    'WRITE_QUEUE': True,
+    'WRITE_QUEUE_TIMEOUT': 30,
+    'BUSY_RETRIES': 5,
+    'BUSY_BACKOFF_MS': 50,
+}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+def sqlite_settings():
+    config = {**SQLITE_DEFAULTS, **getattr(settings, 'SQLITE_TUNING', {})}
+    config['PRAGMAS'] = {**SQLITE_DEFAULTS['PRAGMAS'], **config['PRAGMAS']}
+    return config
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """``connection_created`` receiver that applies the configured pragmas."""
+    config = sqlite_settings()
+    if not config['ENABLED'] or connection.vendor != 'sqlite' or connection.alias not in config['ALIASES']:
+        return
+    with connection.cursor() as cursor:
+        for name, value in config['PRAGMAS'].items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def lock_for_write(model, using='default'):
+    """Take SQLite's write lock now, in the current transaction.
+
+    SQLite ignores ``select_for_update``, and a deferred transaction only
+    takes the lock at its first write, after its reads: two transactions can
+    then check the same rows before either writes, and the second to write
+    fails with "database is locked". A write that changes nothing takes the
+    lock up front, so concurrent callers wait their turn in the busy timeout
+    and read what the one before them committed. Other databases are left to
+    ``select_for_update``.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f'UPDATE {table} SET id = id WHERE 0')
+
+
+def is_locked_error(exc):
+    message = str(exc).lower()
+    return isinstance(exc, OperationalError) and ('locked' in message or 'busy' in message)
+
+
+def retry_on_locked(func=None, *, retries=None, backoff_ms=None, using='default'):
+    """Retry ``func`` when SQLite reports the database as locked.
+
+    Each attempt runs in its own transaction so a failed attempt leaves
+    nothing behind. Inside an outer ``atomic`` block a retry could not undo
+    the work already done, so the error propagates instead.
+    """
+    if func is None:
+        return functools.partial(retry_on_locked, retries=retries, backoff_ms=backoff_ms, using=using)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        config = sqlite_settings()
+        attempts = 1 + (config['BUSY_RETRIES'] if retries is None else retries)
+        delay = (config['BUSY_BACKOFF_MS'] if backoff_ms is None else backoff_ms) / 1000
+        for attempt in range(attempts):
+            try:
+                with transaction.atomic(using=using):
+                    return func(*args, **kwargs)
+            except OperationalError as exc:
+                last_attempt = attempt == attempts - 1
+                if not is_locked_error(exc) or last_attempt or connections[using].in_atomic_block:
+                    raise
+                logger.info('Database locked in %s, retrying (%d/%d)', func.__qualname__, attempt + 1, attempts - 1)
+                time.sleep(delay * 2 ** attempt)
+
+    return wrapper
+
+
+class WriteQueueTimeout(Exception):
+    pass
+
+
+class FifoLock:
+    """A lock that is handed to waiting threads in the order they arrived."""
+
+    def __init__(self):
+        self._mutex = threading.Lock()
+        self._waiters = deque()
+        self._locked = False
+
+    def acquire(self, timeout=None):
+        with self._mutex:
+            if not self._locked and not self._waiters:
+                self._locked = True
+                return True
+            turn = threading.Event()
+            self._waiters.append(turn)
+        if turn.wait(timeout):
+            return True
+        with self._mutex:
+            # The lock may have been handed over just as the wait timed out.
+            if turn.is_set():
+                return True
+            self._waiters.remove(turn)
+            return False
+
+    def release(self):
+        with self._mutex:
+            if self._waiters:
+                # Ownership passes straight to the next waiter.
+                self._waiters.popleft().set()
+            else:
+                self._locked = False
+
+
+class WriteQueue:
+    """Serialize writers to one database, within and across processes."""
+
+    def __init__(self, lock_path=None):
+        self.lock_path = lock_path
+        self._lock = FifoLock()
+        self._owner = threading.local()
+
+    @contextmanager
+    def turn(self, timeout=None):
+        # Re-entrant for the owning thread, e.g. retry_on_locked in a view.
+        if getattr(self._owner, 'depth', 0):
+            self._owner.depth += 1
+            try:
+                yield
+            finally:
+                self._owner.depth -= 1
+            return
+
+        if not self._lock.acquire(timeout):
+            raise WriteQueueTimeout(f'No write slot within {timeout}s')
+        handle = None
+        try:
+            if fcntl is not None and self.lock_path:
+                handle = open(self.lock_path, 'a')
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            self._owner.depth = 1
+            yield
+        finally:
+            self._owner.depth = 0
+            if handle is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+                handle.close()
+            self._lock.release()
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def write_queue(using='default'):
+    with _queues_lock:
+        if using not in _queues:
+            name = str(connections[using].settings_dict['NAME'])
+            in_memory = name == ':memory:' or name.startswith('file:memorydb')
+            _queues[using] = WriteQueue(None if in_memory else f'{name}.write-lock')
+        return _queues[using]
+
+
+class SerializedWriteMiddleware:
+    """Give each write request exclusive use of the SQLite writer.
+
+    Safe methods pass straight through: in WAL mode they never wait for the
+    writer.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = sqlite_settings()
+        self.enabled = (
+            self.config['ENABLED']
+            and self.config['WRITE_QUEUE']
+            and connections['default'].vendor == 'sqlite'
+        )
+
+    def __call__(self, request):
+        if not self.enabled or request.method in SAFE_METHODS:
+            return self.get_response(request)
+        try:
+            with write_queue().turn(self.config['WRITE_QUEUE_TIMEOUT']):
+                return self.get_response(request)
+        except WriteQueueTimeout:
+            logger.warning('Write queue timeout for %s %s', request.method, request.get_full_path())
+            return self.busy_response()
+
+    def process_exception(self, request, exception):
+        if self.config['ENABLED'] and is_locked_error(exception):
+            logger.warning('Database locked during %s %s', request.method, request.get_full_path())
+            return self.busy_response()
+        return None
+
+    def busy_response(self):
+        response = JsonResponse({'error': 'The database is busy, please retry'}, status=503)
+        response['Retry-After'] = '1'
+        return response
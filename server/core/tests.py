@@ -0,0 +1,771 @@
+import csv
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.apps import apps
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connections
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.db.models import F
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework.utils.encoders import JSONEncoder
+
+from accounts.models import User
+from appointments import slots
+from appointments.models import Appointment, SlotOccupancy
+from appointments.serializers import AppointmentSerializer
+from billing.models import Bill, Payment
+from inventory.models import InventoryItem, InventoryTransaction
+from medical_records.models import MedicalRecord
+from patients.models import Patient
+from wards.counters import reconcile
+from wards.models import Bed, Ward
+from .aggregation import bucket_starts, period_start, shift, time_buckets
+from .cache import REGISTRY
+from .dashboard import SECTIONS, DashboardContext
+from .nplusone import NPlusOneError, detect_nplusone, install_serializer_hooks
+from .projections import PROJECTIONS
+from .query_plans import PlanCheck, explain_check
+from .replica import (
+    read_source, record_write, refresh_replica, replica_reads, replica_status, writes_are_shared,
+)
+from .sqlite import FifoLock, SerializedWriteMiddleware, WriteQueue, WriteQueueTimeout
+
+
+class APITestCase(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='x', role='admin')
+        self.doctor = User.objects.create_user('doctor', password='x', role='doctor')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.patient = Patient.objects.create(
+            name='Test Patient', age=40, gender='female', phone='555-0100',
+            email='patient@example.com', address='1 Test Street'
+        )
+        self.date = timezone.localdate() + timedelta(days=7)
+
+    def book(self, time):
+        return Appointment.objects.create(
+            patient=self.patient, doctor=self.doctor, date=self.date, time=time, type='consultation'
+        )
+
+
+class ReplicaTestCase(APITestCase):
+    """Runs against a read-only replica taken before any test data existed."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.replica_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.replica_dir.name, 'analytics.sqlite3')
+        database = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': f'file:{path}?mode=ro'}
+        # The test process is the only worker, so its LocMem cache is shared.
+        cls.replica_config = {
+            'ENABLED': True, 'ALIAS': 'analytics', 'PATH': path, 'MAX_LAG_SECONDS': 900, 'ALLOW_LOCAL_CACHE': True,
+        }
+        cls.replica_settings = override_settings(ANALYTICS_REPLICA=cls.replica_config)
+        cls.replica_settings.enable()
+        cls.taken_at = refresh_replica()
+        cls.connection_settings = connections.settings
+        connections.settings = connections.configure_settings({**connections.settings, 'analytics': database})
+        settings.DATABASES['analytics'] = connections.settings['analytics']
+        # Set here rather than on the class: the test runner would look for
+        # the alias before it exists.
+        cls.databases = {'default', 'analytics'}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['analytics'].close()
+        del connections['analytics']
+        connections.settings = cls.connection_settings
+        settings.DATABASES.pop('analytics')
+        cls.replica_settings.disable()
+        cls.replica_dir.cleanup()
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+
+class AnalyticsCacheReplicaTests(ReplicaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.writer = User.objects.create_user('writer', password='x', role='receptionist')
+        self.reader = User.objects.create_user('reader', password='x', role='receptionist')
+
+    def analytics(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.get('/api/patients/analytics/')
+        self.assertEqual(response.status_code, 200)
+        return response['X-Cache'], response.json()['total_patients']
+
+    def test_writers_never_get_an_older_snapshot_from_the_cache(self):
+        # The replica predates every patient; the primary has one.
+        self.assertEqual(self.analytics(self.reader), ('MISS', 0))
+        self.assertEqual(self.analytics(self.reader), ('HIT', 0))
+
+        self.client.force_authenticate(self.writer)
+        response = self.client.post('/api/patients/', {
+            'name': 'New Patient', 'age': 30, 'gender': 'Male', 'phone': '555-0101',
+            'email': 'new@example.com', 'address': '2 Test Street',
+        })
+        self.assertEqual(response.status_code, 201)
+
+        # Another user's miss reads the replica again, under the new generation...
+        self.assertEqual(self.analytics(self.reader), ('MISS', 0))
+        # ...which the writer, reading the primary, must not be served.
+        self.assertEqual(self.analytics(self.writer), ('MISS', 2))
+        self.assertEqual(self.analytics(self.writer), ('HIT', 2))
+        self.assertEqual(self.analytics(self.reader), ('HIT', 0))
+
+
+class ReplicaRoutingTests(ReplicaTestCase):
+    # The replica predates self.patient, so counts tell the databases apart.
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.doctor)
+
+    def analytics(self):
+        response = self.client.get('/api/patients/analytics/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['total_patients'], response['X-Replica-Lag']
+
+    def test_replica_reads_go_to_the_replica(self):
+        with replica_reads(self.doctor) as scope:
+            self.assertEqual(scope.alias, 'analytics')
+            self.assertEqual(Patient.objects.all().db, 'analytics')
+            self.assertEqual(Patient.objects.count(), 0)
+            Patient.objects.create(name='Written', age=30, gender='male', phone='555-0102')
+            # After a write the block reads its own rows from the primary.
+            self.assertEqual(Patient.objects.count(), 2)
+        self.assertEqual(Patient.objects.all().db, 'default')
+
+    def test_lag_header(self):
+        total, lag = self.analytics()
+        self.assertEqual(total, 0)
+        self.assertGreaterEqual(int(lag), 0)
+        self.assertLessEqual(int(lag), time.time() - self.taken_at + 1)
+
+    def test_own_recent_write_reads_the_primary(self):
+        record_write(self.doctor)
+        self.assertEqual(read_source(self.doctor), (None, None))
+        self.assertEqual(self.analytics(), (1, '0'))
+        self.assertEqual(read_source(self.admin), ('analytics', self.taken_at))
+
+    def test_write_request_is_recorded(self):
+        response = self.client.post('/api/patients/', {
+            'name': 'New Patient', 'age': 30, 'gender': 'Male', 'phone': '555-0101',
+            'email': 'new@example.com', 'address': '2 Test Street',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(read_source(self.doctor), (None, None))
+
+    def test_lagging_replica_falls_back_to_the_primary(self):
+        with override_settings(ANALYTICS_REPLICA={**self.replica_config, 'MAX_LAG_SECONDS': 0}):
+            self.assertEqual(read_source(self.doctor), (None, None))
+            self.assertFalse(replica_status()['available'])
+            self.assertEqual(self.analytics(), (1, '0'))
+
+    def test_per_process_cache_keeps_reads_on_the_primary(self):
+        # Another worker would not see this process's record_write.
+        with override_settings(ANALYTICS_REPLICA={**self.replica_config, 'ALLOW_LOCAL_CACHE': False}):
+            self.assertFalse(writes_are_shared())
+            self.assertEqual(read_source(self.doctor), (None, None))
+            self.assertEqual(self.analytics(), (1, '0'))
+
+
+class AnalyticsCacheInvalidationTests(TestCase):
+    """A save to any model an analytics action reads replaces its cached response."""
+
+    URLS = {
+        'UserViewSet.analytics': '/api/users/analytics/',
+        'PatientViewSet.analytics': '/api/patients/analytics/',
+        'WardViewSet.occupancy_stats': '/api/wards/occupancy_stats/',
+        'WardViewSet.analytics': '/api/wards/analytics/',
+        'BedViewSet.analytics': '/api/beds/analytics/',
+        'AppointmentViewSet.analytics': '/api/appointments/analytics/',
+        'MedicalRecordViewSet.analytics': '/api/medical-records/analytics/',
+        'PrescriptionViewSet.analytics': '/api/prescriptions/analytics/',
+        'LabTestViewSet.analytics': '/api/lab-tests/analytics/',
+        'InventoryItemViewSet.analytics': '/api/inventory/analytics/',
+        'InventoryTransactionViewSet.analytics': '/api/inventory-transactions/analytics/',
+        'BillViewSet.revenue_stats': '/api/bills/revenue_stats/',
+        'BillViewSet.analytics': '/api/bills/analytics/',
+        'PaymentViewSet.analytics': '/api/payments/analytics/',
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_scale_data', stdout=StringIO(), days=10, doctors=2, nurses=1, receptionists=1, wards=1,
+            beds_per_ward=2, patients=5, appointments=5, medical_records=5, prescriptions=5, lab_tests=5,
+            bills=5, payments=5, inventory_items=2, inventory_transactions=5, visitors=0,
+        )
+        # Bed history rows are written by saves, not by the seeder.
+        bed = Bed.objects.first()
+        bed.status = 'maintenance'
+        bed.save()
+        cls.admin = User.objects.create_user('admin', password='x', role='admin')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def x_cache(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return response['X-Cache']
+
+    def test_every_cached_action_is_covered(self):
+        self.assertEqual(set(self.URLS), set(REGISTRY))
+
+    def test_saving_each_dependency_invalidates(self):
+        for endpoint, url in self.URLS.items():
+            self.assertEqual(self.x_cache(url), 'MISS', url)
+            for label in REGISTRY[endpoint]:
+                with self.subTest(endpoint=endpoint, model=label):
+                    self.assertEqual(self.x_cache(url), 'HIT')
+                    apps.get_model(label).objects.order_by('pk').first().save()
+                    self.assertEqual(self.x_cache(url), 'MISS')
+
+    def test_joined_names_follow_a_rename(self):
+        url = self.URLS['PrescriptionViewSet.analytics']
+
+        def names():
+            return {row['doctor__last_name'] for row in self.client.get(url).json()['prescriptions_by_doctor']}
+
+        self.assertNotIn('Renamed', names())
+        doctor = User.objects.filter(prescription__isnull=False).first()
+        doctor.last_name = 'Renamed'
+        doctor.save()
+        self.assertIn('Renamed', names())
+
+
+class ProjectionTests(TestCase):
+    """List projections render exactly what their serializers do."""
+
+    URLS = {
+        'PatientSerializer': '/api/patients/',
+        'MedicalRecordSerializer': '/api/medical-records/',
+        'PaymentSerializer': '/api/payments/',
+        'InventoryItemSerializer': '/api/inventory/',
+        'InventoryTransactionSerializer': '/api/inventory-transactions/',
+        'AppointmentSerializer': '/api/appointments/',
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_scale_data', stdout=StringIO(), days=10, doctors=2, nurses=1, receptionists=1, wards=1,
+            beds_per_ward=2, patients=6, appointments=6, medical_records=6, prescriptions=0, lab_tests=0,
+            bills=20, payments=20, inventory_items=4, inventory_transactions=6, visitors=0,
+        )
+        # Null relations next to set ones, and empty JSON next to filled.
+        def update_first(model, order='pk', **fields):
+            model.objects.filter(pk__in=model.objects.order_by(order).values('pk')[:1]).update(**fields)
+
+        update_first(Patient, assigned_doctor=None, ward=None)
+        update_first(Patient, '-pk', ward=Ward.objects.first(), admission_date=timezone.localdate())
+        update_first(Payment, processed_by=None)
+        update_first(InventoryTransaction, performed_by=None)
+        update_first(Appointment, created_by=None)
+        update_first(MedicalRecord, follow_up=None, medications=[], vital_signs={})
+        cls.admin = User.objects.create_user('admin', password='x', role='admin')
+
+    def test_every_projection_is_covered(self):
+        self.assertEqual(set(self.URLS), {projection.serializer_class.__name__ for projection in PROJECTIONS})
+
+    def test_projection_matches_the_serializer(self):
+        for projection in PROJECTIONS:
+            with self.subTest(projection.serializer_class.__name__):
+                queryset = projection.model._default_manager.order_by('pk')
+                expected = projection.serializer_class(
+                    queryset.select_related(*projection.select_related), many=True
+                ).data
+                actual = projection.serialize(projection.values(queryset))
+                self.assertGreater(len(actual), 1)
+                self.assertEqual(json.dumps(actual, cls=JSONEncoder), json.dumps(expected, cls=JSONEncoder))
+
+    def test_endpoints_render_the_same_bytes(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        for name, url in self.URLS.items():
+            with self.subTest(url):
+                projected = client.get(url, {'page_size': 100})
+                with override_settings(LIST_PROJECTIONS={'ENABLED': False}):
+                    serialized = client.get(url, {'page_size': 100})
+                self.assertEqual(projected.status_code, 200)
+                self.assertEqual(projected.content, serialized.content)
+
+    def test_fixtures_cover_nulls_and_decimals(self):
+        patients = self.client_data('/api/patients/')
+        self.assertIn(None, [row['assigned_doctor'] for row in patients])
+        self.assertNotIn('ward_name', patients[0])
+        self.assertIn('ward_name', patients[-1])
+        payment = self.client_data('/api/payments/')[0]
+        self.assertIsInstance(payment['amount'], str)
+        self.assertIn('.', payment['amount'])
+
+    def client_data(self, url):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        return sorted(client.get(url, {'page_size': 100}).json()['results'], key=lambda row: row['id'])
+
+
+class TimeBucketTests(APITestCase):
+
+    def patient_created(self, moment):
+        patient = Patient.objects.create(name='Bucketed', age=30, gender='male', phone='555-0103')
+        Patient.objects.filter(pk=patient.pk).update(created_at=moment)
+
+    def test_weeks_start_on_monday(self):
+        self.assertEqual(period_start(date(2024, 6, 9), 'week'), date(2024, 6, 3))
+        self.assertEqual(period_start(date(2024, 6, 3), 'week'), date(2024, 6, 3))
+        self.assertEqual(
+            bucket_starts(date(2024, 6, 9), date(2024, 6, 10), 'week'), [date(2024, 6, 3), date(2024, 6, 10)]
+        )
+
+    def test_months_roll_over_the_year(self):
+        self.assertEqual(shift(date(2024, 12, 1), 'month'), date(2025, 1, 1))
+        self.assertEqual(shift(date(2025, 1, 1), 'month', -1), date(2024, 12, 1))
+        self.assertEqual(shift(date(2024, 11, 1), 'month', 14), date(2026, 1, 1))
+        self.assertEqual(
+            bucket_starts(date(2024, 11, 15), date(2025, 2, 3), 'month'),
+            [date(2024, 11, 1), date(2024, 12, 1), date(2025, 1, 1), date(2025, 2, 1)],
+        )
+
+    def test_empty_buckets_are_zero_filled(self):
+        for day, time in ((date(2024, 6, 3), '09:00'), (date(2024, 6, 3), '09:30'), (date(2024, 6, 5), '09:00')):
+            self.date = day
+            self.book(time)
+        buckets = time_buckets(Appointment.objects.all(), 'date', 'day', date(2024, 6, 2), date(2024, 6, 6))
+        self.assertEqual(
+            [(bucket['start'].day, bucket['count']) for bucket in buckets], [(2, 0), (3, 2), (4, 0), (5, 1), (6, 0)]
+        )
+        weeks = time_buckets(Appointment.objects.all(), 'date', 'week', date(2024, 6, 5), date(2024, 6, 12))
+        self.assertEqual(weeks, [{'start': date(2024, 6, 3), 'count': 3}, {'start': date(2024, 6, 10), 'count': 0}])
+
+    @override_settings(TIME_ZONE='America/New_York')
+    def test_datetimes_are_bucketed_at_local_midnight(self):
+        # 00:30 UTC on June 2nd is still June 1st in New York (UTC-4).
+        for moment in ('2024-06-02T00:30:00+00:00', '2024-06-02T03:59:00+00:00', '2024-06-02T04:00:00+00:00'):
+            self.patient_created(datetime.fromisoformat(moment))
+        patients = Patient.objects.filter(name='Bucketed')
+        buckets = time_buckets(patients, 'created_at', 'day', date(2024, 6, 1), date(2024, 6, 2))
+        self.assertEqual([bucket['count'] for bucket in buckets], [2, 1])
+        # The range starts at local midnight, not UTC midnight.
+        buckets = time_buckets(patients, 'created_at', 'day', date(2024, 6, 2), date(2024, 6, 2))
+        self.assertEqual([bucket['count'] for bucket in buckets], [1])
+
+
+class KeysetPaginationTests(APITestCase):
+
+    def times(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [row['time'][:5] for row in response.json()['results']]
+
+    def test_pages_are_stable_across_an_insert(self):
+        for time in ('09:00', '09:30', '10:00', '10:30', '11:00'):
+            self.book(time)
+        first = self.client.get('/api/appointments/', {'cursor': '', 'page_size': 2})
+        self.assertEqual(self.times(first), ['09:00', '09:30'])
+        self.assertIsNone(first.json()['previous'])
+
+        # A row landing before the cursor shifts page numbers, not cursors.
+        self.book('08:00')
+        second = self.client.get(first.json()['next'])
+        self.assertEqual(self.times(second), ['10:00', '10:30'])
+        third = self.client.get(second.json()['next'])
+        self.assertEqual(self.times(third), ['11:00'])
+        self.assertIsNone(third.json()['next'])
+
+        back = self.client.get(second.json()['previous'])
+        self.assertEqual(self.times(back), ['09:00', '09:30'])
+        self.assertIsNotNone(back.json()['previous'])
+
+    def test_page_numbers_without_cursor_and_bad_cursors(self):
+        self.book('09:00')
+        response = self.client.get('/api/appointments/')
+        self.assertEqual(response.json()['count'], 1)
+        self.assertEqual(self.client.get('/api/appointments/', {'cursor': 'garbage'}).status_code, 404)
+
+
+class ExportTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        for time in ('09:00', '09:30', '10:00'):
+            self.book(time)
+
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_streams_every_row_unpaginated(self):
+        response = self.client.get('/api/appointments/', {'format': 'csv', 'page_size': 1})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="appointment-', response['Content-Disposition'])
+        rows = list(csv.DictReader(self.content(response).splitlines()))
+        self.assertEqual([row['time'][:5] for row in rows], ['09:00', '09:30', '10:00'])
+        self.assertEqual(rows[0]['patient_name'], 'Test Patient')
+
+    def test_ndjson_matches_the_json_list(self):
+        listed = self.client.get('/api/appointments/', {'status': 'scheduled'}).json()['results']
+        response = self.client.get('/api/appointments/', {'status': 'scheduled'}, HTTP_ACCEPT='application/x-ndjson')
+        exported = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual(exported, listed)
+
+    def test_list_actions_export(self):
+        response = self.client.get('/api/appointments/upcoming/', {'format': 'ndjson'})
+        self.assertEqual(len(self.content(response).splitlines()), 3)
+
+
+@override_settings(DASHBOARD={'MAX_WORKERS': 0})
+class DashboardTests(APITestCase):
+
+    def test_sections_of_a_role(self):
+        self.date = timezone.localdate()
+        self.book('09:00')
+        self.client.force_authenticate(self.doctor)
+        response = self.client.get('/api/dashboard/doctor/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(set(data['sections']), set(SECTIONS['doctor']))
+        self.assertEqual(data['errors'], {})
+        self.assertEqual(data['sections']['appointments']['today'], 1)
+        self.assertEqual(self.client.get('/api/dashboard/receptionist/').status_code, 403)
+
+    def test_admin_views_a_staff_dashboard(self):
+        response = self.client.get('/api/dashboard/doctor/', {'user': self.doctor.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/dashboard/doctor/', {'user': self.admin.pk}).status_code, 404)
+        self.assertEqual(self.client.get('/api/dashboard/janitor/').status_code, 404)
+
+    def test_a_failing_section_is_reported_without_detail(self):
+        def broken(context):
+            raise RuntimeError('database password is hunter2')
+
+        with mock.patch.dict(SECTIONS['receptionist'], {'visitors': broken}), \
+                self.assertLogs('core.dashboard', 'ERROR'):
+            data = self.client.get('/api/dashboard/receptionist/').json()
+        self.assertEqual(data['errors'], {'visitors': 'section failed'})
+        self.assertIn('patients', data['sections'])
+
+    def test_shared_values_are_computed_once(self):
+        context = DashboardContext(self.admin, 'admin')
+        compute = mock.Mock(return_value=[1])
+        self.assertEqual(context.shared('rows', compute), [1])
+        self.assertEqual(context.shared('rows', compute), [1])
+        compute.assert_called_once_with()
+
+
+@override_settings(REQUEST_PROFILING={'ENABLED': True, 'SAMPLE_RATE': 1.0, 'SLOW_REQUEST_MS': 60000, 'MAX_QUERIES': 1000})
+class DashboardServerTimingTests(TransactionTestCase):
+    # Committed data, so the pool threads' connections see it.
+
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='x', role='admin')
+        doctor = User.objects.create_user('doctor', password='x', role='doctor')
+        patient = Patient.objects.create(name='Test Patient', age=40, gender='female', phone='555-0100')
+        for time in ('09:00', '09:30'):
+            Appointment.objects.create(
+                patient=patient, doctor=doctor, date=timezone.localdate(), time=time, type='consultation'
+            )
+
+    def queries(self, workers):
+        with override_settings(DASHBOARD={'MAX_WORKERS': workers}):
+            client = APIClient()
+            client.force_authenticate(self.admin)
+            response = client.get('/api/dashboard/admin/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Server-Timing', response)
+        count = re.search(r'desc="(\d+) queries"', response['Server-Timing'])
+        self.assertIsNotNone(count)
+        return int(count.group(1))
+
+    def test_pooled_sections_are_counted(self):
+        serial = self.queries(0)
+        self.assertGreaterEqual(serial, len(SECTIONS['admin']))
+        self.assertEqual(self.queries(4), serial)
+
+
+class NPlusOneDetectionTests(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Installed at startup only when NPLUSONE_DETECTION is enabled.
+        install_serializer_hooks()
+
+    def setUp(self):
+        super().setUp()
+        for time in ('09:00', '09:30', '10:00', '10:30'):
+            self.book(time)
+
+    def serialize(self, queryset):
+        return AppointmentSerializer(queryset, many=True).data
+
+    def test_unprefetched_relation_raises_in_strict_mode(self):
+        with self.assertRaises(NPlusOneError) as raised, self.assertLogs('core.nplusone', 'WARNING'):
+            with detect_nplusone(threshold=3, raise_errors=True):
+                self.serialize(Appointment.objects.all())
+        fields = {report.field for report in raised.exception.reports}
+        self.assertIn('ListSerializer > AppointmentSerializer.patient_name', fields)
+        self.assertIn('ListSerializer > AppointmentSerializer.doctor_name', fields)
+
+    def test_unprefetched_relation_is_logged(self):
+        with self.assertLogs('core.nplusone', 'WARNING') as logs:
+            with detect_nplusone(threshold=3, raise_errors=False) as detector:
+                self.serialize(Appointment.objects.all())
+        self.assertTrue(detector.reports)
+        self.assertIn('patient_name', '\n'.join(logs.output))
+
+    def test_prefetched_relation_is_silent(self):
+        queryset = Appointment.objects.select_related('patient', 'doctor', 'created_by')
+        with self.assertNoLogs('core.nplusone', 'WARNING'):
+            with detect_nplusone(threshold=3, raise_errors=True) as detector:
+                self.assertEqual(len(self.serialize(queryset)), 4)
+        self.assertEqual(detector.reports, [])
+
+
+class QueryPlanTests(TestCase):
+    COMMAND_CHECKS = 'core.management.commands.check_query_plans.PLAN_CHECKS'
+
+    def unindexed(self, **kwargs):
+        return PlanCheck('patients-by-address', lambda today: Patient.objects.filter(
+            address='1 Test Street').order_by(), **kwargs)
+
+    def low_stock(self):
+        return PlanCheck('inventory-items-low-stock', lambda today: InventoryItem.objects.filter(
+            quantity__lte=F('min_stock')))
+
+    def test_full_scan_is_flagged(self):
+        result = explain_check(self.unindexed())
+        self.assertEqual(result.scans, [Patient._meta.db_table])
+        with mock.patch(self.COMMAND_CHECKS, [self.unindexed()]), self.assertRaises(CommandError):
+            call_command('check_query_plans', stdout=StringIO())
+
+    def test_allowed_scan_passes(self):
+        check = self.unindexed(allow_scan=[Patient._meta.db_table])
+        self.assertEqual(explain_check(check).scans, [])
+        with mock.patch(self.COMMAND_CHECKS, [check]):
+            call_command('check_query_plans', stdout=StringIO())
+
+    def test_partial_index_walk_passes(self):
+        result = explain_check(self.low_stock())
+        self.assertIn('inv_item_low_stock_idx', '\n'.join(result.lines))
+        self.assertEqual((result.scans, result.index_walks), ([], []))
+        # The same walk over an ordinary index would be reported.
+        self.assertEqual(explain_check(self.low_stock(), partial=set()).index_walks, ['inv_item_low_stock_idx'])
+        with mock.patch(self.COMMAND_CHECKS, [self.low_stock()]):
+            call_command('check_query_plans', '--strict', stdout=StringIO())
+
+    def test_registered_checks_pass(self):
+        call_command('check_query_plans', stdout=StringIO())
+
+
+@override_settings(SQLITE_TUNING={'ENABLED': True, 'ALIASES': ['default'], 'WRITE_QUEUE_TIMEOUT': 0.05})
+class SQLiteTuningTests(TestCase):
+
+    def journal_mode(self, alias):
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = {**connections['default'].settings_dict, 'NAME': os.path.join(directory, 'db.sqlite3')}
+            connection = SQLiteDatabaseWrapper(settings_dict, alias=alias)
+            try:
+                with connection.cursor() as cursor:
+                    return cursor.execute('PRAGMA journal_mode').fetchone()[0]
+            finally:
+                connection.close()
+
+    def test_pragmas_apply_to_the_primary_only(self):
+        self.assertEqual(self.journal_mode('default'), 'wal')
+        self.assertEqual(self.journal_mode('analytics'), 'delete')
+
+    def test_fifo_lock_hands_over_in_arrival_order(self):
+        lock = FifoLock()
+        self.assertTrue(lock.acquire())
+        order = []
+
+        def wait(number):
+            lock.acquire()
+            order.append(number)
+            lock.release()
+
+        threads = []
+        for number in range(5):
+            threads.append(threading.Thread(target=wait, args=(number,)))
+            threads[-1].start()
+            while len(lock._waiters) <= number:
+                time.sleep(0.001)
+        lock.release()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(order, list(range(5)))
+
+    def test_fifo_lock_timeout(self):
+        lock = FifoLock()
+        lock.acquire()
+        self.assertFalse(lock.acquire(timeout=0.01))
+        self.assertEqual(len(lock._waiters), 0)
+        lock.release()
+        self.assertTrue(lock.acquire(timeout=0.01))
+
+    def test_write_queue_timeout(self):
+        queue = WriteQueue()
+        queue._lock.acquire()  # Another request holds the write slot.
+        with self.assertRaises(WriteQueueTimeout):
+            with queue.turn(timeout=0.01):
+                pass
+
+    def test_busy_writes_get_503_with_retry_after(self):
+        queue = WriteQueue()
+        queue._lock.acquire()
+        get_response = mock.Mock()
+        middleware = SerializedWriteMiddleware(get_response)
+        request = RequestFactory().post('/api/patients/')
+        with mock.patch('core.sqlite.write_queue', return_value=queue), self.assertLogs('core.sqlite', 'WARNING'):
+            response = middleware(request)
+            locked = middleware.process_exception(request, OperationalError('database is locked'))
+        get_response.assert_not_called()
+        for response in (response, locked):
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], '1')
+        self.assertIsNone(middleware.process_exception(request, OperationalError('no such table: x')))
+
+
+class SearchTests(APITestCase):
+
+    def names(self, term):
+        response = self.client.get('/api/patients/', {'search': term})
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.json()['results']]
+
+    def test_new_and_renamed_patients_are_found(self):
+        zelda = Patient.objects.create(
+            name='Zelda Okonkwo', age=30, gender='Female', phone='555-0177',
+            email='zelda@example.com', address='7 Search Street'
+        )
+        self.assertEqual(self.names('okon'), ['Zelda Okonkwo'])
+        self.assertEqual(self.names('zel oko'), ['Zelda Okonkwo'])
+        self.assertEqual(sorted(self.names('555-01')), ['Test Patient', 'Zelda Okonkwo'])
+
+        zelda.name = 'Zelda Adeyemi'
+        zelda.save()
+        self.assertEqual(self.names('okon'), [])
+        self.assertEqual(self.names('adey'), ['Zelda Adeyemi'])
+        zelda.delete()
+        self.assertEqual(self.names('zelda'), [])
+
+    def test_best_match_first(self):
+        Patient.objects.create(
+            name='Jordan Smith', age=30, gender='Male', phone='555-0178',
+            email='smith@example.com', address='1 Smith Street'
+        )
+        Patient.objects.create(
+            name='Smith Jordan', age=30, gender='Male', phone='555-0179',
+            email='jordan@example.com', address='1 Other Road'
+        )
+        self.assertEqual(self.names('smith')[0], 'Jordan Smith')
+
+    def test_terms_without_words_fall_back(self):
+        self.assertEqual(self.names('@'), ['Test Patient'])
+
+
+class BenchmarkBudgetTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.budgets = os.path.join(directory.name, 'budgets.json')
+        self.report = os.path.join(directory.name, 'report.json')
+
+    def benchmark(self, *args):
+        call_command(
+            'benchmark_endpoints', '--filter', 'patient-list', '--iterations', '2', '--warmup', '0',
+            '--budgets', self.budgets, '--output', self.report, '--latency-tolerance', '100',
+            *args, stdout=StringIO(),
+        )
+        with open(self.report) as handle:
+            return json.load(handle)
+
+    def test_regression_over_budget_exits_non_zero(self):
+        self.benchmark('--update-budgets')
+        with open(self.budgets) as handle:
+            budgets = json.load(handle)
+        self.assertGreater(budgets['patient-list']['queries'], 0)
+        self.assertEqual(self.benchmark()['failures'], 0)
+
+        # As if a change added queries beyond the count tolerance.
+        budgets['patient-list']['queries'] = 0
+        with open(self.budgets, 'w') as handle:
+            json.dump(budgets, handle)
+        with self.assertRaises(CommandError) as raised:
+            self.benchmark()
+        self.assertEqual(raised.exception.returncode, 1)
+        with open(self.report) as handle:
+            report = json.load(handle)
+        self.assertEqual(report['failures'], 1)
+        [endpoint] = [result for result in report['endpoints'] if result['violations']]
+        self.assertEqual(endpoint['name'], 'patient-list')
+
+
+class SeedScaleDataTests(TestCase):
+
+    VOLUMES = {
+        'days': 30, 'doctors': 3, 'nurses': 2, 'receptionists': 1, 'wards': 2, 'beds_per_ward': 5,
+        'patients': 50, 'appointments': 200, 'medical_records': 40, 'prescriptions': 30, 'lab_tests': 30,
+        'bills': 40, 'payments': 50, 'inventory_items': 10, 'inventory_transactions': 100, 'visitors': 20,
+    }
+
+    def seed(self):
+        call_command('seed_scale_data', stdout=StringIO(), **self.VOLUMES)
+
+    def test_volumes_and_derived_state(self):
+        self.seed()
+        self.assertEqual(Patient.objects.count(), 50)
+        self.assertEqual(Appointment.objects.count(), 200)
+        self.assertEqual(Bed.objects.count(), 10)
+        self.assertEqual(Bill.objects.count(), 40)
+        self.assertEqual(User.objects.filter(role='doctor').count(), 3)
+
+        # What bulk inserts skip is rebuilt: ward counters and slot bitmaps.
+        self.assertEqual(reconcile('default', dry_run=True), [])
+        stored = {
+            (row.doctor_id, row.date): slots.from_bitmap(row.bitmap) for row in SlotOccupancy.objects.all()
+        }
+        expected = {}
+        for appointment in Appointment.objects.filter(status='scheduled'):
+            key = (appointment.doctor_id, appointment.date)
+            expected[key] = expected.get(key, 0) | slots.span_mask(
+                slots.minute_of_day(appointment.time), slots.type_minutes(appointment.type)
+            )
+        self.assertTrue(expected)
+        self.assertEqual(stored, expected)
+
+    def test_same_seed_same_data(self):
+        self.seed()
+        first = list(Appointment.objects.order_by('pk').values_list('doctor_id', 'date', 'time', 'status'))
+        Appointment.objects.all().delete()
+        Patient.objects.all().delete()
+        User.objects.all().delete()
+        self.seed()
+        second = list(Appointment.objects.order_by('pk').values_list('doctor_id', 'date', 'time', 'status'))
+        self.assertEqual(len(first), 200)
+        self.assertEqual([row[1:] for row in first], [row[1:] for row in second])
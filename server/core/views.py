@@ -0,0 +1,69 @@
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from accounts.authentication import token_cache_stats
+
+from .batch import job_status, run_summary
+from .cache import cache_stats
+from .dashboard import SECTIONS, build_dashboard
+from .models import BatchRun
+from .replica import replica_status
+
+
+@api_view(['GET'])
+def replica_lag(request):
+    """Report how far the analytics replica is behind the primary"""
+    if request.user.role != 'admin':
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    return Response(replica_status())
+
+
+@api_view(['GET'])
+def analytics_cache_stats(request):
+    """Hit/miss counters of the analytics response cache"""
+    if request.user.role != 'admin':
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    return Response(cache_stats())
+
+
+@api_view(['GET'])
+def auth_token_cache_stats(request):
+    """Hit rate of the cached token authentication"""
+    if request.user.role != 'admin':
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    return Response(token_cache_stats())
+
+
+@api_view(['GET'])
+def batch_runs(request):
+    """Batch jobs with their schedule, and the latest runs"""
+    if request.user.role != 'admin':
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    runs = BatchRun.objects.all()
+    job = request.query_params.get('job')
+    if job:
+        runs = runs.filter(job=job)
+    return Response({
+        'jobs': job_status(),
+        'runs': [run_summary(run) for run in runs[:50]],
+    })
+
+
+@api_view(['GET'])
+def dashboard(request, role):
+    """Everything a role's dashboard shows, in one response"""
+    if role not in SECTIONS:
+        return Response({'error': f'Unknown dashboard {role!r}'}, status=status.HTTP_404_NOT_FOUND)
+    if request.user.role != role and request.user.role != 'admin':
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    # Admins can look at a staff member's dashboard with ?user=<id>
+    subject = request.user
+    user_id = request.query_params.get('user')
+    if user_id and request.user.role == 'admin':
+        subject = get_user_model().objects.filter(pk=user_id, role=role).first()
+        if subject is None:
+            return Response({'error': f'No {role} with id {user_id}'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(build_dashboard(subject, role))
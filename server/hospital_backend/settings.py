@@ -23,6 +23,7 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework.authtoken',
     'corsheaders',
+    'core',
     'accounts',
     'patients',
     'appointments',
@@ -34,6 +35,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestProfilingMiddleware',
+    'core.nplusone.NPlusOneDetectionMiddleware',
+    'core.replica.ReplicaConsistencyMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -42,6 +46,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.sqlite.SerializedWriteMiddleware',
 ]
 
 ROOT_URLCONF = 'hospital_backend.urls'
@@ -69,9 +74,179 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file rather than in-memory, so tests with several threads get
+        # SQLite's normal locking (wait for the writer) instead of
+        # shared-cache "database table is locked" errors.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# SQLite production profile (core.sqlite): WAL journaling and tuned pragmas on
+# every connection, BEGIN IMMEDIATE transactions, a busy timeout and a single
+# writer queue for write requests. Set SQLITE_PROFILE=production to enable it
+# while DEBUG is on, or SQLITE_PROFILE=development to disable it.
+SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'development' if DEBUG else 'production')
+
+SQLITE_TUNING = {
+    'ENABLED': SQLITE_PROFILE == 'production',
+    'PRAGMAS': {
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'cache_size': -64000,  # KiB
+        'mmap_size': 268435456,
+        'temp_store': 'memory',
+        'busy_timeout': 5000,
+    },
+    'WRITE_QUEUE': True,
+    'WRITE_QUEUE_TIMEOUT': 30,
+    'BUSY_RETRIES': 5,
+    'BUSY_BACKOFF_MS': 50,
+}
+
+if SQLITE_TUNING['ENABLED']:
+    DATABASES['default']['OPTIONS'] = {
+        'timeout': 5,
+        # Take the write lock when the transaction starts instead of failing
+        # with "database is locked" when a reader tries to upgrade mid-way.
+        'transaction_mode': 'IMMEDIATE',
+    }
+    # Keep connections (and their pragmas and page cache) between requests.
+    DATABASES['default']['CONN_MAX_AGE'] = 60
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Read-only analytics actions (core.replica.use_replica) are served from this
+# replica when ANALYTICS_REPLICA=1. The default replica is a SQLite copy of the
+# primary refreshed by `manage.py refresh_replica --interval 300`; set PATH to
+# None and point DATABASES['analytics'] at an externally replicated database
+# to use that instead. Users' own writes are tracked in the default cache, so
+# the replica stays off unless CACHE_DIR shares that cache between workers;
+# set ALLOW_LOCAL_CACHE only for a single-process server.
+ANALYTICS_REPLICA = {
+    'ENABLED': os.environ.get('ANALYTICS_REPLICA') == '1',
+    'ALIAS': 'analytics',
+    'PATH': os.environ.get('ANALYTICS_REPLICA_PATH', str(BASE_DIR / 'db.analytics.sqlite3')),
+    'MAX_LAG_SECONDS': 900,
+    'REFRESH_INTERVAL_SECONDS': 300,
+    'ALLOW_LOCAL_CACHE': False,
+}
+
+if ANALYTICS_REPLICA['ENABLED']:
+    DATABASES['analytics'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f"file:{ANALYTICS_REPLICA['PATH']}?mode=ro",
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.db_routers.AnalyticsReplicaRouter']
+
+# LocMemCache is private to each process. Set CACHE_DIR to share the cache (and
+# with it analytics invalidation and read-after-write routing) between workers.
+CACHES = {
+    'default': {
+        'BACKEND': (
+            'django.core.cache.backends.filebased.FileBasedCache' if os.environ.get('CACHE_DIR')
+            else 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_DIR', 'hospital'),
+    },
+    # Token -> user lookups (accounts.authentication). Shared between workers
+    # under CACHE_DIR; the per-process fallback is only used by single-process
+    # setups that set TOKEN_AUTH_CACHE['ALLOW_LOCAL_CACHE'].
+    'tokens': {
+        'BACKEND': (
+            'django.core.cache.backends.filebased.FileBasedCache' if os.environ.get('CACHE_DIR')
+            else 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.path.join(os.environ['CACHE_DIR'], 'tokens') if os.environ.get('CACHE_DIR') else 'tokens',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Response cache for analytics actions (core.cache.cached_action). Entries are
+# invalidated by post_save/post_delete on the models each action depends on;
+# TIMEOUT is the fallback for writes that bypass signals.
+ANALYTICS_CACHE = {
+    'ENABLED': True,
+    'TIMEOUT': 300,
+}
+
+# Cached token authentication (accounts.authentication). Entries are dropped
+# on logout, password resets and whenever the user is saved; TIMEOUT bounds
+# anything else. Revocations only reach every worker through a shared cache,
+# so without CACHE_DIR the cache is bypassed. STATS counts hits and misses.
+TOKEN_AUTH_CACHE = {
+    'ENABLED': True,
+    'CACHE': 'tokens',
+    'TIMEOUT': 300,
+    'ALLOW_LOCAL_CACHE': False,
+    'STATS': False,
+}
+
+# values()-based list rendering (core.projections) for viewsets with a
+# list_projection. Output is identical to the serializer's; turn it off to
+# compare, or with `python manage.py benchmark_projections`.
+LIST_PROJECTIONS = {
+    'ENABLED': True,
+}
+
+# Full-text search (core.search) behind ?search= on patients, medical records
+# and inventory. Disabled, or on databases without the FTS5 tables, searches
+# fall back to __icontains.
+SEARCH_INDEX = {
+    'ENABLED': True,
+    'MAX_TERMS': 8,
+}
+
+# Patient typeahead (patients.autocomplete): an in-process prefix index per
+# worker, rebuilt in the background after MAX_AGE seconds to pick up other
+# workers' writes.
+PATIENT_AUTOCOMPLETE = {
+    'ENABLED': True,
+    'LIMIT': 10,
+    'MAX_AGE': 300,
+}
+
+# Appointment slots (appointments.slots): the working day of doctors without
+# WorkingHours, the slot step, each appointment type's length where it is not
+# SLOT_MINUTES (run rebuild_slot_index after changing it), and the largest
+# search allowed.
+APPOINTMENT_SLOTS = {
+    'DAY_START': '09:00',
+    'DAY_END': '17:00',
+    'SLOT_MINUTES': 30,
+    'TYPE_MINUTES': {'follow-up': 15, 'surgery': 120},
+    'MAX_DAYS': 31,
+}
+
+# End-of-day batch sweeps (core.batch), each a chunked set-based UPDATE. Jobs
+# run daily 'at' HH:MM (local time) or 'every' N minutes under
+# `manage.py run_batch_jobs --scheduler`, or in the web process with
+# BATCH_SCHEDULER=1. A lease row (LEASE_SECONDS, renewed after every chunk)
+# lets only one node run a job at a time; runs are kept as BatchRun history.
+BATCH_JOBS = {
+    'JOBS': {
+        'appointment_no_shows': {'task': 'appointments.sweeps.mark_no_shows', 'at': '00:15'},
+        'prescription_expiry': {'task': 'medical_records.sweeps.expire_prescriptions', 'at': '00:20'},
+        'bed_cleaning': {
+            'task': 'wards.sweeps.finish_cleaning',
+            'every': 30,
+            'options': {'cleaning_minutes': 60},
+        },
+    },
+    'CHUNK_SIZE': 1000,
+    'LEASE_SECONDS': 300,
+    'POLL_SECONDS': 60,
+    'IN_PROCESS': os.environ.get('BATCH_SCHEDULER') == '1',
+}
+
+# Composite role dashboards (core.dashboard). Sections run on MAX_WORKERS
+# threads; 0 or 1 runs them sequentially on the request's own connection.
+# Threads only pay off with spare cores (or a database server to wait on).
+DASHBOARD = {
+    'MAX_WORKERS': int(os.environ.get('DASHBOARD_WORKERS', min(4, os.cpu_count() or 1))),
+    'LIST_LIMIT': 10,
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -109,7 +284,7 @@ AUTH_USER_MODEL = 'accounts.User'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -149,6 +324,13 @@ CORS_ALLOW_HEADERS = [
     'x-requested-with',
 ]
 
+CORS_EXPOSE_HEADERS = [
+    'server-timing',
+    'x-replica-lag',
+    'x-cache',
+    'age',
+]
+
 CORS_ALLOW_METHODS = [
     'DELETE',
     'GET',
@@ -163,6 +345,25 @@ EMAIL_BACKEND = 'django_resend.Resend**********'
 RESEND_API_KEY = 're***************'  # Replace with your actual Resend API key
 DEFAULT_FROM_EMAIL = 'onboarding@resend.dev'  # Update this to your verified domain email
 
+# Per-request SQL/timing instrumentation (core.middleware.RequestProfilingMiddleware).
+# Sampled requests get a Server-Timing header; slow or query-heavy ones are logged
+# with their most repeated SQL fingerprints.
+REQUEST_PROFILING = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 1.0 if DEBUG else 0.05,
+    'SLOW_REQUEST_MS': 500,
+    'MAX_QUERIES': 50,
+    'TOP_FINGERPRINTS': 5,
+}
+
+# N+1 query detection for serializers (core.nplusone). Keep it on in development,
+# tests and staging; set NPLUSONE_RAISE=1 to turn reports into errors.
+NPLUSONE_DETECTION = {
+    'ENABLED': DEBUG or os.environ.get('NPLUSONE_DETECTION') == '1',
+    'THRESHOLD': 3,
+    'RAISE': os.environ.get('NPLUSONE_RAISE') == '1',
+}
+
 # Logging configuration
 LOGGING = {
     'version': 1,
@@ -4,11 +4,12 @@ from rest_framework.routers import DefaultRouter
 from accounts.views import UserViewSet
 from patients.views import PatientViewSet
 from wards.views import WardViewSet, BedViewSet
-from appointments.views import AppointmentViewSet
+from appointments.views import AppointmentViewSet, ScheduleExceptionViewSet, WorkingHoursViewSet
 from medical_records.views import MedicalRecordViewSet, PrescriptionViewSet, LabTestViewSet
 from inventory.views import InventoryItemViewSet, InventoryTransactionViewSet
 from billing.views import BillViewSet, PaymentViewSet
 from visitors.views import VisitorViewSet
+from core.views import analytics_cache_stats, auth_token_cache_stats, batch_runs, dashboard, replica_lag
 
 
 # Create router and register viewsets
@@ -18,6 +19,8 @@ router.register(r'patients', PatientViewSet)
 router.register(r'wards', WardViewSet)
 router.register(r'beds', BedViewSet)
 router.register(r'appointments', AppointmentViewSet)
+router.register(r'working-hours', WorkingHoursViewSet)
+router.register(r'schedule-exceptions', ScheduleExceptionViewSet)
 router.register(r'medical-records', MedicalRecordViewSet)
 router.register(r'prescriptions', PrescriptionViewSet)
 router.register(r'lab-tests', LabTestViewSet)
@@ -31,6 +34,11 @@ router.register(r'visitors', VisitorViewSet)
 # URL patterns
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/system/replica/', replica_lag, name='replica-lag'),
+    path('api/system/cache/', analytics_cache_stats, name='analytics-cache-stats'),
+    path('api/system/auth-cache/', auth_token_cache_stats, name='auth-token-cache-stats'),
+    path('api/system/batch-runs/', batch_runs, name='batch-runs'),
+    path('api/dashboard/<str:role>/', dashboard, name='dashboard'),
     path('api/', include(router.urls)),
     path('api-auth/', include('rest_framework.urls')),
 ]
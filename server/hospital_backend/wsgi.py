@@ -13,4 +13,11 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hospital_backend.settings')
 
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+
+# Batch sweeps in this process when BATCH_JOBS['IN_PROCESS'] is on; leases
+# keep several workers from running the same job.
+from core.batch import batch_settings, start_scheduler  # noqa: E402
+
+if batch_settings()['IN_PROCESS']:
+    start_scheduler()
\ No newline at end of file
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:12
+
+from django.db import migrations
+
+# FTS5 index for core.search; rowid is the inventory_items primary key.
+CREATE_SQL = (
+    "CREATE VIRTUAL TABLE inventory_items_fts USING fts5("
+    "name, category, supplier, location, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+POPULATE_SQL = 'INSERT INTO inventory_items_fts (rowid, name, category, supplier, location) SELECT id, name, category, supplier, location FROM inventory_items'
+
+
+def create_search_index(apps, schema_editor):
+    # Other databases search with the __icontains fallback.
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(CREATE_SQL)
+        schema_editor.execute(POPULATE_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS inventory_items_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_inventoryitem_inv_item_name_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
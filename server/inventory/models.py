@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F, Q
 
 class InventoryItem(models.Model):
     CATEGORY_CHOICES = [
@@ -34,6 +35,12 @@ class InventoryItem(models.Model):
     class Meta:
         db_table = 'inventory_items'
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['name'], name='inv_item_name_idx'),
+            models.Index(fields=['expiry_date'], name='inv_item_expiry_idx'),
+            models.Index(fields=['category', 'name'], name='inv_item_category_idx'),
+            models.Index(fields=['name'], condition=Q(quantity__lte=F('min_stock')), name='inv_item_low_stock_idx'),
+        ]
 
 class InventoryTransaction(models.Model):
     TRANSACTION_TYPES = [
@@ -54,4 +61,9 @@ class InventoryTransaction(models.Model):
     
     class Meta:
         db_table = 'inventory_transactions'
-        ordering = ['-date']
\ No newline at end of file
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['date'], name='inv_txn_date_idx'),
+            models.Index(fields=['item', 'date'], name='inv_txn_item_date_idx'),
+            models.Index(fields=['transaction_type', 'date'], name='inv_txn_type_date_idx'),
+        ]
\ No newline at end of file
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from core.projections import Projection
 from .models import InventoryItem, InventoryTransaction
 
 class InventoryItemSerializer(serializers.ModelSerializer):
@@ -27,4 +28,10 @@ class InventoryTransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = InventoryTransaction
         fields = '__all__'
-        read_only_fields = ['date']
\ No newline at end of file
+        read_only_fields = ['date']
+
+inventory_item_projection = Projection(InventoryItemSerializer, attributes={
+    'is_low_stock': ('quantity', 'min_stock'),
+    'total_value': ('quantity', 'cost_per_unit'),
+})
+inventory_transaction_projection = Projection(InventoryTransactionSerializer)
@@ -1,28 +1,34 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q, F, Sum, Count
+from django.db.models import F, Sum, Count
 from django.utils import timezone
 from datetime import datetime, timedelta
+from core.aggregation import time_buckets
+from core.cache import cached_action
+from core.dates import start_of_day
+from core.exports import ExportMixin
+from core.pagination import KeysetOptInPagination
+from core.replica import use_replica
+from core.search import SEARCH_INDEXES
 from .models import InventoryItem, InventoryTransaction
-from .serializers import InventoryItemSerializer, InventoryTransactionSerializer
+from .serializers import (
+    InventoryItemSerializer, InventoryTransactionSerializer, inventory_item_projection,
+    inventory_transaction_projection,
+)
 
-class InventoryItemViewSet(viewsets.ModelViewSet):
+class InventoryItemViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = InventoryItem.objects.all()
     serializer_class = InventoryItemSerializer
+    list_projection = inventory_item_projection
     
     def get_queryset(self):
         queryset = InventoryItem.objects.all()
         
-        # Search functionality
+        # Search functionality (full-text, best matches first)
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) |
-                Q(category__icontains=search) |
-                Q(supplier__icontains=search) |
-                Q(location__icontains=search)
-            )
+            queryset = SEARCH_INDEXES['inventory'].filter(queryset, search)
         
         # Filter by category
         category = self.request.query_params.get('category', None)
@@ -54,15 +60,13 @@ class InventoryItemViewSet(viewsets.ModelViewSet):
     def low_stock(self, request):
         """Get items with low stock"""
         items = InventoryItem.objects.filter(quantity__lte=F('min_stock'))
-        serializer = self.get_serializer(items, many=True)
-        return Response(serializer.data)
+        return self.list_response(items)
     
     @action(detail=False, methods=['get'])
     def out_of_stock(self, request):
         """Get items that are out of stock"""
         items = InventoryItem.objects.filter(quantity=0)
-        serializer = self.get_serializer(items, many=True)
-        return Response(serializer.data)
+        return self.list_response(items)
     
     @action(detail=False, methods=['get'])
     def expiring_soon(self, request):
@@ -70,18 +74,18 @@ class InventoryItemViewSet(viewsets.ModelViewSet):
         days = int(self.request.query_params.get('days', 30))
         expiry_date = timezone.now().date() + timedelta(days=days)
         items = InventoryItem.objects.filter(expiry_date__lte=expiry_date)
-        serializer = self.get_serializer(items, many=True)
-        return Response(serializer.data)
+        return self.list_response(items)
     
     @action(detail=False, methods=['get'])
     def expired(self, request):
         """Get expired items"""
         today = timezone.now().date()
         items = InventoryItem.objects.filter(expiry_date__lt=today)
-        serializer = self.get_serializer(items, many=True)
-        return Response(serializer.data)
+        return self.list_response(items)
     
     @action(detail=False, methods=['get'])
+    @cached_action(depends_on=['inventory.InventoryItem', 'inventory.InventoryTransaction'])
+    @use_replica
     def analytics(self, request):
         """Get inventory analytics"""
         total_items = InventoryItem.objects.count()
@@ -109,9 +113,9 @@ class InventoryItemViewSet(viewsets.ModelViewSet):
         ).order_by('-count')[:10]
         
         # Recent transactions (last 30 days)
-        thirty_days_ago = timezone.now().date() - timedelta(days=30)
+        thirty_days_ago = timezone.localdate() - timedelta(days=30)
         recent_transactions = InventoryTransaction.objects.filter(
-            date__gte=thirty_days_ago
+            date__gte=start_of_day(thirty_days_ago)
         ).count()
         
         return Response({
@@ -239,12 +243,14 @@ class InventoryItemViewSet(viewsets.ModelViewSet):
         
         return Response(list(locations))
 
-class InventoryTransactionViewSet(viewsets.ReadOnlyModelViewSet):
+class InventoryTransactionViewSet(ExportMixin, viewsets.ReadOnlyModelViewSet):
     queryset = InventoryTransaction.objects.all()
     serializer_class = InventoryTransactionSerializer
+    list_projection = inventory_transaction_projection
+    pagination_class = KeysetOptInPagination
     
     def get_queryset(self):
-        queryset = InventoryTransaction.objects.all()
+        queryset = InventoryTransaction.objects.select_related('item', 'performed_by').all()
         
         # Filter by item
         item_id = self.request.query_params.get('item', None)
@@ -277,10 +283,11 @@ class InventoryTransactionViewSet(viewsets.ReadOnlyModelViewSet):
         days = int(self.request.query_params.get('days', 7))
         start_date = timezone.now().date() - timedelta(days=days)
         transactions = self.get_queryset().filter(date__gte=start_date)
-        serializer = self.get_serializer(transactions, many=True)
-        return Response(serializer.data)
+        return self.list_response(transactions)
     
     @action(detail=False, methods=['get'])
+    @cached_action(depends_on=['inventory.InventoryTransaction', 'inventory.InventoryItem', 'accounts.User'])
+    @use_replica
     def analytics(self, request):
         """Get transaction analytics"""
         total_transactions = InventoryTransaction.objects.count()
@@ -292,9 +299,9 @@ class InventoryTransactionViewSet(viewsets.ReadOnlyModelViewSet):
         )
         
         # Recent activity (last 30 days)
-        thirty_days_ago = timezone.now().date() - timedelta(days=30)
+        thirty_days_ago = timezone.localdate() - timedelta(days=30)
         recent_transactions = InventoryTransaction.objects.filter(
-            date__gte=thirty_days_ago
+            date__gte=start_of_day(thirty_days_ago)
         ).count()
         
         # Most active users
@@ -305,14 +312,17 @@ class InventoryTransactionViewSet(viewsets.ReadOnlyModelViewSet):
         ).order_by('-count')[:10]
         
         # Daily transaction counts for last 30 days
-        daily_transactions = []
-        for i in range(30):
-            date = timezone.now().date() - timedelta(days=i)
-            count = InventoryTransaction.objects.filter(date=date).count()
-            daily_transactions.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'count': count
-            })
+        today = timezone.localdate()
+        daily_transactions = [
+            {
+                'date': bucket['start'].strftime('%Y-%m-%d'),
+                'count': bucket['count']
+            }
+            for bucket in reversed(time_buckets(
+                InventoryTransaction.objects.all(), 'date', 'day',
+                start=today - timedelta(days=29), end=today
+            ))
+        ]
         
         return Response({
             'total_transactions': total_transactions,
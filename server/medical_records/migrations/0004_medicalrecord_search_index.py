@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:12
+
+from django.db import migrations
+
+# FTS5 index for core.search; rowid is the medical_records primary key.
+CREATE_SQL = (
+    "CREATE VIRTUAL TABLE medical_records_fts USING fts5("
+    "diagnosis, symptoms, treatment, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+POPULATE_SQL = 'INSERT INTO medical_records_fts (rowid, diagnosis, symptoms, treatment) SELECT id, diagnosis, symptoms, treatment FROM medical_records'
+
+
+def create_search_index(apps, schema_editor):
+    # Other databases search with the __icontains fallback.
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(CREATE_SQL)
+        schema_editor.execute(POPULATE_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS medical_records_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medical_records', '0003_labtest_labtest_ordered_date_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
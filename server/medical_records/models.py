@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -24,6 +25,12 @@ class MedicalRecord(models.Model):
     class Meta:
         db_table = 'medical_records'
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['date'], name='medrec_date_idx'),
+            models.Index(fields=['doctor', 'date'], name='medrec_doctor_date_idx'),
+            models.Index(fields=['patient', 'date'], name='medrec_patient_date_idx'),
+            models.Index(fields=['follow_up'], condition=Q(follow_up__isnull=False), name='medrec_follow_up_idx'),
+        ]
 
 class Prescription(models.Model):
     STATUS_CHOICES = [
@@ -52,6 +59,11 @@ class Prescription(models.Model):
     class Meta:
         db_table = 'prescriptions'
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['date'], name='rx_date_idx'),
+            models.Index(fields=['status', 'date'], name='rx_status_date_idx'),
+            models.Index(fields=['doctor', 'date'], name='rx_doctor_date_idx'),
+        ]
 
 class LabTest(models.Model):
     STATUS_CHOICES = [
@@ -89,4 +101,10 @@ class LabTest(models.Model):
     
     class Meta:
         db_table = 'lab_tests'
-        ordering = ['-ordered_date']
\ No newline at end of file
+        ordering = ['-ordered_date']
+        indexes = [
+            models.Index(fields=['ordered_date'], name='labtest_ordered_date_idx'),
+            models.Index(fields=['status', 'priority'], name='labtest_status_priority_idx'),
+            models.Index(fields=['priority', 'ordered_date'], name='labtest_priority_date_idx'),
+            models.Index(fields=['ordered_by', 'ordered_date'], name='labtest_orderer_date_idx'),
+        ]
\ No newline at end of file
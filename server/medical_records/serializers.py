@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from core.projections import Projection
 from .models import MedicalRecord, Prescription, LabTest
 
 class MedicalRecordSerializer(serializers.ModelSerializer):
@@ -123,4 +124,6 @@ class LabTestSerializer(serializers.ModelSerializer):
             if field in data:
                 print(f"{field} type: {type(data[field])}, value: {data[field]}")
         
-        return data
\ No newline at end of file
+        return data
+
+medical_record_projection = Projection(MedicalRecordSerializer)
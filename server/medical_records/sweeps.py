@@ -0,0 +1,45 @@
+"""
+Batch sweeps (core.batch) for medical records.
+"""
+
+import re
+from datetime import timedelta
+
+from django.utils import timezone
+
+from core.cache import invalidate_models
+
+from .models import Prescription
+
+DURATION = re.compile(r'^\s*(\d+)\s*(day|week|month|year)s?\s*$', re.IGNORECASE)
+UNIT_DAYS = {'day': 1, 'week': 7, 'month': 30, 'year': 365}
+
+
+def duration_days(duration):
+    """Days in a duration such as ``"7 days"`` or ``"2 weeks"``, or None."""
+    match = DURATION.match(duration or '')
+    if not match:
+        return None
+    return int(match.group(1)) * UNIT_DAYS[match.group(2).lower()]
+
+
+def expire_prescriptions(batch):
+    """Active prescriptions past their duration become completed.
+
+    ``duration`` is free text, so there is one chunked UPDATE per distinct
+    duration (a handful in practice), each with its own date cutoff.
+    Durations that cannot be read are left alone and listed.
+    """
+    today = timezone.localdate(batch.now)
+    active = Prescription.objects.using(batch.using).filter(status='active')
+    completed, unreadable = 0, []
+    for duration in active.order_by().values_list('duration', flat=True).distinct():
+        days = duration_days(duration)
+        if days is None:
+            unreadable.append(duration)
+            continue
+        ended = active.filter(duration=duration, date__lte=today - timedelta(days=days))
+        completed += batch.update_in_chunks(ended, status='completed', updated_at=batch.now)
+    if completed:
+        invalidate_models(Prescription)
+    return {'completed': completed, 'unreadable_durations': sorted(unreadable)}
@@ -2,17 +2,26 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.utils import timezone
-from django.db.models import Q, Count
+from django.db.models import Count
 from datetime import datetime, timedelta
+from core.cache import cached_action
+from core.exports import ExportMixin
+from core.pagination import KeysetOptInPagination
+from core.replica import use_replica
+from core.search import SEARCH_INDEXES
 from .models import MedicalRecord, Prescription, LabTest
-from .serializers import MedicalRecordSerializer, PrescriptionSerializer, LabTestSerializer
+from .serializers import (
+    MedicalRecordSerializer, PrescriptionSerializer, LabTestSerializer, medical_record_projection,
+)
 
-class MedicalRecordViewSet(viewsets.ModelViewSet):
+class MedicalRecordViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = MedicalRecord.objects.all()
     serializer_class = MedicalRecordSerializer
+    list_projection = medical_record_projection
+    pagination_class = KeysetOptInPagination
     
     def get_queryset(self):
-        queryset = MedicalRecord.objects.all()
+        queryset = MedicalRecord.objects.select_related('patient', 'doctor').all()
         
         # Filter for doctors - only show their records
         if self.request.user.role == 'doctor':
@@ -31,14 +40,12 @@ class MedicalRecordViewSet(viewsets.ModelViewSet):
         if end_date:
             queryset = queryset.filter(date__lte=end_date)
         
-        # Search by diagnosis or symptoms
+        # Search by diagnosis, symptoms or treatment. Cursor pages keep the
+        # date order, which their cursors are built from.
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(diagnosis__icontains=search) |
-                Q(symptoms__icontains=search) |
-                Q(treatment__icontains=search)
-            )
+            rank = 'cursor' not in self.request.query_params
+            queryset = SEARCH_INDEXES['medical_records'].filter(queryset, search, rank=rank)
         
         return queryset
     
@@ -46,6 +53,8 @@ class MedicalRecordViewSet(viewsets.ModelViewSet):
         serializer.save(doctor=self.request.user)
     
     @action(detail=False, methods=['get'])
+    @cached_action(depends_on=['medical_records.MedicalRecord', 'accounts.User'])
+    @use_replica
     def analytics(self, request):
         """Get medical records analytics"""
         total_records = MedicalRecord.objects.count()
@@ -85,17 +94,17 @@ class MedicalRecordViewSet(viewsets.ModelViewSet):
         records = MedicalRecord.objects.filter(
             follow_up__isnull=False,
             follow_up__gte=today
-        ).order_by('follow_up')
+        ).select_related('patient', 'doctor').order_by('follow_up')
         
-        serializer = self.get_serializer(records, many=True)
-        return Response(serializer.data)
+        return self.list_response(records)
 
-class PrescriptionViewSet(viewsets.ModelViewSet):
+class PrescriptionViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = Prescription.objects.all()
     serializer_class = PrescriptionSerializer
+    pagination_class = KeysetOptInPagination
     
     def get_queryset(self):
-        queryset = Prescription.objects.all()
+        queryset = Prescription.objects.select_related('patient', 'doctor').all()
         
         # Filter for doctors - only show their prescriptions
         if self.request.user.role == 'doctor':
@@ -128,10 +137,11 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
     def active(self, request):
         """Get active prescriptions"""
         prescriptions = self.get_queryset().filter(status='active')
-        serializer = self.get_serializer(prescriptions, many=True)
-        return Response(serializer.data)
+        return self.list_response(prescriptions)
     
     @action(detail=False, methods=['get'])
+    @cached_action(depends_on=['medical_records.Prescription', 'accounts.User'])
+    @use_replica
     def analytics(self, request):
         """Get prescription analytics"""
         total_prescriptions = Prescription.objects.count()
@@ -177,16 +187,17 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(prescription)
         return Response(serializer.data)
 
-class LabTestViewSet(viewsets.ModelViewSet):
+class LabTestViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = LabTest.objects.all()
     serializer_class = LabTestSerializer
+    pagination_class = KeysetOptInPagination
     
     def create(self, request, *args, **kwargs):
         print(f"LabTestViewSet create called with data: {request.data}")
         return super().create(request, *args, **kwargs)
     
     def get_queryset(self):
-        queryset = LabTest.objects.all()
+        queryset = LabTest.objects.select_related('patient', 'ordered_by').all()
         
         # Filter for doctors - only show tests they ordered
         if self.request.user.role == 'doctor':
@@ -222,24 +233,23 @@ class LabTestViewSet(viewsets.ModelViewSet):
     def pending(self, request):
         """Get pending lab tests"""
         tests = self.get_queryset().filter(status='pending')
-        serializer = self.get_serializer(tests, many=True)
-        return Response(serializer.data)
+        return self.list_response(tests)
     
     @action(detail=False, methods=['get'])
     def urgent(self, request):
         """Get urgent lab tests"""
         tests = self.get_queryset().filter(priority__in=['urgent', 'stat'])
-        serializer = self.get_serializer(tests, many=True)
-        return Response(serializer.data)
+        return self.list_response(tests)
     
     @action(detail=False, methods=['get'])
     def completed(self, request):
         """Get completed lab tests"""
         tests = self.get_queryset().filter(status='completed')
-        serializer = self.get_serializer(tests, many=True)
-        return Response(serializer.data)
+        return self.list_response(tests)
     
     @action(detail=False, methods=['get'])
+    @cached_action(depends_on=['medical_records.LabTest'])
+    @use_replica
     def analytics(self, request):
         """Get lab test analytics"""
         total_tests = LabTest.objects.count()
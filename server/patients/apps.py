@@ -3,4 +3,9 @@ from django.apps import AppConfig
 
 class PatientsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'patients'
\ No newline at end of file
+    name = 'patients'
+
+    def ready(self):
+        from .autocomplete import connect_signals
+
+        connect_signals()
@@ -0,0 +1,265 @@
+"""
+Typeahead patient lookup from an in-process prefix index.
+
+``GET /api/patients/autocomplete/?q=`` answers from ``PatientPrefixIndex``,
+a sorted array of normalized keys searched with ``bisect``. Each patient is
+indexed under its whole name ("linda wang"), the rest of its name from
+every later word ("wang"), and its phone digits ("5550123456"). A lookup is
+a binary search plus a forward scan over the matching keys, so it costs the
+same at 1M patients as at 1k; the few matches are then read by primary key.
+
+The index is built on first use in each worker process and kept current by
+``post_save``/``post_delete``/``patients_imported`` in that process. Writes
+made by other workers are picked up by a background rebuild once the index
+is older than ``MAX_AGE`` seconds; lookups keep using the old index until
+the new one is swapped in.
+"""
+
+import bisect
+import logging
+import re
+import threading
+import time
+import unicodedata
+from array import array
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from core.search import SEARCH_INDEXES
+
+from .models import Patient
+from .signals import patients_imported
+
+logger = logging.getLogger(__name__)
+
+PATIENT_AUTOCOMPLETE_DEFAULTS = {
+    'ENABLED': True,
+    'LIMIT': 10,
+    'MAX_LIMIT': 50,
+    # Seconds before a lookup triggers a background rebuild.
+    'MAX_AGE': 300,
+    # Index entries scanned when the caller only sees some patients (doctors).
+    'MAX_SCAN': 5000,
+}
+
+# Columns returned for each match.
+FIELDS = ('id', 'name', 'phone', 'age', 'gender', 'status')
+
+SEPARATORS = re.compile(r'[\W_]+')
+NON_DIGITS = re.compile(r'\D+')
+LETTERS = re.compile(r'[^\W\d_]')
+
+
+def autocomplete_settings():
+    return {**PATIENT_AUTOCOMPLETE_DEFAULTS, **getattr(settings, 'PATIENT_AUTOCOMPLETE', {})}
+
+
+def normalize_name(value):
+    """Lower-case, accent-free words separated by single spaces."""
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return ' '.join(SEPARATORS.sub(' ', value.casefold()).split())
+
+
+def patient_keys(name, phone):
+    words = normalize_name(name).split()
+    keys = [' '.join(words[start:]) for start in range(len(words))]
+    digits = NON_DIGITS.sub('', phone or '')
+    if digits:
+        keys.append(digits)
+    return list(dict.fromkeys(keys))
+
+
+def query_key(query):
+    """Index key prefix for what was typed: phone digits, or a name."""
+    if not LETTERS.search(query) and NON_DIGITS.sub('', query):
+        return NON_DIGITS.sub('', query)
+    return normalize_name(query)
+
+
+class PatientPrefixIndex:
+    """Sorted ``(key, patient id)`` pairs, kept as parallel arrays."""
+
+    def __init__(self):
+        self.keys = []
+        self.ids = array('q')
+        self.built_at = None
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        # Changes made while a rebuild reads the table, replayed onto it.
+        self._pending = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    # Building
+
+    def ensure_fresh(self):
+        """Build on first use; rebuild in the background once stale."""
+        if self.built_at is None:
+            with self._build_lock:
+                if self.built_at is None:
+                    self.build()
+        elif time.monotonic() - self.built_at > autocomplete_settings()['MAX_AGE']:
+            if self._build_lock.acquire(blocking=False):
+                threading.Thread(target=self._rebuild_in_background, name='patient-autocomplete',
+                                 daemon=True).start()
+
+    def _rebuild_in_background(self):
+        try:
+            self.build()
+        except Exception:
+            logger.exception('Rebuilding the patient autocomplete index failed')
+        finally:
+            self._build_lock.release()
+            close_old_connections()
+
+    def build(self):
+        started = time.perf_counter()
+        with self._lock:
+            self._pending = []
+        try:
+            entries = []
+            # Surnames and common names repeat; store each distinct key once.
+            shared = {}
+            rows = Patient.objects.order_by().values_list('pk', 'name', 'phone').iterator(chunk_size=10000)
+            for pk, name, phone in rows:
+                entries.extend((shared.setdefault(key, key), pk) for key in patient_keys(name, phone))
+            del shared
+            entries.sort()
+            keys = [key for key, _ in entries]
+            ids = array('q', [pk for _, pk in entries])
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+
+        with self._lock:
+            pending, self._pending = self._pending, None
+            self.keys, self.ids = keys, ids
+            for change in pending:
+                change()
+            self.built_at = time.monotonic()
+        logger.info('Patient autocomplete index: %d keys built in %.2fs', len(keys), time.perf_counter() - started)
+
+    # Incremental updates
+
+    def _record(self, change):
+        with self._lock:
+            change()
+            if self._pending is not None:
+                self._pending.append(change)
+
+    def add(self, pk, name, phone):
+        self._record(lambda: [self._insert(key, pk) for key in patient_keys(name, phone)])
+
+    def remove(self, pk, name, phone):
+        self._record(lambda: [self._delete(key, pk) for key in patient_keys(name, phone)])
+
+    def _position(self, key, pk):
+        # Pairs sort by key, then id: bisect the ids within the key's run.
+        low = bisect.bisect_left(self.keys, key)
+        high = bisect.bisect_right(self.keys, key, low)
+        return bisect.bisect_left(self.ids, pk, low, high)
+
+    def _insert(self, key, pk):
+        index = self._position(key, pk)
+        if index < len(self.keys) and self.keys[index] == key and self.ids[index] == pk:
+            return
+        self.keys.insert(index, key)
+        self.ids.insert(index, pk)
+
+    def _delete(self, key, pk):
+        index = self._position(key, pk)
+        if index < len(self.keys) and self.keys[index] == key and self.ids[index] == pk:
+            del self.keys[index]
+            del self.ids[index]
+
+    # Lookups
+
+    def candidates(self, query, count):
+        """Ids of up to ``count`` patients with a key starting with ``query``."""
+        prefix = query_key(query)
+        if not prefix:
+            return []
+        found = {}
+        with self._lock:
+            keys, ids = self.keys, self.ids
+            index = bisect.bisect_left(keys, prefix)
+            while index < len(keys) and len(found) < count and keys[index].startswith(prefix):
+                found.setdefault(ids[index], None)
+                index += 1
+        return list(found)
+
+
+patient_index = PatientPrefixIndex()
+
+
+def autocomplete(user, query, limit):
+    """Up to ``limit`` patients ``user`` may see whose name or phone starts with ``query``."""
+    config = autocomplete_settings()
+    queryset = Patient.objects.all()
+    restricted = getattr(user, 'role', None) == 'doctor'
+    if restricted:
+        queryset = queryset.filter(assigned_doctor=user)
+
+    if not config['ENABLED']:
+        return list(SEARCH_INDEXES['patients'].filter(queryset, query).values(*FIELDS)[:limit])
+
+    patient_index.ensure_fresh()
+    ids = patient_index.candidates(query, config['MAX_SCAN'] if restricted else limit)
+    rows = {row['id']: row for row in queryset.filter(pk__in=ids).values(*FIELDS)}
+    return [rows[pk] for pk in ids if pk in rows][:limit]
+
+
+# Signals. Nothing is tracked until this process builds the index, and
+# changes are applied once their transaction commits.
+
+def _loaded():
+    return patient_index.built_at is not None or patient_index._pending is not None
+
+
+def _before_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance.pk is None or not _loaded():
+        return
+    if update_fields is not None and not {'name', 'phone'} & set(update_fields):
+        return
+    instance._autocomplete_previous = Patient.objects.filter(pk=instance.pk).values_list('name', 'phone').first()
+
+
+def _saved(sender, instance, using, raw=False, **kwargs):
+    if raw or not _loaded():
+        return
+    previous = instance.__dict__.pop('_autocomplete_previous', None)
+    current = (instance.name, instance.phone)
+    if previous == current:
+        return
+
+    def apply(pk=instance.pk):
+        if previous is not None:
+            patient_index.remove(pk, *previous)
+        patient_index.add(pk, *current)
+    transaction.on_commit(apply, using=using)
+
+
+def _deleted(sender, instance, using, **kwargs):
+    if _loaded():
+        transaction.on_commit(
+            lambda pk=instance.pk, name=instance.name, phone=instance.phone: patient_index.remove(pk, name, phone),
+            using=using,
+        )
+
+
+def _imported(sender, patients, **kwargs):
+    if _loaded():
+        for patient in patients:
+            patient_index.add(patient.pk, patient.name, patient.phone)
+
+
+def connect_signals():
+    pre_save.connect(_before_save, sender=Patient, dispatch_uid='patients.autocomplete.before_save')
+    post_save.connect(_saved, sender=Patient, dispatch_uid='patients.autocomplete.saved')
+    post_delete.connect(_deleted, sender=Patient, dispatch_uid='patients.autocomplete.deleted')
+    patients_imported.connect(_imported, dispatch_uid='patients.autocomplete.imported')
@@ -0,0 +1,171 @@
+"""
+Bulk patient import.
+
+Rows come from a CSV file (header row of ``Patient`` field names) or NDJSON
+(one JSON object per line). They are validated in chunks by
+``PatientImportSerializer``, which applies the same field rules as
+``PatientSerializer`` but resolves doctors and wards with one query per
+chunk instead of one per row. Valid rows of each chunk are written with a
+single ``bulk_create`` in their own transaction; invalid rows are skipped
+and reported with their row number.
+"""
+
+import csv
+import io
+import json
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from rest_framework import serializers
+
+from core.cache import invalidate_models
+from core.sqlite import retry_on_locked
+from wards.models import Ward
+
+from .models import Patient
+from .serializers import PatientSerializer
+from .signals import patients_imported
+
+User = get_user_model()
+
+IMPORT_CHUNK_SIZE = 2000
+MAX_REPORTED_ERRORS = 1000
+FORMATS = ('csv', 'ndjson')
+
+
+class ChunkRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key field that looks objects up in ``context['related']``."""
+
+    def to_internal_value(self, data):
+        related = self.context.get('related', {}).get(self.field_name)
+        if related is None:
+            return super().to_internal_value(data)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in related:
+            self.fail('does_not_exist', pk_value=data)
+        return related[pk]
+
+
+class PatientImportSerializer(PatientSerializer):
+    assigned_doctor = ChunkRelatedField(queryset=User.objects.all(), required=False, allow_null=True)
+    ward = ChunkRelatedField(queryset=Ward.objects.all(), required=False, allow_null=True)
+
+    RELATED = {'assigned_doctor': User, 'ward': Ward}
+
+
+def detect_format(filename='', content_type=''):
+    name = (filename or '').lower()
+    if name.endswith('.csv') or 'csv' in (content_type or ''):
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl')) or 'ndjson' in (content_type or ''):
+        return 'ndjson'
+    return None
+
+
+def read_rows(stream, file_format):
+    """Yield ``(row_number, data)`` pairs; ``data`` is an error message for unreadable rows."""
+    if isinstance(stream.read(0), bytes):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if file_format == 'csv':
+        for number, row in enumerate(csv.DictReader(stream), start=1):
+            # Empty cells count as "not provided" so optional fields keep their defaults.
+            yield number, {name: value for name, value in row.items() if name and value not in ('', None)}
+    elif file_format == 'ndjson':
+        number = 0
+        for line in stream:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield number, f'Invalid JSON: {exc}'
+                continue
+            yield number, row if isinstance(row, dict) else 'Each line must be a JSON object'
+    else:
+        raise ValueError(f'Unknown import format {file_format!r}; expected one of {FORMATS}')
+
+
+class PatientImporter:
+    """Validate and insert patient rows chunk by chunk."""
+
+    def __init__(self, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False, max_errors=MAX_REPORTED_ERRORS):
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.max_errors = max_errors
+        self.serializer = PatientImportSerializer(context={'related': {}})
+        self.insert = retry_on_locked(Patient.objects.bulk_create)
+
+    def run(self, rows, progress=None):
+        """Import ``(row_number, data)`` pairs and return a summary.
+
+        ``progress`` is called with the running summary after every chunk.
+        """
+        started = time.perf_counter()
+        result = {
+            'total': 0,
+            'created': 0,
+            'failed': 0,
+            'errors': [],
+            'errors_truncated': False,
+            'dry_run': self.dry_run,
+        }
+        rows = iter(rows)
+        while chunk := list(islice(rows, self.chunk_size)):
+            patients = self.validate_chunk(chunk, result)
+            if patients and not self.dry_run:
+                created = self.insert(patients, batch_size=self.chunk_size)
+                result['created'] += len(created)
+                patients_imported.send(sender=Patient, patients=created)
+            elif patients:
+                result['created'] += len(patients)
+            result['total'] += len(chunk)
+            self.finish(result, started)
+            if progress is not None:
+                progress(result)
+
+        if result['created'] and not self.dry_run:
+            invalidate_models(Patient)
+        return self.finish(result, started)
+
+    def validate_chunk(self, chunk, result):
+        self.serializer.context['related'] = {
+            name: model.objects.in_bulk(self.related_ids(chunk, name))
+            for name, model in PatientImportSerializer.RELATED.items()
+        }
+        patients = []
+        for number, data in chunk:
+            if not isinstance(data, dict):
+                self.report(result, number, {'non_field_errors': [data]})
+                continue
+            try:
+                patients.append(Patient(**self.serializer.run_validation(data)))
+            except serializers.ValidationError as exc:
+                self.report(result, number, exc.detail)
+        return patients
+
+    def related_ids(self, chunk, name):
+        ids = set()
+        for _, data in chunk:
+            try:
+                ids.add(int(data[name]))
+            except (TypeError, ValueError, KeyError):
+                pass
+        return ids
+
+    def report(self, result, number, detail):
+        result['failed'] += 1
+        if len(result['errors']) < self.max_errors:
+            result['errors'].append({'row': number, 'errors': detail})
+        else:
+            result['errors_truncated'] = True
+
+    def finish(self, result, started):
+        elapsed = time.perf_counter() - started
+        result['elapsed_seconds'] = round(elapsed, 2)
+        result['rows_per_second'] = round(result['total'] / elapsed) if elapsed else None
+        return result
@@ -0,0 +1,71 @@
+"""
+Import a patient roster from CSV or NDJSON.
+
+    python manage.py import_patients roster.csv
+    python manage.py import_patients roster.ndjson --dry-run --errors rejected.ndjson
+    cat roster.ndjson | python manage.py import_patients - --format ndjson
+"""
+
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from patients.importers import (
+    FORMATS, IMPORT_CHUNK_SIZE, MAX_REPORTED_ERRORS, PatientImporter, detect_format, read_rows,
+)
+
+
+class Command(BaseCommand):
+    help = 'Bulk import patients from a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for standard input")
+        parser.add_argument('--format', choices=FORMATS,
+                            help='File format (default: from the file extension)')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE,
+                            help=f'Rows validated and inserted per transaction (default: {IMPORT_CHUNK_SIZE})')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only; insert nothing')
+        parser.add_argument('--max-errors', type=int, default=MAX_REPORTED_ERRORS,
+                            help=f'Row errors to keep for the report (default: {MAX_REPORTED_ERRORS})')
+        parser.add_argument('--errors', metavar='PATH',
+                            help='Write the row errors to this file as NDJSON')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or detect_format(path)
+        if file_format is None:
+            raise CommandError('Cannot tell the file format from its name; pass --format')
+
+        importer = PatientImporter(
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'],
+            max_errors=options['max_errors'],
+        )
+        try:
+            stream = sys.stdin if path == '-' else open(path, encoding='utf-8-sig', newline='')
+        except OSError as exc:
+            raise CommandError(str(exc))
+        with stream:
+            result = importer.run(read_rows(stream, file_format), progress=self.progress)
+
+        if options['errors']:
+            with open(options['errors'], 'w') as handle:
+                for error in result['errors']:
+                    handle.write(json.dumps(error) + '\n')
+        for error in result['errors'][:10]:
+            self.stderr.write(f"  row {error['row']}: {json.dumps(error['errors'])}")
+
+        verb = 'validated' if options['dry_run'] else 'imported'
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['created']:,} of {result['total']:,} patients {verb}, {result['failed']:,} rejected "
+            f"in {result['elapsed_seconds']:.1f}s ({result['rows_per_second'] or 0:,} rows/s)"
+        ))
+        if result['errors_truncated']:
+            self.stdout.write(f"Only the first {len(result['errors']):,} row errors were kept")
+
+    def progress(self, result):
+        self.stdout.write(
+            f"  {result['total']:,} rows, {result['created']:,} ok, {result['failed']:,} rejected "
+            f"({result['rows_per_second'] or 0:,} rows/s)"
+        )
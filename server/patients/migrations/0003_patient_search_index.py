@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:12
+
+from django.db import migrations
+
+# FTS5 index for core.search; rowid is the patients primary key.
+CREATE_SQL = (
+    "CREATE VIRTUAL TABLE patients_fts USING fts5("
+    "name, phone, email, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+POPULATE_SQL = 'INSERT INTO patients_fts (rowid, name, phone, email) SELECT id, name, phone, email FROM patients'
+
+
+def create_search_index(apps, schema_editor):
+    # Other databases search with the __icontains fallback.
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(CREATE_SQL)
+        schema_editor.execute(POPULATE_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS patients_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0002_patient_patient_created_at_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
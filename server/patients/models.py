@@ -57,4 +57,11 @@ class Patient(models.Model):
     
     class Meta:
         db_table = 'patients'
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='patient_created_at_idx'),
+            models.Index(fields=['status', 'assigned_doctor'], name='patient_status_doctor_idx'),
+            models.Index(fields=['assigned_doctor', 'created_at'], name='patient_doctor_created_idx'),
+            models.Index(fields=['registration_date'], name='patient_registered_idx'),
+            models.Index(fields=['age'], name='patient_age_idx'),
+        ]
\ No newline at end of file
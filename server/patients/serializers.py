@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from core.projections import Projection
 from .models import Patient
 
 class PatientSerializer(serializers.ModelSerializer):
@@ -18,4 +19,6 @@ class PatientSerializer(serializers.ModelSerializer):
     def validate_phone(self, value):
         if not value.replace('-', '').replace(' ', '').isdigit():
             raise serializers.ValidationError("Phone number must contain only digits, spaces, and hyphens")
-        return value
\ No newline at end of file
+        return value
+
+patient_projection = Projection(PatientSerializer)
@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent after each bulk-imported chunk is inserted, with ``patients`` set to the
+# new instances. ``bulk_create`` skips ``post_save``; listen here instead.
+patients_imported = Signal()
@@ -0,0 +1,123 @@
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from . import autocomplete
+from .autocomplete import PatientPrefixIndex, patient_index
+from .models import Patient
+
+
+def create_patient(name, phone='555-0100', **fields):
+    return Patient.objects.create(
+        name=name, age=40, gender='female', phone=phone,
+        email='patient@example.com', address='1 Test Street', **fields
+    )
+
+
+class AutocompleteTests(TestCase):
+
+    def setUp(self):
+        self.receptionist = User.objects.create_user('receptionist', password='x', role='receptionist')
+        self.client = APIClient()
+        self.client.force_authenticate(self.receptionist)
+        self.linda = create_patient('Linda Wang', phone='(555) 012-3456')
+        self.john = create_patient('John Smith', phone='555-0199')
+        patient_index.build()
+
+    def names(self, query):
+        response = self.client.get('/api/patients/autocomplete/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.json()]
+
+    def test_name_word_and_phone_prefixes(self):
+        self.assertEqual(self.names('lin'), ['Linda Wang'])
+        self.assertEqual(self.names('WANG'), ['Linda Wang'])
+        self.assertEqual(self.names('555 012'), ['Linda Wang'])
+        self.assertEqual(self.names('555'), ['Linda Wang', 'John Smith'])
+        self.assertEqual(self.names('inda'), [])
+
+    def test_rename_and_delete_update_the_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.linda.name = 'Linda Okafor'
+            self.linda.save()
+        self.assertEqual(self.names('okafor'), ['Linda Okafor'])
+        self.assertEqual(self.names('wang'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.john.delete()
+        self.assertEqual(self.names('john'), [])
+
+    def test_doctors_only_find_their_patients(self):
+        doctor = User.objects.create_user('doctor', password='x', role='doctor')
+        self.john.assigned_doctor = doctor
+        self.john.save()
+        self.client.force_authenticate(doctor)
+        self.assertEqual(self.names('555'), ['John Smith'])
+
+    def test_changes_during_a_rebuild_are_replayed(self):
+        index = PatientPrefixIndex()
+        late = create_patient('Zara Late', phone='')
+        Patient.objects.filter(pk=late.pk).delete()
+        keys = autocomplete.patient_keys
+        added = []
+
+        def keys_while_reading(name, phone):
+            # A patient saved by another request after the table was read.
+            if not added:
+                added.append(True)
+                index.add(late.pk, 'Zara Late', '')
+            return keys(name, phone)
+
+        with mock.patch.object(autocomplete, 'patient_keys', keys_while_reading):
+            index.build()
+        self.assertEqual(index.candidates('zara', 10), [late.pk])
+        self.assertEqual(index.candidates('linda', 10), [self.linda.pk])
+
+
+class ImportTests(TestCase):
+
+    ROSTER = (
+        'name,age,gender,phone,email,address\n'
+        'Ada Lovelace,36,Female,555-0101,ada@example.com,1 Analytical Row\n'
+        'Bad Row,not-a-number,Female,555-0102,bad@example.com,2 Error Street\n'
+        'Alan Turing,41,Male,555-0103,alan@example.com,3 Machine Lane\n'
+    )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('receptionist', password='x', role='receptionist'))
+
+    def upload(self, content, name='roster.csv', content_type='text/csv', **data):
+        return self.client.post('/api/patients/import/', {
+            'file': SimpleUploadedFile(name, content.encode(), content_type=content_type), **data,
+        }, format='multipart')
+
+    def test_bad_row_is_reported_and_the_rest_imported(self):
+        response = self.upload(self.ROSTER)
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual((data['created'], data['failed']), (2, 1))
+        self.assertEqual(data['errors'][0]['row'], 2)
+        self.assertIn('age', data['errors'][0]['errors'])
+        self.assertEqual(
+            sorted(Patient.objects.values_list('name', flat=True)), ['Ada Lovelace', 'Alan Turing']
+        )
+
+    def test_dry_run_and_ndjson(self):
+        rows = '{"name": "Grace Hopper", "age": 85, "gender": "Female", "phone": "555-0104", ' \
+               '"email": "grace@example.com", "address": "4 Compiler Court"}\n'
+        response = self.upload(rows, 'roster.ndjson', 'application/x-ndjson', dry_run='true')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 1)
+        self.assertFalse(Patient.objects.exists())
+
+        self.assertEqual(self.upload(rows, 'roster.ndjson', 'application/x-ndjson').status_code, 201)
+        self.assertTrue(Patient.objects.filter(name='Grace Hopper').exists())
+
+    def test_only_invalid_rows(self):
+        response = self.upload('name,age\nNobody,\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['created'], 0)
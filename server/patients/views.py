@@ -1,31 +1,35 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q, Count
+from django.db import transaction
+from django.db.models import Count
 from django.utils import timezone
 from datetime import datetime, timedelta
+from core.cache import cached_action
+from core.exports import ExportMixin
+from core.replica import use_replica
+from core.search import SEARCH_INDEXES
+from .autocomplete import autocomplete, autocomplete_settings
+from .importers import FORMATS, PatientImporter, detect_format, read_rows
 from .models import Patient
-from .serializers import PatientSerializer
+from .serializers import PatientSerializer, patient_projection
 
-class PatientViewSet(viewsets.ModelViewSet):
+class PatientViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = Patient.objects.all()
     serializer_class = PatientSerializer
+    list_projection = patient_projection
     
     def get_queryset(self):
-        queryset = Patient.objects.all()
+        queryset = Patient.objects.select_related('assigned_doctor', 'ward').all()
         
         # Filter patients for doctors - only show assigned patients
         if hasattr(self.request.user, 'role') and self.request.user.role == 'doctor':
             queryset = queryset.filter(assigned_doctor=self.request.user)
         
-        # Search functionality
+        # Search functionality (full-text, best matches first)
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) |
-                Q(phone__icontains=search) |
-                Q(email__icontains=search)
-            )
+            queryset = SEARCH_INDEXES['patients'].filter(queryset, search)
         
         # Filter by status
         status_filter = self.request.query_params.get('status', None)
@@ -51,33 +55,31 @@ class PatientViewSet(viewsets.ModelViewSet):
     def my_patients(self, request):
         """Get patients assigned to the current doctor"""
         if hasattr(request.user, 'role') and request.user.role == 'doctor':
-            patients = Patient.objects.filter(assigned_doctor=request.user)
-            serializer = self.get_serializer(patients, many=True)
-            return Response(serializer.data)
+            patients = Patient.objects.filter(assigned_doctor=request.user).select_related('assigned_doctor', 'ward')
+            return self.list_response(patients)
         return Response({'error': 'Only doctors can access this endpoint'}, status=403)
     
     @action(detail=False, methods=['get'])
     def admitted(self, request):
         """Get all admitted patients"""
-        patients = Patient.objects.filter(status='admitted')
-        serializer = self.get_serializer(patients, many=True)
-        return Response(serializer.data)
+        patients = Patient.objects.filter(status='admitted').select_related('assigned_doctor', 'ward')
+        return self.list_response(patients)
     
     @action(detail=False, methods=['get'])
     def outpatients(self, request):
         """Get all outpatients"""
-        patients = Patient.objects.filter(status='outpatient')
-        serializer = self.get_serializer(patients, many=True)
-        return Response(serializer.data)
+        patients = Patient.objects.filter(status='outpatient').select_related('assigned_doctor', 'ward')
+        return self.list_response(patients)
     
     @action(detail=False, methods=['get'])
     def discharged(self, request):
         """Get all discharged patients"""
-        patients = Patient.objects.filter(status='discharged')
-        serializer = self.get_serializer(patients, many=True)
-        return Response(serializer.data)
+        patients = Patient.objects.filter(status='discharged').select_related('assigned_doctor', 'ward')
+        return self.list_response(patients)
     
     @action(detail=False, methods=['get'])
+    @cached_action(depends_on=['patients.Patient'])
+    @use_replica
     def analytics(self, request):
         """Get patient analytics"""
         total_patients = Patient.objects.count()
@@ -111,6 +113,7 @@ class PatientViewSet(viewsets.ModelViewSet):
         })
     
     @action(detail=True, methods=['post'])
+    @transaction.atomic
     def admit(self, request, pk=None):
         """Admit a patient to a ward"""
         patient = self.get_object()
@@ -126,7 +129,7 @@ class PatientViewSet(viewsets.ModelViewSet):
         # Check if bed is available
         from wards.models import Bed
         try:
-            bed = Bed.objects.get(ward_id=ward_id, number=bed_number, status='available')
+            bed = Bed.objects.select_for_update().get(ward_id=ward_id, number=bed_number, status='available')
         except Bed.DoesNotExist:
             return Response(
                 {'error': 'Bed is not available'}, 
@@ -150,6 +153,7 @@ class PatientViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
     @action(detail=True, methods=['post'])
+    @transaction.atomic
     def discharge(self, request, pk=None):
         """Discharge a patient"""
         patient = self.get_object()
@@ -158,7 +162,7 @@ class PatientViewSet(viewsets.ModelViewSet):
         if patient.status == 'admitted' and patient.bed_number:
             from wards.models import Bed
             try:
-                bed = Bed.objects.get(ward=patient.ward, number=patient.bed_number)
+                bed = Bed.objects.select_for_update().get(ward=patient.ward, number=patient.bed_number)
                 bed.status = 'available'
                 bed.patient = None
                 bed.admission_date = None
@@ -185,9 +189,9 @@ class PatientViewSet(viewsets.ModelViewSet):
         from medical_records.models import MedicalRecord, Prescription, LabTest
         from medical_records.serializers import MedicalRecordSerializer, PrescriptionSerializer, LabTestSerializer
         
-        medical_records = MedicalRecord.objects.filter(patient=patient).order_by('-date')
-        prescriptions = Prescription.objects.filter(patient=patient).order_by('-date')
-        lab_tests = LabTest.objects.filter(patient=patient).order_by('-ordered_date')
+        medical_records = MedicalRecord.objects.filter(patient=patient).select_related('patient', 'doctor').order_by('-date')
+        prescriptions = Prescription.objects.filter(patient=patient).select_related('patient', 'doctor').order_by('-date')
+        lab_tests = LabTest.objects.filter(patient=patient).select_related('patient', 'ordered_by').order_by('-ordered_date')
         
         return Response({
             'patient': self.get_serializer(patient).data,
@@ -204,7 +208,9 @@ class PatientViewSet(viewsets.ModelViewSet):
         from appointments.models import Appointment
         from appointments.serializers import AppointmentSerializer
         
-        appointments = Appointment.objects.filter(patient=patient).order_by('-date', '-time')
+        appointments = Appointment.objects.filter(patient=patient).select_related(
+            'patient', 'doctor', 'created_by'
+        ).order_by('-date', '-time')
         
         return Response({
             'patient': self.get_serializer(patient).data,
@@ -219,17 +225,33 @@ class PatientViewSet(viewsets.ModelViewSet):
         from billing.models import Bill
         from billing.serializers import BillSerializer
         
-        bills = Bill.objects.filter(patient=patient).order_by('-date')
+        bills = Bill.objects.filter(patient=patient).select_related(
+            'patient', 'created_by'
+        ).prefetch_related('payments__processed_by').order_by('-date')
         
         return Response({
             'patient': self.get_serializer(patient).data,
             'bills': BillSerializer(bills, many=True).data
         })
     
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """Typeahead lookup of patients by name or phone prefix"""
+        config = autocomplete_settings()
+        query = request.query_params.get('q', '').strip()
+        try:
+            limit = int(request.query_params.get('limit', config['LIMIT']))
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, config['MAX_LIMIT']))
+        if not query:
+            return Response([])
+        return Response(autocomplete(request.user, query, limit))
+    
     @action(detail=False, methods=['get'])
     def search_advanced(self, request):
         """Advanced patient search with multiple criteria"""
-        queryset = Patient.objects.all()
+        queryset = Patient.objects.select_related('assigned_doctor', 'ward').all()
         
         # Multiple search criteria
         name = request.query_params.get('name', None)
@@ -252,5 +274,32 @@ class PatientViewSet(viewsets.ModelViewSet):
         if status:
             queryset = queryset.filter(status=status)
         
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return self.list_response(queryset)
+    
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        """Import patients from an uploaded CSV or NDJSON file"""
+        if request.user.role not in ('admin', 'receptionist'):
+            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Upload the roster as a "file" field'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        file_format = request.data.get('file_format') or detect_format(upload.name, upload.content_type)
+        if file_format not in FORMATS:
+            return Response(
+                {'error': f'Unsupported file format; use one of: {", ".join(FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        result = PatientImporter(dry_run=dry_run).run(read_rows(upload, file_format))
+        
+        if result['created'] and not dry_run:
+            response_status = status.HTTP_201_CREATED
+        elif result['failed'] and not result['created']:
+            response_status = status.HTTP_400_BAD_REQUEST
+        else:
+            response_status = status.HTTP_200_OK
+        return Response(result, status=response_status)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0002_patient_patient_created_at_idx_and_more'),
+        ('visitors', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='visitor',
+            index=models.Index(fields=['status', 'checkInTime'], name='visitor_status_checkin_idx'),
+        ),
+    ]
@@ -22,5 +22,10 @@ class Visitor(models.Model):
     checkInTime = models.DateTimeField(default=timezone.now)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='visiting')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'checkInTime'], name='visitor_status_checkin_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} visiting {self.patient.name} - {self.status}"
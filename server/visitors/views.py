@@ -4,11 +4,12 @@ from django.shortcuts import render
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from core.exports import ExportMixin
 from .models import Visitor
 from .serializers import VisitorSerializer
 
-class VisitorViewSet(viewsets.ModelViewSet):
-    queryset = Visitor.objects.all()
+class VisitorViewSet(ExportMixin, viewsets.ModelViewSet):
+    queryset = Visitor.objects.select_related('patient').all()
     serializer_class = VisitorSerializer
 
     def list(self, request, *args, **kwargs):
@@ -3,4 +3,13 @@ from django.apps import AppConfig
 
 class WardsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'wards'
\ No newline at end of file
+    name = 'wards'
+
+    def ready(self):
+        from .bedmap import connect_signals as connect_bed_map_signals
+        from .counters import connect_signals as connect_counter_signals
+        from .history import connect_signals as connect_history_signals
+
+        connect_counter_signals()
+        connect_history_signals()
+        connect_bed_map_signals()
@@ -0,0 +1,86 @@
+"""
+Compact, versioned bed map for bed boards.
+
+``GET /api/wards/bed_map/`` returns every ward's beds as parallel arrays
+(ids, numbers, status codes, patient ids) instead of one nested object per
+bed, together with the map's ``version``. A board then polls with
+``?since=<version>`` and receives only the beds saved after that version,
+usually none, answered from ``bed_version_idx`` in one short query.
+
+Beds are identified by id: a bed in a delta replaces the board's copy, even
+if it is now listed under another ward. Deleted beds, ward edits and bulk
+writes cannot be sent as a delta; they move ``BedMapVersion.reset_version``
+and any board behind it is sent the full map (``"mode": "full"``) again.
+"""
+
+from django.db import router, transaction
+from django.db.models.signals import post_delete, post_save
+
+from .models import Bed, BedMapVersion, Ward
+
+# Status codes used in the map: the position in this list.
+STATUSES = [status for status, _ in Bed.STATUS_CHOICES]
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+
+WARD_FIELDS = ('id', 'name', 'department', 'floor', 'status')
+
+
+def reset_bed_map(using=None):
+    """Send every board the full map next time, e.g. after a bulk write to beds."""
+    using = using or router.db_for_write(Bed)
+    with transaction.atomic(using=using):
+        BedMapVersion.advance(using, reset=True)
+
+
+def _columns():
+    return {'ids': [], 'numbers': [], 'status': [], 'patients': []}
+
+
+def bed_map(since=None, using=None):
+    """The full map, or the beds changed after version ``since``."""
+    using = using or router.db_for_read(Bed)
+    # One read transaction, so the version and the beds are one snapshot.
+    with transaction.atomic(using=using):
+        version, reset_version = BedMapVersion.current(using)
+        full = since is None or since < reset_version or since > version
+
+        beds = Bed.objects.using(using).order_by('ward_id', 'number')
+        if full:
+            wards = {
+                ward['id']: {**ward, 'beds': _columns()}
+                for ward in Ward.objects.using(using).order_by('name').values(*WARD_FIELDS)
+            }
+        else:
+            wards = {}
+            beds = beds.filter(version__gt=since) if since < version else beds.none()
+
+        for ward_id, pk, number, status, patient_id in beds.values_list(
+            'ward_id', 'id', 'number', 'status', 'patient_id'
+        ):
+            if ward_id not in wards:
+                wards[ward_id] = {'id': ward_id, 'beds': _columns()}
+            columns = wards[ward_id]['beds']
+            columns['ids'].append(pk)
+            columns['numbers'].append(number)
+            columns['status'].append(STATUS_CODES.get(status))
+            columns['patients'].append(patient_id)
+
+    data = {'version': version, 'mode': 'full' if full else 'delta'}
+    if not full:
+        data['since'] = since
+    data['statuses'] = STATUSES
+    data['wards'] = list(wards.values())
+    return data
+
+
+# Signals. Bed saves take their version in ``Bed.save``.
+
+def _reset(sender, using, raw=False, **kwargs):
+    if not raw:
+        reset_bed_map(using)
+
+
+def connect_signals():
+    post_delete.connect(_reset, sender=Bed, dispatch_uid='wards.bedmap.bed_deleted')
+    post_save.connect(_reset, sender=Ward, dispatch_uid='wards.bedmap.ward_saved')
+    post_delete.connect(_reset, sender=Ward, dispatch_uid='wards.bedmap.ward_deleted')
@@ -0,0 +1,116 @@
+"""
+Per-status bed counters stored on ``Ward``.
+
+``Ward.available_count``, ``occupied_count``, ``maintenance_count`` and
+``cleaning_count`` hold how many of the ward's beds are in each status, so
+ward lists, occupancy stats and dashboards read four columns instead of
+running a ``COUNT`` per ward and status.
+
+Saving or deleting a ``Bed`` moves the counters with one
+``UPDATE wards SET old = old - 1, new = new + 1`` built from ``F()``
+expressions, in the bed write's transaction. The bed's previous ward and
+status come from ``Bed.stored_state``, read with the row locked rather than
+taken from the instance, so two requests changing the same bed cannot count
+the same change twice.
+
+``bulk_create``, ``QuerySet.update`` and raw SQL send no signals: call
+``beds_created`` after a bulk insert of beds, and repair anything else with
+``python manage.py reconcile_ward_counters``.
+"""
+
+from collections import Counter, defaultdict
+
+from django.db import router
+from django.db.models import Count, F
+from django.db.models.signals import post_delete, post_save, pre_delete
+
+from .models import Bed, Ward
+
+COUNTER_FIELDS = {status: f'{status}_count' for status, _ in Bed.STATUS_CHOICES}
+
+
+def adjust(ward_id, changes, using):
+    """Add ``{status: delta}`` to one ward's counters in a single UPDATE."""
+    updates = {
+        COUNTER_FIELDS[status]: F(COUNTER_FIELDS[status]) + delta
+        for status, delta in changes.items()
+        if delta and status in COUNTER_FIELDS
+    }
+    if ward_id is not None and updates:
+        Ward.objects.using(using).filter(pk=ward_id).update(**updates)
+
+
+def beds_created(beds, using=None):
+    """Count ``beds`` inserted without signals, e.g. by ``bulk_create``."""
+    using = using or router.db_for_write(Bed)
+    by_ward = defaultdict(Counter)
+    for bed in beds:
+        by_ward[bed.ward_id][bed.status] += 1
+    for ward_id, changes in by_ward.items():
+        adjust(ward_id, changes, using)
+
+
+def actual_counts(using):
+    """``{ward id: {counter field: beds}}`` counted from the beds table."""
+    counts = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS.values(), 0))
+    rows = Bed.objects.using(using).order_by().values('ward_id', 'status').annotate(beds=Count('pk'))
+    for row in rows:
+        field = COUNTER_FIELDS.get(row['status'])
+        if field:
+            counts[row['ward_id']][field] = row['beds']
+    return counts
+
+
+def reconcile(using, dry_run=False):
+    """Reset counters that differ from the beds table.
+
+    Returns ``(ward, field, stored, actual)`` for every difference found.
+    Call inside a transaction so beds cannot change between the count and
+    the fix.
+    """
+    counts = actual_counts(using)
+    drift = []
+    for ward in Ward.objects.using(using).only('name', *COUNTER_FIELDS.values()):
+        actual = counts[ward.pk]
+        changed = {field: value for field, value in actual.items() if getattr(ward, field) != value}
+        drift.extend((ward, field, getattr(ward, field), value) for field, value in changed.items())
+        if changed and not dry_run:
+            Ward.objects.using(using).filter(pk=ward.pk).update(**changed)
+    return drift
+
+
+# Signals. ``Bed.save``/``Bed.delete`` open the transaction these run in,
+# and ``Bed.save`` sets ``_stored_state`` when the ward or status may change.
+
+def _saved(sender, instance, using, raw=False, **kwargs):
+    if raw or '_stored_state' not in instance.__dict__:
+        return
+    stored = instance._stored_state
+    previous = None if stored is None else (stored['ward_id'], stored['status'])
+    current = (instance.ward_id, instance.status)
+    if previous == current:
+        return
+    if previous is not None and previous[0] != current[0]:
+        adjust(previous[0], {previous[1]: -1}, using)
+        adjust(current[0], {current[1]: 1}, using)
+    else:
+        changes = Counter({current[1]: 1})
+        if previous is not None:
+            changes[previous[1]] -= 1
+        adjust(current[0], changes, using)
+
+
+def _before_delete(sender, instance, using, **kwargs):
+    instance._stored_state = instance.stored_state(using)
+
+
+def _deleted(sender, instance, using, **kwargs):
+    stored = instance.__dict__.get('_stored_state')
+    if stored is not None:
+        adjust(stored['ward_id'], {stored['status']: -1}, using)
+
+
+def connect_signals():
+    post_save.connect(_saved, sender=Bed, dispatch_uid='wards.counters.saved')
+    pre_delete.connect(_before_delete, sender=Bed, dispatch_uid='wards.counters.before_delete')
+    post_delete.connect(_deleted, sender=Bed, dispatch_uid='wards.counters.deleted')
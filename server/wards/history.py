@@ -0,0 +1,166 @@
+"""
+Bed status history and the questions it answers.
+
+Every change of a bed's status or patient appends a ``BedTransition`` row
+for the interval that just ended: ``status`` (and ``patient``) from
+``started_at`` until ``ended_at``. The open interval is the bed's own
+``status`` and ``status_since``. Admit, discharge, assign and status
+changes all save the bed, so they are recorded by the ``post_save`` handler
+here; deleting a bed closes its last interval with an empty ``next_status``.
+
+From these intervals the database answers:
+
+* ``occupancy_at``: beds per ward and status at any past moment, i.e.
+  closed intervals containing the moment plus beds in their current state
+  since before it;
+* ``length_of_stay``: how long beds stayed occupied, as counts per duration
+  bucket, for occupied intervals that ended in a date range.
+
+History starts when the ``bed_transitions`` table was created; earlier
+moments only see beds that have not changed since.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import router
+from django.db.models import Avg, Count, Max, Min, Q
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .models import Bed, BedTransition, Ward
+
+STATUSES = [status for status, _ in Bed.STATUS_CHOICES]
+
+# (label, lower bound, upper bound) of the length-of-stay buckets.
+STAY_BUCKETS = [
+    ('under_1_day', None, timedelta(days=1)),
+    ('1_to_3_days', timedelta(days=1), timedelta(days=3)),
+    ('3_to_7_days', timedelta(days=3), timedelta(days=7)),
+    ('7_to_14_days', timedelta(days=7), timedelta(days=14)),
+    ('14_to_30_days', timedelta(days=14), timedelta(days=30)),
+    ('30_days_or_more', timedelta(days=30), None),
+]
+
+
+def _ward_filter(ward_ids=None, department=None, prefix=''):
+    condition = Q()
+    if ward_ids:
+        condition &= Q(**{f'{prefix}ward_id__in': ward_ids})
+    if department:
+        condition &= Q(**{f'{prefix}ward__department__icontains': department})
+    return condition
+
+
+def occupancy_at(at, using=None, ward_ids=None, department=None):
+    """Beds per ward and status at the aware datetime ``at``."""
+    using = using or router.db_for_read(BedTransition)
+    counts = defaultdict(lambda: dict.fromkeys(STATUSES, 0))
+    closed = (
+        BedTransition.objects.using(using)
+        .filter(_ward_filter(ward_ids, department), status__in=STATUSES, ended_at__gt=at, started_at__lte=at)
+        .order_by()
+        .values('ward_id', 'status')
+        .annotate(beds=Count('id'))
+    )
+    current = (
+        Bed.objects.using(using)
+        .filter(_ward_filter(ward_ids, department), status__in=STATUSES, status_since__lte=at)
+        .order_by()
+        .values('ward_id', 'status')
+        .annotate(beds=Count('id'))
+    )
+    for row in [*closed, *current]:
+        counts[row['ward_id']][row['status']] += row['beds']
+
+    wards = Ward.objects.using(using).filter(pk__in=counts).values('id', 'name', 'department')
+    rows = []
+    for ward in wards:
+        by_status = counts[ward['id']]
+        rows.append({**ward, **by_status, 'total': sum(by_status.values())})
+    totals = {status: sum(row[status] for row in rows) for status in STATUSES}
+    total = sum(totals.values())
+    return {
+        'at': at,
+        'wards': rows,
+        'totals': {**totals, 'total': total},
+        'occupancy_rate': round(totals['occupied'] / total * 100, 1) if total else 0,
+    }
+
+
+def _days(duration):
+    return round(duration.total_seconds() / 86400, 2) if duration is not None else None
+
+
+def length_of_stay(start, end, using=None, ward_ids=None, department=None):
+    """Occupied intervals that ended in ``[start, end)``, bucketed by duration."""
+    using = using or router.db_for_read(BedTransition)
+    stays = (
+        BedTransition.objects.using(using)
+        .filter(_ward_filter(ward_ids, department), status='occupied', ended_at__gte=start, ended_at__lt=end)
+    )
+    buckets = {}
+    for label, lower, upper in STAY_BUCKETS:
+        condition = Q()
+        if lower is not None:
+            condition &= Q(duration__gte=lower)
+        if upper is not None:
+            condition &= Q(duration__lt=upper)
+        buckets[label] = Count('id', filter=condition)
+    summary = stays.aggregate(
+        stays=Count('id'), average=Avg('duration'), shortest=Min('duration'), longest=Max('duration'), **buckets
+    )
+    by_department = (
+        stays.order_by('ward__department')
+        .values('ward__department')
+        .annotate(stays=Count('id'), average=Avg('duration'))
+    )
+    return {
+        'start': start,
+        'end': end,
+        'stays': summary['stays'],
+        'average_days': _days(summary['average']),
+        'shortest_days': _days(summary['shortest']),
+        'longest_days': _days(summary['longest']),
+        'distribution': [{'bucket': label, 'stays': summary[label]} for label, _, _ in STAY_BUCKETS],
+        'by_department': [
+            {'department': row['ward__department'], 'stays': row['stays'], 'average_days': _days(row['average'])}
+            for row in by_department
+        ],
+    }
+
+
+# Signals. ``Bed.save`` sets ``_stored_state`` and the new ``status_since``;
+# ``wards.counters`` loads it before a delete.
+
+def _record(stored, bed, next_status, ended_at, using):
+    BedTransition.objects.using(using).create(
+        bed_id=bed.pk,
+        ward_id=stored['ward_id'],
+        patient_id=stored['patient_id'],
+        status=stored['status'],
+        next_status=next_status,
+        started_at=stored['status_since'],
+        ended_at=ended_at,
+        duration=ended_at - stored['status_since'],
+    )
+
+
+def _saved(sender, instance, using, raw=False, **kwargs):
+    if raw or '_stored_state' not in instance.__dict__:
+        return
+    stored = instance._stored_state
+    if stored is None or (stored['status'], stored['patient_id']) == (instance.status, instance.patient_id):
+        return
+    _record(stored, instance, instance.status, instance.status_since, using)
+
+
+def _deleted(sender, instance, using, **kwargs):
+    stored = instance.__dict__.get('_stored_state')
+    if stored is not None:
+        _record(stored, instance, '', timezone.now(), using)
+
+
+def connect_signals():
+    post_save.connect(_saved, sender=Bed, dispatch_uid='wards.history.saved')
+    post_delete.connect(_deleted, sender=Bed, dispatch_uid='wards.history.deleted')
@@ -0,0 +1,39 @@
+"""
+Check the per-status bed counters on each ward against the beds table.
+
+    python manage.py reconcile_ward_counters
+    python manage.py reconcile_ward_counters --dry-run
+
+Counters drift only when beds are written around model signals
+(``bulk_create`` without ``wards.counters.beds_created``, ``QuerySet.update``,
+raw SQL, restoring a database copy). Every difference is reported and, unless
+``--dry-run`` is given, the counter is reset to the counted value.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from wards.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recount beds per ward and status and fix drifted ward counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report differences without fixing them')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        with transaction.atomic(using=options['database']):
+            drift = reconcile(options['database'], dry_run=dry_run)
+
+        for ward, field, stored, actual in drift:
+            self.stdout.write(f'{ward.name} (#{ward.pk}): {field} {stored} -> {actual}')
+        wards = len({ward.pk for ward, *_ in drift})
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('All ward counters match their beds'))
+        elif dry_run:
+            self.stdout.write(self.style.WARNING(f'{len(drift)} counters on {wards} wards differ (dry run, nothing changed)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {len(drift)} counters on {wards} wards'))
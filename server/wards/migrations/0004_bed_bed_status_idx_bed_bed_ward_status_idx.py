@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0002_patient_patient_created_at_idx_and_more'),
+        ('wards', '0003_alter_bed_options_alter_ward_options'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bed',
+            index=models.Index(fields=['status'], name='bed_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bed',
+            index=models.Index(fields=['ward', 'status'], name='bed_ward_status_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:05
+
+from django.db import migrations, models
+from django.db.models import Count
+
+STATUSES = ['available', 'occupied', 'maintenance', 'cleaning']
+
+
+def count_beds(apps, schema_editor):
+    Ward = apps.get_model('wards', 'Ward')
+    Bed = apps.get_model('wards', 'Bed')
+    using = schema_editor.connection.alias
+    counts = {}
+    rows = Bed.objects.using(using).order_by().values('ward_id', 'status').annotate(beds=Count('pk'))
+    for row in rows:
+        if row['status'] in STATUSES:
+            counts.setdefault(row['ward_id'], {})[f"{row['status']}_count"] = row['beds']
+    for ward_id, fields in counts.items():
+        Ward.objects.using(using).filter(pk=ward_id).update(**fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wards', '0004_bed_bed_status_idx_bed_bed_ward_status_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ward',
+            name='available_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='ward',
+            name='cleaning_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='ward',
+            name='maintenance_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='ward',
+            name='occupied_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_beds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:39
+
+from django.db import migrations, models
+
+
+def create_version_row(apps, schema_editor):
+    BedMapVersion = apps.get_model('wards', 'BedMapVersion')
+    BedMapVersion.objects.using(schema_editor.connection.alias).get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0003_patient_search_index'),
+        ('wards', '0005_ward_bed_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BedMapVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+                ('reset_version', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'bed_map_version',
+            },
+        ),
+        migrations.AddField(
+            model_name='bed',
+            name='version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='bed',
+            index=models.Index(fields=['version'], name='bed_version_idx'),
+        ),
+        migrations.RunPython(create_version_row, migrations.RunPython.noop),
+    ]
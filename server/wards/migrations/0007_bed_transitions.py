@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:44
+
+import django.db.models.deletion
+import django.utils.timezone
+from datetime import datetime, time
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_status_since(apps, schema_editor):
+    # Occupied beds have been occupied since their admission day; every
+    # other bed starts its history now.
+    Bed = apps.get_model('wards', 'Bed')
+    beds = Bed.objects.using(schema_editor.connection.alias)
+    days = beds.filter(status='occupied', admission_date__isnull=False).values_list('admission_date', flat=True).distinct()
+    for day in days:
+        since = timezone.make_aware(datetime.combine(day, time.min))
+        beds.filter(status='occupied', admission_date=day).update(status_since=since)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0003_patient_search_index'),
+        ('wards', '0006_bed_map_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bed',
+            name='status_since',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.CreateModel(
+            name='BedTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('available', 'Available'), ('occupied', 'Occupied'), ('maintenance', 'Maintenance'), ('cleaning', 'Cleaning')], max_length=20)),
+                ('next_status', models.CharField(blank=True, max_length=20)),
+                ('started_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField()),
+                ('duration', models.DurationField()),
+                ('bed', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='transitions', to='wards.bed')),
+                ('patient', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='patients.patient')),
+                ('ward', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='wards.ward')),
+            ],
+            options={
+                'db_table': 'bed_transitions',
+                'ordering': ['-ended_at'],
+                'indexes': [models.Index(fields=['status', 'ended_at', 'started_at', 'ward', 'duration'], name='bed_transition_interval_idx'), models.Index(fields=['bed', 'ended_at'], name='bed_transition_bed_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_status_since, migrations.RunPython.noop),
+    ]
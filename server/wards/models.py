@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import F
+from django.utils import timezone
 
 class Ward(models.Model):
     name = models.CharField(max_length=100)
@@ -8,16 +10,21 @@ class Ward(models.Model):
     nurse_in_charge = models.CharField(max_length=100)
     status = models.CharField(max_length=20, default='active')
     description = models.TextField(blank=True)
+    # Beds in each status, kept in step by wards.counters.
+    available_count = models.IntegerField(default=0, editable=False)
+    occupied_count = models.IntegerField(default=0, editable=False)
+    maintenance_count = models.IntegerField(default=0, editable=False)
+    cleaning_count = models.IntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     @property
     def occupied_beds(self):
-        return self.beds.filter(status='occupied').count()
+        return self.occupied_count
     
     @property
     def available_beds(self):
-        return self.beds.filter(status='available').count()
+        return self.available_count
     
     @property
     def occupancy_percentage(self):
@@ -32,6 +39,38 @@ class Ward(models.Model):
         db_table = 'wards'
         ordering = ['name']
 
+class BedMapVersion(models.Model):
+    """Version of the hospital bed map, kept in a single row.
+
+    Every bed save takes the next version, so ``GET /api/wards/bed_map/``
+    can send only the beds changed since a client's version. Changes a
+    delta cannot describe (deleted beds, ward edits, bulk writes) also move
+    ``reset_version``; clients behind it get the full map instead.
+    """
+    version = models.BigIntegerField(default=0)
+    reset_version = models.BigIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'bed_map_version'
+    
+    @classmethod
+    def advance(cls, using, reset=False):
+        """Take the next version. The row stays locked until the transaction ends,
+        so versions are committed in order."""
+        changes = {'version': F('version') + 1}
+        if reset:
+            changes['reset_version'] = F('version') + 1
+        rows = cls.objects.using(using).filter(pk=1)
+        if not rows.update(**changes):
+            cls.objects.using(using).get_or_create(pk=1)
+            rows.update(**changes)
+        return rows.values_list('version', flat=True).get()
+    
+    @classmethod
+    def current(cls, using):
+        """``(version, reset_version)``."""
+        return cls.objects.using(using).filter(pk=1).values_list('version', 'reset_version').first() or (0, 0)
+
 class Bed(models.Model):
     STATUS_CHOICES = [
         ('available', 'Available'),
@@ -45,17 +84,102 @@ class Bed(models.Model):
     patient = models.ForeignKey('patients.Patient', on_delete=models.SET_NULL, null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='available')
     admission_date = models.DateField(null=True, blank=True)
+    # When the bed took its current status and occupant (see BedTransition).
+    status_since = models.DateTimeField(default=timezone.now, editable=False)
+    # BedMapVersion.version of the last save that changed the bed map.
+    version = models.BigIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Fields shown on the bed map; saving any of them takes a new version.
+    MAP_FIELDS = {'ward', 'ward_id', 'number', 'status', 'patient', 'patient_id'}
+    
     @property
     def patient_name(self):
         return self.patient.name if self.patient else None
     
+    def stored_state(self, using):
+        """The bed's row as stored, locked until the transaction ends, or None."""
+        if self.pk is None:
+            return None
+        return (
+            Bed.objects.using(using)
+            .select_for_update()
+            .filter(pk=self.pk)
+            .values('ward_id', 'status', 'patient_id', 'status_since')
+            .first()
+        )
+    
+    # The ward counters and transition history are updated by signals from
+    # ``_stored_state``; saving and deleting run in a transaction so a bed,
+    # its ward's counters, its history and the bed map version change together.
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(Bed, instance=self)
+        with transaction.atomic(using=using):
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None or self.MAP_FIELDS & set(update_fields):
+                self._stored_state = stored = self.stored_state(using)
+                if stored is None or (stored['status'], stored['patient_id']) != (self.status, self.patient_id):
+                    self.status_since = timezone.now()
+                else:
+                    self.status_since = stored['status_since']
+                self.version = BedMapVersion.advance(using)
+                if update_fields is not None:
+                    kwargs['update_fields'] = {*update_fields, 'status_since', 'version'}
+            try:
+                super().save(*args, **kwargs)
+            finally:
+                self.__dict__.pop('_stored_state', None)
+    
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(Bed, instance=self)
+        with transaction.atomic(using=using):
+            return super().delete(*args, **kwargs)
+    
     class Meta:
         unique_together = ['ward', 'number']
         db_table = 'beds'
         ordering = ['ward', 'number']
+        indexes = [
+            models.Index(fields=['status'], name='bed_status_idx'),
+            models.Index(fields=['ward', 'status'], name='bed_ward_status_idx'),
+            models.Index(fields=['version'], name='bed_version_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.ward.name} - {self.number}"
+
+class BedTransition(models.Model):
+    """A bed's past status and occupant, from ``started_at`` until ``ended_at``.
+
+    Written when a bed changes status or patient (or is deleted, with an
+    empty ``next_status``) and never updated. The current interval is on the
+    bed itself (``Bed.status_since``). Bed, ward and patient ids are kept
+    without foreign key constraints so the log outlives deleted rows.
+    """
+    bed = models.ForeignKey(Bed, related_name='transitions', on_delete=models.DO_NOTHING,
+                            db_constraint=False, db_index=False)
+    ward = models.ForeignKey(Ward, related_name='+', on_delete=models.DO_NOTHING,
+                             db_constraint=False, db_index=False)
+    patient = models.ForeignKey('patients.Patient', related_name='+', on_delete=models.DO_NOTHING,
+                                db_constraint=False, db_index=False, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=Bed.STATUS_CHOICES)
+    next_status = models.CharField(max_length=20, blank=True)
+    started_at = models.DateTimeField()
+    ended_at = models.DateTimeField()
+    # ended_at - started_at, stored so stays are summed without date arithmetic
+    duration = models.DurationField()
+    
+    class Meta:
+        db_table = 'bed_transitions'
+        ordering = ['-ended_at']
+        indexes = [
+            # Covers the intervals containing a moment (ended_at > t, then
+            # started_at <= t) and the stays ending in a range.
+            models.Index(fields=['status', 'ended_at', 'started_at', 'ward', 'duration'],
+                         name='bed_transition_interval_idx'),
+            models.Index(fields=['bed', 'ended_at'], name='bed_transition_bed_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.ward.name} - {self.number}"
\ No newline at end of file
+        return f"Bed {self.bed_id} {self.status} until {self.ended_at:%Y-%m-%d %H:%M}"
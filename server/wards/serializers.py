@@ -1,4 +1,6 @@
 from rest_framework import serializers
+from .bedmap import reset_bed_map
+from .counters import COUNTER_FIELDS, beds_created
 from .models import Ward, Bed
 
 class BedSerializer(serializers.ModelSerializer):
@@ -22,9 +24,7 @@ class WardSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
     
     def get_occupancy_percentage(self, obj):
-        if obj.total_beds == 0:
-            return 0
-        return round((obj.occupied_beds / obj.total_beds) * 100, 1)
+        return obj.occupancy_percentage
     
     def create(self, validated_data):
         ward = Ward.objects.create(**validated_data)
@@ -39,6 +39,9 @@ class WardSerializer(serializers.ModelSerializer):
             beds.append(Bed(ward=ward, number=bed_number))
         
         Bed.objects.bulk_create(beds)
+        beds_created(beds)
+        reset_bed_map()
+        ward.refresh_from_db(fields=list(COUNTER_FIELDS.values()))
         return ward
     
     def update(self, instance, validated_data):
@@ -60,11 +63,15 @@ class WardSerializer(serializers.ModelSerializer):
                     bed_number = f"{ward_prefix}-{str(i).zfill(2)}"
                     beds_to_add.append(Bed(ward=instance, number=bed_number))
                 Bed.objects.bulk_create(beds_to_add)
+                beds_created(beds_to_add)
+                reset_bed_map()
             
             elif new_bed_count < current_bed_count:
                 # Remove excess beds (only if they're available)
                 excess_beds = instance.beds.filter(status='available')[new_bed_count:]
                 for bed in excess_beds:
                     bed.delete()
+            
+            instance.refresh_from_db(fields=list(COUNTER_FIELDS.values()))
         
         return instance
\ No newline at end of file
@@ -0,0 +1,61 @@
+"""
+Batch sweeps (core.batch) for beds.
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+
+from core.cache import invalidate_models
+
+from . import counters
+from .models import Bed, BedMapVersion, BedTransition, Ward
+
+
+def finish_cleaning(batch):
+    """Beds cleaning for longer than ``cleaning_minutes`` become available.
+
+    Each chunk is one transaction that does what saving each bed would: one
+    UPDATE of the beds, their ``BedTransition`` rows in one insert, one
+    counter UPDATE per ward, and a single new bed map version shared by the
+    chunk, so bed boards receive the beds as a normal delta.
+    """
+    cutoff = batch.now - timedelta(minutes=batch.options.get('cleaning_minutes', 60))
+    using = batch.using
+
+    def step(limit):
+        with transaction.atomic(using=using):
+            beds = list(
+                Bed.objects.using(using).select_for_update()
+                .filter(status='cleaning', status_since__lte=cutoff)
+                .order_by('pk')
+                .values('id', 'ward_id', 'patient_id', 'status_since')[:limit]
+            )
+            if not beds:
+                return 0
+            version = BedMapVersion.advance(using)
+            Bed.objects.using(using).filter(pk__in=[bed['id'] for bed in beds]).update(
+                status='available', status_since=batch.now, version=version, updated_at=batch.now
+            )
+            BedTransition.objects.using(using).bulk_create([
+                BedTransition(
+                    bed_id=bed['id'],
+                    ward_id=bed['ward_id'],
+                    patient_id=bed['patient_id'],
+                    status='cleaning',
+                    next_status='available',
+                    started_at=bed['status_since'],
+                    ended_at=batch.now,
+                    duration=batch.now - bed['status_since'],
+                )
+                for bed in beds
+            ])
+            for ward_id, cleaned in Counter(bed['ward_id'] for bed in beds).items():
+                counters.adjust(ward_id, {'cleaning': -cleaned, 'available': cleaned}, using)
+            return len(beds)
+
+    available = batch.in_chunks(step)
+    if available:
+        invalidate_models(Bed, Ward)
+    return {'available': available, 'cleaning_before': cutoff.isoformat()}
@@ -0,0 +1,146 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from patients.models import Patient
+from . import history
+from .models import Bed, BedTransition, Ward
+
+
+class WardTestCase(TestCase):
+
+    def setUp(self):
+        self.nurse = User.objects.create_user('nurse', password='x', role='nurse')
+        self.client = APIClient()
+        self.client.force_authenticate(self.nurse)
+        self.ward = Ward.objects.create(
+            name='General A', department='General', floor=1, total_beds=2, nurse_in_charge='Nurse'
+        )
+        self.bed = Bed.objects.create(ward=self.ward, number='A1')
+        self.other_bed = Bed.objects.create(ward=self.ward, number='A2')
+        self.patient = Patient.objects.create(
+            name='Test Patient', age=40, gender='female', phone='555-0100',
+            email='patient@example.com', address='1 Test Street'
+        )
+
+    def assign(self, bed=None):
+        bed = bed or self.bed
+        return self.client.post(f'/api/beds/{bed.pk}/assign_patient/', {'patient_id': self.patient.pk}, format='json')
+
+    def discharge(self, bed=None):
+        bed = bed or self.bed
+        return self.client.post(f'/api/beds/{bed.pk}/discharge_patient/', format='json')
+
+
+class WardCounterTests(WardTestCase):
+
+    def counts(self, ward=None):
+        ward = ward or self.ward
+        ward.refresh_from_db()
+        return {
+            'available': ward.available_count,
+            'occupied': ward.occupied_count,
+            'maintenance': ward.maintenance_count,
+            'cleaning': ward.cleaning_count,
+        }
+
+    def test_assign_and_discharge_move_the_counters(self):
+        self.assertEqual(self.counts(), {'available': 2, 'occupied': 0, 'maintenance': 0, 'cleaning': 0})
+        self.assertEqual(self.assign().status_code, 200)
+        self.assertEqual(self.counts(), {'available': 1, 'occupied': 1, 'maintenance': 0, 'cleaning': 0})
+        self.assertEqual(self.discharge().status_code, 200)
+        self.assertEqual(self.counts(), {'available': 1, 'occupied': 0, 'maintenance': 0, 'cleaning': 1})
+
+    def test_moving_and_deleting_beds(self):
+        other_ward = Ward.objects.create(
+            name='General B', department='General', floor=2, total_beds=1, nurse_in_charge='Nurse'
+        )
+        # A stale instance must not count the move twice.
+        stale = Bed.objects.get(pk=self.other_bed.pk)
+        self.other_bed.ward = other_ward
+        self.other_bed.status = 'maintenance'
+        self.other_bed.save()
+        stale.ward = other_ward
+        stale.status = 'maintenance'
+        stale.save()
+        self.assertEqual(self.counts()['available'], 1)
+        self.assertEqual(self.counts(other_ward), {'available': 0, 'occupied': 0, 'maintenance': 1, 'cleaning': 0})
+
+        self.other_bed.delete()
+        self.assertEqual(self.counts(other_ward)['maintenance'], 0)
+
+
+class BedMapTests(WardTestCase):
+
+    def bed_map(self, since=None):
+        params = {} if since is None else {'since': since}
+        response = self.client.get('/api/wards/bed_map/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_delta_after_assign_and_discharge(self):
+        full = self.bed_map()
+        self.assertEqual(full['mode'], 'full')
+        beds = full['wards'][0]['beds']
+        self.assertEqual(beds['ids'], [self.bed.pk, self.other_bed.pk])
+        self.assertEqual(beds['status'], [0, 0])
+
+        self.assign()
+        delta = self.bed_map(full['version'])
+        self.assertEqual(delta['mode'], 'delta')
+        self.assertEqual(delta['version'], full['version'] + 1)
+        self.assertEqual(delta['wards'][0]['beds'], {
+            'ids': [self.bed.pk], 'numbers': ['A1'], 'status': [1], 'patients': [self.patient.pk]
+        })
+        self.assertEqual(self.bed_map(delta['version'])['wards'], [])
+
+        self.discharge()
+        delta = self.bed_map(delta['version'])
+        self.assertEqual(delta['wards'][0]['beds']['status'], [3])
+
+    def test_deleted_bed_sends_the_full_map(self):
+        version = self.bed_map()['version']
+        self.other_bed.delete()
+        data = self.bed_map(version)
+        self.assertEqual(data['mode'], 'full')
+        self.assertEqual(data['wards'][0]['beds']['ids'], [self.bed.pk])
+
+
+class BedHistoryTests(WardTestCase):
+
+    def test_assign_and_discharge_record_intervals(self):
+        created = Bed.objects.get(pk=self.bed.pk).status_since
+        self.assign()
+        occupied_since = Bed.objects.get(pk=self.bed.pk).status_since
+        self.discharge()
+        cleaning_since = Bed.objects.get(pk=self.bed.pk).status_since
+
+        transitions = list(
+            BedTransition.objects.filter(bed=self.bed).order_by('started_at')
+            .values_list('status', 'next_status', 'patient_id', 'started_at', 'ended_at')
+        )
+        self.assertEqual(transitions, [
+            ('available', 'occupied', None, created, occupied_since),
+            ('occupied', 'cleaning', self.patient.pk, occupied_since, cleaning_since),
+        ])
+
+        def beds_at(moment):
+            totals = history.occupancy_at(moment)['totals']
+            return {status: totals[status] for status in ('available', 'occupied', 'cleaning')}
+
+        self.assertEqual(beds_at(occupied_since), {'available': 1, 'occupied': 1, 'cleaning': 0})
+        before = occupied_since - timedelta(microseconds=1)
+        self.assertEqual(beds_at(before), {'available': 2, 'occupied': 0, 'cleaning': 0})
+        self.assertEqual(beds_at(cleaning_since), {'available': 1, 'occupied': 0, 'cleaning': 1})
+
+    def test_length_of_stay_counts_ended_stays(self):
+        self.assign()
+        self.discharge()
+        now = timezone.now()
+        stays = history.length_of_stay(now - timedelta(days=1), now + timedelta(seconds=1))
+        self.assertEqual(stays['stays'], 1)
+        self.assertEqual(stays['distribution'][0], {'bucket': 'under_1_day', 'stays': 1})
+        self.assertEqual(history.length_of_stay(now - timedelta(days=2), now - timedelta(days=1))['stays'], 0)
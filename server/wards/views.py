@@ -1,13 +1,20 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q, Count, Avg
+from django.db import transaction
+from django.db.models import Q, Count, Avg, Sum, DateField, DurationField, ExpressionWrapper, F, Value
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from datetime import datetime, timedelta
+from core.cache import cached_action
+from core.dates import day_range, start_of_day
+from core.exports import ExportMixin
+from core.replica import use_replica
+from . import bedmap, history
 from .models import Ward, Bed
 from .serializers import WardSerializer, BedSerializer
 
-class WardViewSet(viewsets.ModelViewSet):
+class WardViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = Ward.objects.all()
     serializer_class = WardSerializer
     
@@ -41,9 +48,11 @@ class WardViewSet(viewsets.ModelViewSet):
         return queryset
     
     @action(detail=False, methods=['get'])
+    @cached_action(depends_on=['wards.Ward', 'wards.Bed'])
+    @use_replica
     def occupancy_stats(self, request):
         """Get comprehensive ward occupancy statistics"""
-        wards = Ward.objects.prefetch_related('beds').all()
+        wards = Ward.objects.all()
         stats = []
         
         total_beds = 0
@@ -52,10 +61,10 @@ class WardViewSet(viewsets.ModelViewSet):
         total_maintenance = 0
         
         for ward in wards:
-            occupied_beds = ward.beds.filter(status='occupied').count()
-            available_beds = ward.beds.filter(status='available').count()
-            maintenance_beds = ward.beds.filter(status='maintenance').count()
-            cleaning_beds = ward.beds.filter(status='cleaning').count()
+            occupied_beds = ward.occupied_count
+            available_beds = ward.available_count
+            maintenance_beds = ward.maintenance_count
+            cleaning_beds = ward.cleaning_count
             
             occupancy_rate = 0
             if ward.total_beds > 0:
@@ -98,6 +107,8 @@ class WardViewSet(viewsets.ModelViewSet):
         })
     
     @action(detail=False, methods=['get'])
+    @cached_action(depends_on=['wards.Ward', 'wards.Bed'])
+    @use_replica
     def analytics(self, request):
         """Get ward analytics"""
         total_wards = Ward.objects.count()
@@ -117,14 +128,17 @@ class WardViewSet(viewsets.ModelViewSet):
         
         # Average occupancy by department
         dept_occupancy = []
-        for dept in Ward.objects.values_list('department', flat=True).distinct():
-            dept_wards = Ward.objects.filter(department=dept)
-            total_beds = sum([ward.total_beds for ward in dept_wards])
-            occupied_beds = sum([ward.occupied_beds for ward in dept_wards])
+        departments = Ward.objects.values('department').annotate(
+            total_beds=Sum('total_beds'),
+            occupied_beds=Sum('occupied_count')
+        ).order_by('department')
+        for dept in departments:
+            total_beds = dept['total_beds']
+            occupied_beds = dept['occupied_beds']
             occupancy_rate = (occupied_beds / total_beds * 100) if total_beds > 0 else 0
             
             dept_occupancy.append({
-                'department': dept,
+                'department': dept['department'],
                 'total_beds': total_beds,
                 'occupied_beds': occupied_beds,
                 'occupancy_rate': round(occupancy_rate, 1)
@@ -142,7 +156,7 @@ class WardViewSet(viewsets.ModelViewSet):
     def bed_status(self, request, pk=None):
         """Get detailed bed status for a ward"""
         ward = self.get_object()
-        beds = ward.beds.all().order_by('number')
+        beds = ward.beds.select_related('patient').order_by('number')
         
         bed_data = []
         for bed in beds:
@@ -191,7 +205,21 @@ class WardViewSet(viewsets.ModelViewSet):
         
         return Response(list(beds_by_ward.values()))
 
-class BedViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    def bed_map(self, request):
+        """Get every ward's beds as columns, or only the beds changed since a version"""
+        since = request.query_params.get('since', None)
+        if since is not None:
+            try:
+                since = int(since)
+            except ValueError:
+                return Response(
+                    {'error': 'since must be a bed map version number'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        return Response(bedmap.bed_map(since))
+
+class BedViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = Bed.objects.all()
     serializer_class = BedSerializer
     
@@ -213,9 +241,14 @@ class BedViewSet(viewsets.ModelViewSet):
         if patient_id:
             queryset = queryset.filter(patient_id=patient_id)
         
+        # Status changes lock the bed, so two requests cannot both take it
+        if self.action in ('update_status', 'assign_patient', 'discharge_patient'):
+            queryset = queryset.select_for_update(of=('self',))
+        
         return queryset
     
     @action(detail=True, methods=['patch'])
+    @transaction.atomic
     def update_status(self, request, pk=None):
         """Update bed status and patient assignment"""
         bed = self.get_object()
@@ -255,51 +288,58 @@ class BedViewSet(viewsets.ModelViewSet):
     def available(self, request):
         """Get all available beds"""
         beds = Bed.objects.filter(status='available').select_related('ward')
-        serializer = self.get_serializer(beds, many=True)
-        return Response(serializer.data)
+        return self.list_response(beds)
     
     @action(detail=False, methods=['get'])
     def occupied(self, request):
         """Get all occupied beds"""
         beds = Bed.objects.filter(status='occupied').select_related('ward', 'patient')
-        serializer = self.get_serializer(beds, many=True)
-        return Response(serializer.data)
+        return self.list_response(beds)
     
     @action(detail=False, methods=['get'])
     def maintenance(self, request):
         """Get beds under maintenance"""
         beds = Bed.objects.filter(status='maintenance').select_related('ward')
-        serializer = self.get_serializer(beds, many=True)
-        return Response(serializer.data)
+        return self.list_response(beds)
     
     @action(detail=False, methods=['get'])
+    @cached_action(depends_on=['wards.Bed', 'wards.Ward', 'wards.BedTransition'])
+    @use_replica
     def analytics(self, request):
         """Get bed analytics"""
-        total_beds = Bed.objects.count()
-        available_beds = Bed.objects.filter(status='available').count()
-        occupied_beds = Bed.objects.filter(status='occupied').count()
-        maintenance_beds = Bed.objects.filter(status='maintenance').count()
-        cleaning_beds = Bed.objects.filter(status='cleaning').count()
+        counts = Ward.objects.aggregate(
+            available=Sum('available_count'),
+            occupied=Sum('occupied_count'),
+            maintenance=Sum('maintenance_count'),
+            cleaning=Sum('cleaning_count')
+        )
+        available_beds = counts['available'] or 0
+        occupied_beds = counts['occupied'] or 0
+        maintenance_beds = counts['maintenance'] or 0
+        cleaning_beds = counts['cleaning'] or 0
+        total_beds = available_beds + occupied_beds + maintenance_beds + cleaning_beds
         
         # Status distribution
         status_distribution = Bed.objects.values('status').annotate(count=Count('status'))
         
-        # Average occupancy duration
-        occupied_with_dates = Bed.objects.filter(
+        # Average occupancy duration so far, of currently occupied beds
+        today = timezone.now().date()
+        current_stay = Bed.objects.filter(
             status='occupied',
             admission_date__isnull=False
-        )
-        
-        avg_stay_days = 0
-        if occupied_with_dates.exists():
-            total_days = sum([
-                (timezone.now().date() - bed.admission_date).days 
-                for bed in occupied_with_dates
-            ])
-            avg_stay_days = total_days / occupied_with_dates.count()
+        ).aggregate(
+            average=Avg(ExpressionWrapper(
+                Value(today, output_field=DateField()) - F('admission_date'),
+                output_field=DurationField()
+            ))
+        )['average']
+        avg_stay_days = current_stay.total_seconds() / 86400 if current_stay else 0
+        
+        # Completed stays (last 30 days), from the bed history
+        thirty_days_ago = today - timedelta(days=30)
+        completed = history.length_of_stay(start_of_day(thirty_days_ago), day_range(today)[1])
         
         # Bed turnover (last 30 days)
-        thirty_days_ago = timezone.now().date() - timedelta(days=30)
         recent_admissions = Bed.objects.filter(
             admission_date__gte=thirty_days_ago
         ).count()
@@ -313,10 +353,77 @@ class BedViewSet(viewsets.ModelViewSet):
             'occupancy_rate': round((occupied_beds / total_beds * 100), 1) if total_beds > 0 else 0,
             'status_distribution': list(status_distribution),
             'avg_stay_days': round(avg_stay_days, 1),
+            'completed_stays': completed['stays'],
+            'avg_completed_stay_days': round(completed['average_days'] or 0, 1),
             'recent_admissions': recent_admissions
         })
     
+    @action(detail=False, methods=['get'])
+    @use_replica
+    def occupancy_at(self, request):
+        """Get bed counts per ward and status at a past moment"""
+        at = request.query_params.get('at', None)
+        if at:
+            try:
+                moment = parse_datetime(at)
+                if moment is None and parse_date(at):
+                    moment = datetime.combine(parse_date(at), datetime.min.time())
+            except ValueError:
+                moment = None
+            if moment is None:
+                return Response(
+                    {'error': 'at must be an ISO date or datetime'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if timezone.is_naive(moment):
+                moment = timezone.make_aware(moment)
+        else:
+            moment = timezone.now()
+        
+        ward_ids = self.ward_ids(request)
+        if ward_ids is None:
+            return Response({'error': 'ward must be a list of ward ids'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(history.occupancy_at(
+            moment, ward_ids=ward_ids, department=request.query_params.get('department', None)
+        ))
+    
+    @action(detail=False, methods=['get'])
+    @use_replica
+    def length_of_stay(self, request):
+        """Get the distribution of completed bed stays"""
+        end_date = request.query_params.get('end_date', None)
+        start_date = request.query_params.get('start_date', None)
+        try:
+            end_date = parse_date(end_date) if end_date else timezone.now().date()
+            start_date = parse_date(start_date) if start_date else end_date and end_date - timedelta(days=30)
+        except ValueError:
+            end_date = None
+        if start_date is None or end_date is None:
+            return Response(
+                {'error': 'start_date and end_date must be ISO dates'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        ward_ids = self.ward_ids(request)
+        if ward_ids is None:
+            return Response({'error': 'ward must be a list of ward ids'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        start, end = day_range(start_date, end_date)
+        return Response(history.length_of_stay(
+            start, end, ward_ids=ward_ids, department=request.query_params.get('department', None)
+        ))
+    
+    def ward_ids(self, request):
+        """Ward ids from ``?ward=1,2``: [] when absent, None when malformed."""
+        wards = request.query_params.get('ward', '')
+        try:
+            return [int(ward_id) for ward_id in wards.split(',') if ward_id.strip()]
+        except ValueError:
+            return None
+    
     @action(detail=True, methods=['post'])
+    @transaction.atomic
     def assign_patient(self, request, pk=None):
         """Assign patient to bed"""
         bed = self.get_object()
@@ -354,6 +461,7 @@ class BedViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
     @action(detail=True, methods=['post'])
+    @transaction.atomic
     def discharge_patient(self, request, pk=None):
         """Discharge patient from bed"""
         bed = self.get_object()